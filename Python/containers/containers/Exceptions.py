@@ -180,3 +180,19 @@ class NumberInconsistency(Exception):
     def __str__(self):
         return f'The number of single containers in "{Keywords.CONTAINERS}" section' \
                f'is greater than the number defined in "{Keywords.CONTAINER_NUMBER}" section'
+
+
+class ProvisioningError(Exception):
+    def __init__(self, *args):
+        if args:
+            self.action = args[0]
+            self.containers = args[1]
+        else:
+            self.action = None
+            self.containers = None
+
+    def __str__(self):
+        if self.action:
+            return f'Could not {self.action} the containers {", ".join(self.containers)}'
+        else:
+            return 'Could not provision the containers'
@@ -0,0 +1,140 @@
+import asyncio
+import datetime
+import multiprocessing
+import threading
+
+import paho.mqtt.client as mqtt
+
+# Seconds between two checks of the clients status inside an event loop
+ENGINE_TICK = 0.5
+
+
+class AsyncioHelper:
+    """Drives the network traffic of a paho client from an asyncio event loop instead of the
+    per-client network thread started by loop_start(). The socket callbacks are handed to the loop
+    thread-safely, the connection being opened in a thread of the executor"""
+
+    def __init__(self, loop, client: mqtt.Client):
+        self.__loop = loop
+        self.__client = client
+        self.__misc = None
+        # Created in the thread of the loop
+        self.__loop_thread = threading.get_ident()
+        self.__client.on_socket_open = self.on_socket_open
+        self.__client.on_socket_close = self.on_socket_close
+        self.__client.on_socket_register_write = self.on_socket_register_write
+        self.__client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def _in_loop(self, callback, *args):
+        """Runs the callback right away in the loop thread, the socket may be closed just after it"""
+        if threading.get_ident() == self.__loop_thread:
+            callback(*args)
+        else:
+            self.__loop.call_soon_threadsafe(callback, *args)
+
+    def on_socket_open(self, client, userdata, sock):
+        self._in_loop(self._socket_opened, client, sock)
+
+    def _socket_opened(self, client, sock):
+        self.__loop.add_reader(sock, client.loop_read)
+        self.__misc = self.__loop.create_task(self.misc_loop())
+
+    def on_socket_close(self, client, userdata, sock):
+        self._in_loop(self._socket_closed, sock)
+
+    def _socket_closed(self, sock):
+        self.__loop.remove_reader(sock)
+        if self.__misc is not None:
+            self.__misc.cancel()
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self._in_loop(self.__loop.add_writer, sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self._in_loop(self.__loop.remove_writer, sock)
+
+    async def misc_loop(self):
+        # Keep-alive pings and retries, normally handled by the network thread
+        while self.__client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                break
+
+
+def _client_expired(client, now: datetime.datetime) -> bool:
+    """Applies the same timeouts of the process engine to a client living in the event loop"""
+    if getattr(client, 'finished', False):
+        # A subscriber stopped by the inter-message watchdog of the process
+        return True
+    if client.start_time is not None:
+        return (now - client.start_time).total_seconds() > client.timeout
+    return False
+
+
+async def run_clients(clients: list, tick: float = ENGINE_TICK):
+    """Connects all the clients and multiplexes their sessions in the running event loop"""
+    loop = asyncio.get_running_loop()
+    pending = []
+    for client in clients:
+        client.configure_client()
+        AsyncioHelper(loop, client.client)
+        client.event_loop = loop
+        # Wait for the slot of the client on the connection ramp, serving the connected clients meanwhile
+        await asyncio.sleep(client.connect_delay())
+        try:
+            # The DNS lookup, TCP and TLS handshakes block, the connected clients are served meanwhile
+            await loop.run_in_executor(None, client.connect_client)
+        except OSError as err:
+            print(f'Client {client.client_id} could not connect to {client.hostname}: {err}')
+            continue
+        pending.append(client)
+
+    while pending:
+        await asyncio.sleep(tick)
+        now = datetime.datetime.utcnow()
+        for client in list(pending):
+            if client.done():
+                client.report()
+            elif _client_expired(client, now):
+                print(f'Client {client.client_id} timed out')
+            else:
+                continue
+            client.stop_client()
+            client.client.disconnect()
+            pending.remove(client)
+    # Give the disconnect packets the chance to leave the sockets
+    await asyncio.sleep(tick)
+
+
+def shard_count(clients: int, workers: int) -> int:
+    """The number of event loops actually started for the given number of clients"""
+    return max(1, min(workers, clients))
+
+
+def shard_of(position: int, shards: int) -> int:
+    """The event loop running the client at the given position of the list passed to start_engine"""
+    return position % shards
+
+
+def _run_shard(clients: list, tick: float):
+    asyncio.run(run_clients(clients, tick))
+
+
+def start_engine(clients: list, workers: int = 1, tick: float = ENGINE_TICK) -> list:
+    """Splits the clients among the worker processes, each one running a single event loop
+    :param clients: The Sub/Pub objects, created but not started
+    :param workers: The number of event loops (processes) to use, usually one per core
+    :param tick: Seconds between two checks of the clients status
+    :return: The started worker processes
+    """
+    workers = shard_count(len(clients), workers)
+    processes = []
+    for ind in range(workers):
+        _shard = [client for position, client in enumerate(clients) if shard_of(position, workers) == ind]
+        if not _shard:
+            continue
+        process = multiprocessing.Process(target=_run_shard, args=(_shard, tick), name=f'engine-{ind}')
+        process.start()
+        processes.append(process)
+    return processes
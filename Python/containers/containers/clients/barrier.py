@@ -0,0 +1,315 @@
+import argparse
+import json
+import multiprocessing
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from clocksync import CONTROL_TOPIC
+
+# The containers report their ready clients on the ready topic, the coordinator answers on the start topic
+BARRIER_READY_TOPIC = CONTROL_TOPIC + '/barrier/ready'
+BARRIER_START_TOPIC = CONTROL_TOPIC + '/barrier/start'
+# Seconds between the release and the start instant, for the start message to reach every container
+BARRIER_LEAD = 1.0
+# Seconds a container waits for the start signal once its clients are ready, before starting on its own
+BARRIER_TIMEOUT = 120.0
+# Seconds between two checks of the ready clients of a container
+BARRIER_TICK = 0.05
+
+
+class BarrierRole:
+    # Ready once all its subscriptions are acknowledged
+    SUB = 'sub'
+    # Ready once connected, it waits for the start instant before publishing
+    PUB = 'pub'
+    ALL = (SUB, PUB)
+
+
+def parse_barrier(spec: str) -> dict:
+    """The containers of each role expected at the barrier, e.g. {"sub": 5, "pub": 3}, None without a
+    barrier. A container counts for a role once all its clients of the role are ready"""
+    if not spec:
+        return None
+    try:
+        _expected = {_role: int(_count) for _role, _count in json.loads(spec).items()}
+    except (ValueError, AttributeError):
+        raise ValueError(f'The barrier {spec} must be a JSON object such as {{"sub": 5, "pub": 3}}')
+    if any(_role not in BarrierRole.ALL for _role in _expected):
+        raise ValueError(f'The barrier roles must be among {BarrierRole.ALL}')
+    return _expected
+
+
+class ContainerBarrier:
+    """The start barrier of a container.
+
+    The clients mark themselves ready, whatever process or thread they run in. Once all the clients of
+    the container are ready, the barrier reports them to the coordinator through the broker and waits for
+    the start instant the coordinator releases, the same wall-clock instant for all the containers. The
+    instant is moved to the local clock with the offset measured by the clock synchronisation.
+    """
+
+    def __init__(self, hostname: str, container: str, clients: dict, expected: dict, port: int = 1883,
+                 tls=None, auth=None, offset_ns: int = 0, timeout: float = BARRIER_TIMEOUT):
+        """
+        :param clients: The clients of each role in this container
+        :param expected: The containers of each role in the run
+        """
+        self.__hostname = hostname
+        self.__port = port
+        self.__container = container
+        self.__clients = clients
+        self.__expected = expected
+        self.__tls = tls
+        self.__auth = auth
+        self.__offset_ns = offset_ns
+        self.__timeout = timeout
+        self.__ready = {_role: multiprocessing.Value('i', 0) for _role in BarrierRole.ALL}
+        self.__released = multiprocessing.Event()
+        # Local wall-clock start instant, 0 until released
+        self.__start_ns = multiprocessing.Value('q', 0)
+        self.__timed_out = multiprocessing.Value('b', False)
+        self.__ready_ns = None
+        self.__release_ns = None
+        self.__thread = None
+
+    @property
+    def timeout(self):
+        return self.__timeout
+
+    def ready(self, role: str):
+        """Called by a client once it is ready to start"""
+        with self.__ready[role].get_lock():
+            self.__ready[role].value += 1
+
+    def start_instant(self) -> int:
+        """The local start instant in ns (time.time_ns clock), None until the release"""
+        if not self.__released.is_set():
+            return None
+        return self.__start_ns.value
+
+    def wait(self) -> int:
+        """Blocks until the release, then returns the local start instant"""
+        self.__released.wait()
+        return self.__start_ns.value
+
+    def sleep_until_start(self) -> int:
+        """Blocks until the start instant
+        :return: The start instant, to measure the skew of the client from it
+        """
+        _start_ns = self.wait()
+        _delay = (_start_ns - time.time_ns()) / 1e9
+        if _delay > 0:
+            time.sleep(_delay)
+        return _start_ns
+
+    def start(self):
+        """Reports the container to the coordinator once its clients are ready, in a thread of the main
+        process"""
+        self.__thread = threading.Thread(target=self._run, name='start-barrier', daemon=True)
+        self.__thread.start()
+
+    def _release(self, start_ns: int, timed_out: bool = False):
+        if self.__released.is_set():
+            return
+        self.__release_ns = time.time_ns()
+        self.__start_ns.value = start_ns
+        self.__timed_out.value = timed_out
+        self.__released.set()
+
+    def _all_ready(self) -> bool:
+        return all(self.__ready[_role].value >= _count for _role, _count in self.__clients.items())
+
+    def _run(self):
+        _subscribed = threading.Event()
+
+        def on_connect(client, userdata, flags, rc):
+            if rc == 0:
+                client.subscribe(BARRIER_START_TOPIC, qos=1)
+
+        def on_message(client, userdata, msg):
+            try:
+                _start_ns = int(json.loads(msg.payload)['start_ns'])
+            except (ValueError, KeyError):
+                return
+            # The instant of the coordinator clock on the clock of the container
+            self._release(_start_ns - self.__offset_ns)
+
+        client = mqtt.Client()
+        client.on_connect = on_connect
+        client.on_subscribe = lambda *args: _subscribed.set()
+        client.on_message = on_message
+        if self.__tls:
+            client.tls_set(**self.__tls)
+        if self.__auth:
+            client.username_pw_set(**self.__auth)
+        try:
+            client.connect(self.__hostname, port=self.__port)
+        except OSError as err:
+            print(f'The start barrier could not connect to {self.__hostname}: {err}, starting right away')
+            self._release(time.time_ns(), timed_out=True)
+            return
+        client.loop_start()
+        _deadline = time.monotonic() + self.__timeout
+        _subscribed.wait(self.__timeout)
+        # A client which never connects reports the container late, not never
+        while not self._all_ready() and time.monotonic() < _deadline:
+            time.sleep(BARRIER_TICK)
+        self.__ready_ns = time.time_ns()
+        client.publish(BARRIER_READY_TOPIC, json.dumps({
+            'container': self.__container,
+            'ready': {_role: self.__ready[_role].value for _role in self.__clients},
+            'clients': self.__clients,
+            'expected': self.__expected,
+            'ready_ns': self.__ready_ns + self.__offset_ns
+        }), qos=1)
+        if not self.__released.wait(self.__timeout):
+            print(f'No start signal after {self.__timeout:g} s, starting right away')
+            self._release(time.time_ns(), timed_out=True)
+        client.disconnect()
+        client.loop_stop()
+
+    def report(self, skews: list) -> dict:
+        """The barrier as stored in the run output
+        :param skews: The (client id, start skew in ns) of the publishers
+        """
+        return {'container': self.__container,
+                'clients': self.__clients,
+                'expected': self.__expected,
+                'ready_ns': self.__ready_ns,
+                'release_ns': self.__release_ns,
+                'start_ns': self.__start_ns.value or None,
+                'timed_out': bool(self.__timed_out.value),
+                'skews': [{'client_id': _client_id, 'skew_ns': _skew} for _client_id, _skew in skews]}
+
+
+class BarrierCoordinator:
+    """Releases all the containers at once: waits until every expected container of the run is ready, then
+    publishes a single start instant, BARRIER_LEAD in the future, on all the brokers"""
+
+    def __init__(self, hostnames: list, roles: list = BarrierRole.ALL, port: int = 1883, lead: float = BARRIER_LEAD,
+                 tls=None, auth=None):
+        """
+        :param roles: The roles whose expected containers must all be ready before the release
+        """
+        self.__roles = list(roles)
+        self.__lead = lead
+        self.__ready = dict.fromkeys(BarrierRole.ALL, 0)
+        self.__expected = {}
+        self.__containers = {}
+        self.__lock = threading.Lock()
+        self.__released = threading.Event()
+        self.__clients = []
+        for hostname in hostnames:
+            client = mqtt.Client()
+            client.on_connect = self.on_connect
+            client.on_message = self.on_message
+            if tls:
+                client.tls_set(**tls)
+            if auth:
+                client.username_pw_set(**auth)
+            client.connect_async(hostname, port=port)
+            self.__clients.append(client)
+
+    @staticmethod
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe(BARRIER_READY_TOPIC, qos=1)
+
+    def on_message(self, client, userdata, msg):
+        _arrival_ns = time.time_ns()
+        try:
+            _report = json.loads(msg.payload)
+        except ValueError:
+            return
+        with self.__lock:
+            if self.__released.is_set() or _report.get('container') in self.__containers:
+                return
+            self.__containers[_report.get('container')] = dict(_report, arrival_ns=_arrival_ns)
+            # A container reported at its deadline with some clients not ready does not count for the role
+            _clients = _report.get('clients', {})
+            for _role, _count in _report.get('ready', {}).items():
+                if _count and _count >= _clients.get(_role, 0):
+                    self.__ready[_role] = self.__ready.get(_role, 0) + 1
+            for _role, _count in _report.get('expected', {}).items():
+                self.__expected[_role] = max(self.__expected.get(_role, 0), _count)
+            print(f'Barrier: container {_report.get("container")} ready, '
+                  + ', '.join(f'{_role} {self.__ready[_role]}/{self.__expected.get(_role, "?")}'
+                              for _role in self.__roles), flush=True)
+            if all(_role in self.__expected and self.__ready[_role] >= self.__expected[_role]
+                   for _role in self.__roles):
+                self._release()
+
+    def _release(self):
+        _start_ns = time.time_ns() + int(self.__lead * 1e9)
+        _payload = json.dumps({'start_ns': _start_ns})
+        for client in self.__clients:
+            client.publish(BARRIER_START_TOPIC, _payload, qos=1)
+        self.__released.set()
+        _arrivals = [_container['arrival_ns'] for _container in self.__containers.values()]
+        print(f'Barrier released: {len(self.__containers)} containers, ready spread '
+              f'{(max(_arrivals) - min(_arrivals)) / 1e6:.3f} ms, start in {self.__lead:g} s', flush=True)
+
+    def start(self):
+        for client in self.__clients:
+            client.loop_start()
+
+    def stop(self):
+        for client in self.__clients:
+            client.disconnect()
+            client.loop_stop()
+
+
+def barrier_summary(barriers: list) -> dict:
+    """The start skews of the publishers of all the containers, in ns: how late each one started after
+    the start instant"""
+    _skews = [_skew['skew_ns'] for _barrier in barriers for _skew in _barrier['skews']]
+    _starts = {_barrier['start_ns'] for _barrier in barriers if _barrier.get('start_ns')}
+    return {'publishers': len(_skews),
+            'containers': len(barriers),
+            'timed_out': sum(1 for _barrier in barriers if _barrier.get('timed_out')),
+            'min_skew_ns': min(_skews) if _skews else None,
+            'max_skew_ns': max(_skews) if _skews else None,
+            'spread_ns': max(_skews) - min(_skews) if _skews else None,
+            'start_instants': len(_starts)}
+
+
+def merge_barrier_files(paths: list) -> list:
+    """The barriers of the JSON files written next to the logs of the publisher containers"""
+    _barriers = []
+    for path in paths:
+        with open(path, 'r') as f:
+            _barriers.append(json.load(f))
+    return _barriers
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(description='Start barrier of the benchmark containers')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    _coordinate = subparsers.add_parser('coordinate', help='Release the containers once all their clients are ready')
+    _coordinate.add_argument('--hostname', nargs='+', required=True, help='The brokers the containers connect to')
+    _coordinate.add_argument('--port', type=int, default=1883)
+    _coordinate.add_argument('--roles', nargs='+', default=list(BarrierRole.ALL), choices=BarrierRole.ALL,
+                             help='The roles which must be ready before the release')
+    _coordinate.add_argument('--lead', type=float, default=BARRIER_LEAD,
+                             help='Seconds between the release and the start instant')
+    _skew = subparsers.add_parser('skew', help='Print the start skew of the publishers of a run')
+    _skew.add_argument('files', nargs='+', help='The _barrier.json files of the publisher containers')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # python barrier.py coordinate --hostname 10.0.0.2 10.0.0.3 -> releases the containers of the run
+    # python barrier.py skew logs/*_barrier.json -> start skew of all the publishers of the run
+    _args = arg_parse()
+    if _args.command == 'coordinate':
+        _coordinator = BarrierCoordinator(_args.hostname, roles=_args.roles, port=_args.port, lead=_args.lead)
+        _coordinator.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            _coordinator.stop()
+    else:
+        print(json.dumps(barrier_summary(merge_barrier_files(_args.files)), indent=2))
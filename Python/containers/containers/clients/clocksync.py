@@ -0,0 +1,238 @@
+import argparse
+import json
+import queue
+import random
+import struct
+import time
+from threading import Event
+
+import paho.mqtt.client as mqtt
+
+# Topics used by the benchmark itself, never counted as messages by the subscribers
+CONTROL_TOPIC = 'mqttbench/control'
+CLOCK_PING_TOPIC = CONTROL_TOPIC + '/clock/ping/'
+CLOCK_PONG_TOPIC = CONTROL_TOPIC + '/clock/pong/'
+# nonce, client send time
+PING = struct.Struct('!Qq')
+# nonce, client send time, responder receive time, responder send time
+PONG = struct.Struct('!Qqqq')
+
+# Ping-pong exchanges of a synchronisation phase, asked of the containers by the orchestrator running the responder
+CLOCK_SAMPLES = 8
+# Seconds to wait for each pong, a missing responder only delays the run by this much
+CLOCK_TIMEOUT = 2.0
+
+
+def is_control_topic(topic: str) -> bool:
+    return topic.startswith(CONTROL_TOPIC + '/')
+
+
+def measure_offset(hostname: str, container: str, port: int = 1883, samples: int = CLOCK_SAMPLES,
+                   timeout: float = CLOCK_TIMEOUT, tls=None, auth=None) -> dict:
+    """Estimates the offset of the local clock from the clock of the responder, NTP style, through the
+    broker under test. The sample with the shortest round trip is kept, being the least affected by
+    queueing in the broker
+    :param container: The name of the container, used to route the pongs back
+    :return: local_ns (time of the estimate), offset_ns (to be added to the local clock), rtt_ns and
+    samples, or None if the responder didn't answer
+    """
+    _pongs = queue.Queue()
+    _subscribed = Event()
+    _pong_topic = CLOCK_PONG_TOPIC + container
+
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe(_pong_topic, qos=0)
+
+    def on_message(client, userdata, msg):
+        _receive_time = time.time_ns()
+        if len(msg.payload) == PONG.size:
+            _pongs.put(PONG.unpack(msg.payload) + (_receive_time,))
+
+    client = mqtt.Client()
+    client.on_connect = on_connect
+    client.on_subscribe = lambda *args: _subscribed.set()
+    client.on_message = on_message
+    if tls:
+        client.tls_set(**tls)
+    if auth:
+        client.username_pw_set(**auth)
+    try:
+        client.connect(hostname, port=port)
+    except OSError as err:
+        print(f'Clock synchronisation with {hostname} failed: {err}')
+        return None
+    client.loop_start()
+    _best = None
+    _answered = 0
+    try:
+        if not _subscribed.wait(timeout):
+            return None
+        _nonce = random.getrandbits(48)
+        for _ind in range(samples):
+            _send_time = time.time_ns()
+            client.publish(CLOCK_PING_TOPIC + container, PING.pack(_nonce + _ind, _send_time), qos=0)
+            _deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    _pong = _pongs.get(timeout=max(0.0, _deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                # Late pongs of a previous sample or duplicates of another responder are skipped
+                if _pong[0] != _nonce + _ind:
+                    continue
+                _, _t1, _t2, _t3, _t4 = _pong
+                _rtt = (_t4 - _t1) - (_t3 - _t2)
+                if _best is None or _rtt < _best['rtt_ns']:
+                    _best = {'local_ns': (_t1 + _t4) // 2, 'offset_ns': ((_t2 - _t1) + (_t3 - _t4)) // 2,
+                             'rtt_ns': _rtt}
+                _answered += 1
+                break
+            if not _answered:
+                # Nobody is answering, don't wait for every sample
+                break
+    finally:
+        client.loop_stop()
+        client.disconnect()
+    if _best is None:
+        print(f'No clock responder answered through {hostname}')
+        return None
+    _best['samples'] = _answered
+    return _best
+
+
+def clock_drift(before: dict, after: dict):
+    """Drift of the local clock in ppm, from the estimates before and after the measurements"""
+    if not before or not after or after['local_ns'] == before['local_ns']:
+        return None
+    return (after['offset_ns'] - before['offset_ns']) / (after['local_ns'] - before['local_ns']) * 1e6
+
+
+def clock_report(container: str, container_id: int, before: dict, after: dict) -> dict:
+    """The clock of a container as stored in the run output"""
+    return {'container': container, 'container_id': container_id, 'before': before, 'after': after,
+            'drift_ppm': clock_drift(before, after)}
+
+
+def offset_at(clock: dict, local_ns: int) -> float:
+    """Offset of a container clock at a local time, interpolated between the two estimates"""
+    _estimates = [_estimate for _estimate in (clock.get('before'), clock.get('after')) if _estimate]
+    if not _estimates:
+        return 0
+    _drift = clock.get('drift_ppm')
+    if _drift is None:
+        return _estimates[0]['offset_ns']
+    return _estimates[0]['offset_ns'] + (local_ns - _estimates[0]['local_ns']) * _drift / 1e6
+
+
+def load_clocks(paths: list) -> dict:
+    """The clocks of the containers written in the run output, by container id"""
+    _clocks = {}
+    for path in paths:
+        with open(path, 'r') as f:
+            _clock = json.load(f)
+        _clocks[_clock['container_id']] = _clock
+    return _clocks
+
+
+def corrected_delay(publish_ns: int, publisher_id: int, arrival_ns: int, subscriber_id: int, clocks: dict) -> float:
+    """The e2e delay with both timestamps moved to the clock of the responder, uncorrected for the
+    containers without a clock estimate"""
+    _publisher_clock = clocks.get(publisher_id)
+    _subscriber_clock = clocks.get(subscriber_id)
+    _publish = publish_ns + (offset_at(_publisher_clock, publish_ns) if _publisher_clock else 0)
+    _arrival = arrival_ns + (offset_at(_subscriber_clock, arrival_ns) if _subscriber_clock else 0)
+    return _arrival - _publish
+
+
+class ClockResponder:
+    """The reference clock: answers the pings of the containers with its own timestamps"""
+
+    def __init__(self, hostnames: list, port: int = 1883, tls=None, auth=None):
+        self.__clients = []
+        for hostname in hostnames:
+            client = mqtt.Client()
+            client.on_connect = self.on_connect
+            client.on_message = self.on_message
+            if tls:
+                client.tls_set(**tls)
+            if auth:
+                client.username_pw_set(**auth)
+            client.connect_async(hostname, port=port)
+            self.__clients.append(client)
+
+    @staticmethod
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe(CLOCK_PING_TOPIC + '+', qos=0)
+
+    @staticmethod
+    def on_message(client, userdata, msg):
+        _receive_time = time.time_ns()
+        if len(msg.payload) != PING.size:
+            return
+        _nonce, _send_time = PING.unpack(msg.payload)
+        _container = msg.topic[len(CLOCK_PING_TOPIC):]
+        client.publish(CLOCK_PONG_TOPIC + _container, PONG.pack(_nonce, _send_time, _receive_time, time.time_ns()),
+                       qos=0)
+
+    def start(self):
+        for client in self.__clients:
+            client.loop_start()
+
+    def stop(self):
+        for client in self.__clients:
+            client.disconnect()
+            client.loop_stop()
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(description='Clock synchronisation of the benchmark containers')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    _respond = subparsers.add_parser('respond', help='Run the reference clock answering the containers')
+    _respond.add_argument('--hostname', nargs='+', required=True, help='The brokers the containers connect to')
+    _respond.add_argument('--port', type=int, default=1883)
+    _correct = subparsers.add_parser('correct', help='Print the e2e delays of a log corrected with the clocks')
+    _correct.add_argument('--clocks', nargs='+', required=True, help='The *_clock.json files of the run')
+    _correct.add_argument('--log', required=True, help='A csv or columnar log file')
+    return parser.parse_args()
+
+
+def read_delays(log_file: str) -> tuple:
+    """The publish and arrival timestamps and the container ids of the rows of a log file"""
+    from log_writer import read_columnar
+    from payload import host_id
+    _columns = ('publish_timestamp_ns', 'publisher_container', 'arrival_timestamp_ns', 'subscriber_container')
+    if log_file.endswith('.col'):
+        _log = read_columnar(log_file)
+        return tuple(_log[_column].tolist() for _column in _columns)
+    with open(log_file, 'r') as f:
+        _header = f.readline().strip().split(';')
+        _indexes = [_header.index(_column) for _column in _columns]
+        _rows = [line.strip().split(';') for line in f if line.strip()]
+    return (tuple(int(_row[_indexes[0]]) for _row in _rows), tuple(host_id(_row[_indexes[1]]) for _row in _rows),
+            tuple(int(_row[_indexes[2]]) for _row in _rows), tuple(host_id(_row[_indexes[3]]) for _row in _rows))
+
+
+if __name__ == '__main__':
+    # python clocksync.py respond --hostname 10.0.0.2 10.0.0.3
+    # python clocksync.py correct --clocks logs/*_clock.json --log logs/_log_2.csv
+    _args = arg_parse()
+    if _args.command == 'respond':
+        _responder = ClockResponder(_args.hostname, port=_args.port)
+        _responder.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            _responder.stop()
+    else:
+        from histogram import LatencyHistogram, format_summary
+        _clocks = load_clocks(_args.clocks)
+        _raw = LatencyHistogram()
+        _corrected = LatencyHistogram()
+        for _publish, _publisher, _arrival, _subscriber in zip(*read_delays(_args.log)):
+            _raw.record(_arrival - _publish)
+            _corrected.record(corrected_delay(_publish, _publisher, _arrival, _subscriber, _clocks))
+        print(format_summary('Raw e2e delay', _raw))
+        print(format_summary('Clock corrected e2e delay', _corrected))
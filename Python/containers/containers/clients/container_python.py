@@ -13,23 +13,74 @@
 # under the License
 
 import argparse
+import asyncio
 import datetime
 import multiprocessing
-import random
-import string
 import time
 import os
 import json
 import copy
 import queue
+import random
+import socket
 import numpy
 import paho.mqtt.client as mqtt
-from threading import Timer
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+from paho.mqtt.reasoncodes import ReasonCodes
+from threading import Event, Lock, Thread, Timer
 import re
 
-SUB_QUEUE = multiprocessing.Queue()
-PUB_QUEUE = multiprocessing.Queue()
-LOG_QUEUE = multiprocessing.Queue()
+import async_engine
+import thread_engine
+from payload import PayloadBuffer, PayloadEntropy, HeaderFormat, HEADER_SIZE, get_pool, host_id, host_name, \
+    client_number, datetime_to_ns, encode_text_header, decode_header, encode_user_properties, decode_user_properties
+from scheduler import ArrivalProcess, RateScheduler, RampProfile, ConnectRamp
+from histogram import LatencyHistogram, format_summary, DEFAULT_SIGNIFICANT_FIGURES
+from log_writer import LogWriter, LogFormat, LOG_RECORD, log_path
+from ring_buffer import RingBuffer, RING_SIZE
+from clocksync import CLOCK_TIMEOUT, measure_offset, clock_report, is_control_topic
+from sequence import SequenceTracker, SEQUENCE_COUNTS, pair_counts, loss_ratio
+from topic_tree import TopicTree
+from shared import ShareFormat, ShareGroup, SHARE_IDLE, group_report, groups_to_dict, print_groups
+from tlsbench import measure_tls, tls_summary, summary_to_dict, print_tls_report
+from sweep import SizeStats, parse_sizes, print_size_table
+from placement import Role, node_matrix, matrix_to_list, print_node_matrix
+from barrier import ContainerBarrier, BarrierRole, BARRIER_TICK, parse_barrier, barrier_summary
+
+# Result queues of the clients, created by create_queues at the start of each run
+SUB_QUEUE = None
+PUB_QUEUE = None
+# Requested vs achieved publish rate of the rate-controlled publishers
+RATE_QUEUE = None
+# Broker acknowledgement (PUBACK/PUBCOMP) latency histograms of the QoS 1/2 publishers
+ACK_QUEUE = None
+# End-to-end delay histograms of the subscribers
+E2E_QUEUE = None
+# Connection attempts of all the clients, with the instants of the CONNECT and of the CONNACK
+CONNECT_QUEUE = None
+# Offline backlog drained by the subscribers of the backlog scenario
+BACKLOG_QUEUE = None
+# Lost, duplicated and reordered messages of each publisher heard by the subscribers
+SEQUENCE_QUEUE = None
+# Messages received by each member of the shared subscription groups
+SHARE_QUEUE = None
+# Messages and e2e delays of the subscribers by payload size class of the size sweep
+SIZE_QUEUE = None
+# E2E delay histograms of the subscribers by broker node of the publishers, for the cross-node matrix
+NODE_QUEUE = None
+# MQTT v5 reason codes of the CONNACK, SUBACK and DISCONNECT packets received by the clients
+REASON_QUEUE = None
+# Start skew of the publishers released by the start barrier, from the shared start instant
+BARRIER_QUEUE = None
+# Seconds between two checks of the inter-message timeout of the subscribers
+WATCHDOG_TICK = 1.0
+# Seconds the subscribers of the backlog scenario stay disconnected
+OFFLINE_PERIOD = 10.0
+# Seconds an MQTT v5 broker keeps the persistent sessions, 3.1.1 sessions never expire
+SESSION_EXPIRY = 3600
+# QoS 1/2 messages of a publisher awaiting their acknowledgement, the default of paho
+MAX_INFLIGHT = 20
 
 
 class ContainerTimeoutError(Exception):
@@ -95,6 +146,28 @@ class ContainerShortMessageError(Exception):
             return "Message size is too small"
 
 
+class Engines:
+    PROCESS = 'process'
+    ASYNCIO = 'asyncio'
+    THREAD = 'thread'
+    ALL = (PROCESS, ASYNCIO, THREAD)
+
+
+class MQTTProtocol:
+    V311 = '3.1.1'
+    V5 = '5'
+    ALL = (V311, V5)
+
+
+class Scenarios:
+    # Clean sessions, the subscribers stay connected for the whole run
+    STEADY = 'steady'
+    # Persistent sessions, the subscribers go offline after subscribing and drain the queued messages
+    # when they reconnect
+    BACKLOG = 'backlog'
+    ALL = (STEADY, BACKLOG)
+
+
 class ContainersQueueError(Exception):
     def __str__(self):
         err_str = 'Something went horribly wrong, there are less results than sub threads' + '\n'
@@ -119,6 +192,7 @@ class Keywords:
     CONTAINER_IP_RANGE_STOP = 'stop'
     CONTAINER_BROKER = 'hostname'
     DESCRIPTION = 'description'
+    SHARE_GROUP = 'share_group'
 
 
 class CommandLineKeywords:
@@ -139,6 +213,45 @@ class CommandLineKeywords:
     CACERT = 'cacert'
     USERNAME = 'username'
     PASSWORD = 'password'
+    ENGINE = 'engine'
+    WORKERS = 'workers'
+    MESSAGE_SIZE = 'msg_size'
+    MESSAGE_SIZES = 'msg_sizes'
+    PAYLOAD_ENTROPY = 'payload_entropy'
+    PAYLOAD_SEED = 'payload_seed'
+    HEADER_FORMAT = 'header_format'
+    RATE = 'rate'
+    CONTAINER_RATE = 'container_rate'
+    ARRIVAL = 'arrival'
+    BURST_ON = 'burst_on'
+    BURST_OFF = 'burst_off'
+    ARRIVAL_SEED = 'arrival_seed'
+    HISTOGRAM_PRECISION = 'histogram_precision'
+    LOG_SAMPLE = 'log_sample'
+    LOG_FORMAT = 'log_format'
+    RING_SIZE = 'ring_size'
+    CLOCK_SAMPLES = 'clock_samples'
+    CLOCK_TIMEOUT = 'clock_timeout'
+    TLS_CONNECTIONS = 'tls_connections'
+    PLACEMENT = 'placement'
+    CONNECT_RATE = 'connect_rate'
+    RAMP = 'ramp'
+    RAMP_STEP = 'ramp_step'
+    SCENARIO = 'scenario'
+    OFFLINE_PERIOD = 'offline_period'
+    TOPIC_TREE_DEPTH = 'topic_tree_depth'
+    TOPIC_TREE_BRANCHING = 'topic_tree_branching'
+    TOPIC_TREE_SINGLE_LEVEL = 'topic_tree_single_level'
+    TOPIC_TREE_MULTI_LEVEL = 'topic_tree_multi_level'
+    TOPIC_TREE_SEED = 'topic_tree_seed'
+    TOPIC_TREE_PUB_CONTAINERS = 'topic_tree_pub_containers'
+    SHARE_GROUP = 'share_group'
+    SHARE_FORMAT = 'share_format'
+    SHARE_IDLE = 'share_idle'
+    PROTOCOL = 'protocol'
+    TOPIC_ALIASES = 'topic_aliases'
+    MAX_INFLIGHT = 'max_inflight'
+    BARRIER = 'barrier'
 
 
 class EnvironmentVariablesKeywords:
@@ -160,6 +273,45 @@ class EnvironmentVariablesKeywords:
     USERNAME = 'CLIENT_USERNAME'
     PASSWORD = 'CLIENT_PASSWORD'
     CONTAINER_HOST = 'HOSTNAME'
+    ENGINE = 'CLIENT_ENGINE'
+    WORKERS = 'CLIENT_WORKERS'
+    MESSAGE_SIZE = 'CLIENT_MESSAGE_SIZE'
+    MESSAGE_SIZES = 'CLIENT_MESSAGE_SIZES'
+    PAYLOAD_ENTROPY = 'CLIENT_PAYLOAD_ENTROPY'
+    PAYLOAD_SEED = 'CLIENT_PAYLOAD_SEED'
+    HEADER_FORMAT = 'CLIENT_HEADER_FORMAT'
+    RATE = 'CLIENT_RATE'
+    CONTAINER_RATE = 'CLIENT_CONTAINER_RATE'
+    ARRIVAL = 'CLIENT_ARRIVAL'
+    BURST_ON = 'CLIENT_BURST_ON'
+    BURST_OFF = 'CLIENT_BURST_OFF'
+    ARRIVAL_SEED = 'CLIENT_ARRIVAL_SEED'
+    HISTOGRAM_PRECISION = 'CLIENT_HISTOGRAM_PRECISION'
+    LOG_SAMPLE = 'CLIENT_LOG_SAMPLE'
+    LOG_FORMAT = 'CLIENT_LOG_FORMAT'
+    RING_SIZE = 'CLIENT_RING_SIZE'
+    CLOCK_SAMPLES = 'CLIENT_CLOCK_SAMPLES'
+    CLOCK_TIMEOUT = 'CLIENT_CLOCK_TIMEOUT'
+    TLS_CONNECTIONS = 'CLIENT_TLS_CONNECTIONS'
+    PLACEMENT = 'CLIENT_PLACEMENT'
+    CONNECT_RATE = 'CLIENT_CONNECT_RATE'
+    RAMP = 'CLIENT_RAMP'
+    RAMP_STEP = 'CLIENT_RAMP_STEP'
+    SCENARIO = 'CLIENT_SCENARIO'
+    OFFLINE_PERIOD = 'CLIENT_OFFLINE_PERIOD'
+    TOPIC_TREE_DEPTH = 'CLIENT_TOPIC_TREE_DEPTH'
+    TOPIC_TREE_BRANCHING = 'CLIENT_TOPIC_TREE_BRANCHING'
+    TOPIC_TREE_SINGLE_LEVEL = 'CLIENT_TOPIC_TREE_SINGLE_LEVEL'
+    TOPIC_TREE_MULTI_LEVEL = 'CLIENT_TOPIC_TREE_MULTI_LEVEL'
+    TOPIC_TREE_SEED = 'CLIENT_TOPIC_TREE_SEED'
+    TOPIC_TREE_PUB_CONTAINERS = 'CLIENT_TOPIC_TREE_PUB_CONTAINERS'
+    SHARE_GROUP = 'CLIENT_SHARE_GROUP'
+    SHARE_FORMAT = 'CLIENT_SHARE_FORMAT'
+    SHARE_IDLE = 'CLIENT_SHARE_IDLE'
+    PROTOCOL = 'CLIENT_PROTOCOL'
+    TOPIC_ALIASES = 'CLIENT_TOPIC_ALIASES'
+    MAX_INFLIGHT = 'CLIENT_MAX_INFLIGHT'
+    BARRIER = 'CLIENT_BARRIER'
 
 
 class ClientParameters:
@@ -188,8 +340,9 @@ class ClientParameters:
                                os.getenv(EnvironmentVariablesKeywords.QOS), 0, 'qos')
         self.__msg = getattr(cmd_par, CommandLineKeywords.MESSAGE) or \
                      os.getenv(EnvironmentVariablesKeywords.MESSAGE)
+        # Docker passes the flag of the orchestrators as the string True or False
         self.__brief = getattr(cmd_par, CommandLineKeywords.BRIEF) or \
-                       os.getenv(EnvironmentVariablesKeywords.BRIEF) or False
+                       os.getenv(EnvironmentVariablesKeywords.BRIEF, '').lower() in ('true', '1')
         self.__multiple_topics = getattr(cmd_par, CommandLineKeywords.MULTIPLE_TOPICS) or \
                                  os.getenv(EnvironmentVariablesKeywords.MULTIPLE_TOPICS) or None
         self.__description = getattr(cmd_par, CommandLineKeywords.DESCRIPTION) or \
@@ -199,6 +352,118 @@ class ClientParameters:
                           os.getenv(EnvironmentVariablesKeywords.USERNAME) or None
         self.__password = getattr(cmd_par, CommandLineKeywords.PASSWORD) or \
                           os.getenv(EnvironmentVariablesKeywords.PASSWORD) or None
+        self.__engine = getattr(cmd_par, CommandLineKeywords.ENGINE) or \
+                        os.getenv(EnvironmentVariablesKeywords.ENGINE) or Engines.PROCESS
+        self.__workers = set_value(getattr(cmd_par, CommandLineKeywords.WORKERS),
+                                   os.getenv(EnvironmentVariablesKeywords.WORKERS), os.cpu_count() or 1,
+                                   'number of workers')
+        self.__msg_size = set_value(getattr(cmd_par, CommandLineKeywords.MESSAGE_SIZE),
+                                    os.getenv(EnvironmentVariablesKeywords.MESSAGE_SIZE), 1024, 'message size')
+        # Payload sizes of the sweep, published in phases of --pub-count messages, None for --msg-size only
+        _msg_sizes = getattr(cmd_par, CommandLineKeywords.MESSAGE_SIZES) or \
+                     os.getenv(EnvironmentVariablesKeywords.MESSAGE_SIZES)
+        self.__msg_sizes = parse_sizes(_msg_sizes) if _msg_sizes else None
+        self.__payload_entropy = getattr(cmd_par, CommandLineKeywords.PAYLOAD_ENTROPY) or \
+                                 os.getenv(EnvironmentVariablesKeywords.PAYLOAD_ENTROPY) or PayloadEntropy.RANDOM
+        self.__payload_seed = set_value(getattr(cmd_par, CommandLineKeywords.PAYLOAD_SEED),
+                                        os.getenv(EnvironmentVariablesKeywords.PAYLOAD_SEED), None, 'payload seed')
+        self.__header_format = getattr(cmd_par, CommandLineKeywords.HEADER_FORMAT) or \
+                               os.getenv(EnvironmentVariablesKeywords.HEADER_FORMAT) or HeaderFormat.BINARY
+        # Publish rates in msg/s, 0 publishes all the messages as fast as possible
+        self.__rate = set_float_value(getattr(cmd_par, CommandLineKeywords.RATE),
+                                      os.getenv(EnvironmentVariablesKeywords.RATE), 0, 'publish rate')
+        self.__container_rate = set_float_value(getattr(cmd_par, CommandLineKeywords.CONTAINER_RATE),
+                                                os.getenv(EnvironmentVariablesKeywords.CONTAINER_RATE), 0,
+                                                'container publish rate')
+        self.__arrival = getattr(cmd_par, CommandLineKeywords.ARRIVAL) or \
+                         os.getenv(EnvironmentVariablesKeywords.ARRIVAL) or ArrivalProcess.CONSTANT
+        self.__burst_on = set_float_value(getattr(cmd_par, CommandLineKeywords.BURST_ON),
+                                          os.getenv(EnvironmentVariablesKeywords.BURST_ON), 1.0, 'burst on period')
+        self.__burst_off = set_float_value(getattr(cmd_par, CommandLineKeywords.BURST_OFF),
+                                           os.getenv(EnvironmentVariablesKeywords.BURST_OFF), 1.0, 'burst off period')
+        self.__arrival_seed = set_value(getattr(cmd_par, CommandLineKeywords.ARRIVAL_SEED),
+                                        os.getenv(EnvironmentVariablesKeywords.ARRIVAL_SEED), None, 'arrival seed')
+        self.__histogram_precision = set_value(getattr(cmd_par, CommandLineKeywords.HISTOGRAM_PRECISION),
+                                               os.getenv(EnvironmentVariablesKeywords.HISTOGRAM_PRECISION),
+                                               DEFAULT_SIGNIFICANT_FIGURES, 'histogram precision')
+        # Fraction of the received messages written as rows of the log file
+        self.__log_sample = set_float_value(getattr(cmd_par, CommandLineKeywords.LOG_SAMPLE),
+                                            os.getenv(EnvironmentVariablesKeywords.LOG_SAMPLE), 1.0, 'log sample')
+        self.__log_format = getattr(cmd_par, CommandLineKeywords.LOG_FORMAT) or \
+                            os.getenv(EnvironmentVariablesKeywords.LOG_FORMAT) or LogFormat.CSV
+        self.__ring_size = set_value(getattr(cmd_par, CommandLineKeywords.RING_SIZE),
+                                     os.getenv(EnvironmentVariablesKeywords.RING_SIZE), RING_SIZE, 'ring size')
+        # Ping-pong exchanges with the clock responder before and after the measurements, 0 disables them. Off
+        # by default: without a responder every phase would wait for the clock timeout
+        self.__clock_samples = set_value(getattr(cmd_par, CommandLineKeywords.CLOCK_SAMPLES),
+                                         os.getenv(EnvironmentVariablesKeywords.CLOCK_SAMPLES), 0, 'clock samples')
+        self.__clock_timeout = set_float_value(getattr(cmd_par, CommandLineKeywords.CLOCK_TIMEOUT),
+                                               os.getenv(EnvironmentVariablesKeywords.CLOCK_TIMEOUT), CLOCK_TIMEOUT,
+                                               'clock timeout')
+        # Full and resumed TLS handshakes measured before the clients connect, 0 disables them
+        self.__tls_connections = set_value(getattr(cmd_par, CommandLineKeywords.TLS_CONNECTIONS),
+                                           os.getenv(EnvironmentVariablesKeywords.TLS_CONNECTIONS), 0,
+                                           'TLS connections')
+        # Broker node of each client by role, computed by the orchestrators, None for all on --hostname
+        _placement = getattr(cmd_par, CommandLineKeywords.PLACEMENT) or \
+                     os.getenv(EnvironmentVariablesKeywords.PLACEMENT)
+        self.__placement = json.loads(_placement) if _placement else None
+        # Connections per second of the whole container, 0 connects all the clients at once
+        self.__connect_rate = set_float_value(getattr(cmd_par, CommandLineKeywords.CONNECT_RATE),
+                                              os.getenv(EnvironmentVariablesKeywords.CONNECT_RATE), 0,
+                                              'connection rate')
+        self.__ramp = getattr(cmd_par, CommandLineKeywords.RAMP) or \
+                      os.getenv(EnvironmentVariablesKeywords.RAMP) or RampProfile.LINEAR
+        self.__ramp_step = set_value(getattr(cmd_par, CommandLineKeywords.RAMP_STEP),
+                                     os.getenv(EnvironmentVariablesKeywords.RAMP_STEP), 1, 'ramp step')
+        self.__scenario = getattr(cmd_par, CommandLineKeywords.SCENARIO) or \
+                          os.getenv(EnvironmentVariablesKeywords.SCENARIO) or Scenarios.STEADY
+        self.__offline_period = set_float_value(getattr(cmd_par, CommandLineKeywords.OFFLINE_PERIOD),
+                                                os.getenv(EnvironmentVariablesKeywords.OFFLINE_PERIOD),
+                                                OFFLINE_PERIOD, 'offline period')
+        # Levels of the generated topic tree below --topic, 0 uses the topic itself
+        self.__topic_tree_depth = set_value(getattr(cmd_par, CommandLineKeywords.TOPIC_TREE_DEPTH),
+                                            os.getenv(EnvironmentVariablesKeywords.TOPIC_TREE_DEPTH), 0,
+                                            'topic tree depth')
+        self.__topic_tree_branching = set_value(getattr(cmd_par, CommandLineKeywords.TOPIC_TREE_BRANCHING),
+                                                os.getenv(EnvironmentVariablesKeywords.TOPIC_TREE_BRANCHING), 2,
+                                                'topic tree branching')
+        self.__topic_tree_single_level = set_float_value(
+            getattr(cmd_par, CommandLineKeywords.TOPIC_TREE_SINGLE_LEVEL),
+            os.getenv(EnvironmentVariablesKeywords.TOPIC_TREE_SINGLE_LEVEL), 0.0, 'single-level wildcard ratio')
+        self.__topic_tree_multi_level = set_float_value(
+            getattr(cmd_par, CommandLineKeywords.TOPIC_TREE_MULTI_LEVEL),
+            os.getenv(EnvironmentVariablesKeywords.TOPIC_TREE_MULTI_LEVEL), 0.0, 'multi-level wildcard ratio')
+        self.__topic_tree_seed = set_value(getattr(cmd_par, CommandLineKeywords.TOPIC_TREE_SEED),
+                                           os.getenv(EnvironmentVariablesKeywords.TOPIC_TREE_SEED), None,
+                                           'topic tree seed')
+        self.__topic_tree_pub_containers = set_value(getattr(cmd_par, CommandLineKeywords.TOPIC_TREE_PUB_CONTAINERS),
+                                                     os.getenv(EnvironmentVariablesKeywords.TOPIC_TREE_PUB_CONTAINERS),
+                                                     1, 'topic tree publisher containers')
+        # Shared subscription group of the subscribers, None for plain subscriptions
+        self.__share_group = getattr(cmd_par, CommandLineKeywords.SHARE_GROUP) or \
+                             os.getenv(EnvironmentVariablesKeywords.SHARE_GROUP) or None
+        self.__share_format = getattr(cmd_par, CommandLineKeywords.SHARE_FORMAT) or \
+                              os.getenv(EnvironmentVariablesKeywords.SHARE_FORMAT) or ShareFormat.STANDARD
+        self.__share_idle = set_float_value(getattr(cmd_par, CommandLineKeywords.SHARE_IDLE),
+                                            os.getenv(EnvironmentVariablesKeywords.SHARE_IDLE), SHARE_IDLE,
+                                            'shared group idle time')
+        # The groups of the container by name, created before the subscribers are started
+        self.__share_groups = {}
+        self.__protocol = getattr(cmd_par, CommandLineKeywords.PROTOCOL) or \
+                          os.getenv(EnvironmentVariablesKeywords.PROTOCOL) or MQTTProtocol.V311
+        # Topic aliases of each MQTT v5 publisher, 0 always sends the topic name
+        self.__topic_aliases = set_value(getattr(cmd_par, CommandLineKeywords.TOPIC_ALIASES),
+                                         os.getenv(EnvironmentVariablesKeywords.TOPIC_ALIASES), 0, 'topic aliases')
+        # QoS 1/2 messages of each publisher in flight at once, 0 for no limit
+        self.__max_inflight = set_value(getattr(cmd_par, CommandLineKeywords.MAX_INFLIGHT),
+                                        os.getenv(EnvironmentVariablesKeywords.MAX_INFLIGHT), MAX_INFLIGHT,
+                                        'max inflight')
+        # Containers of each role expected at the start barrier of the run, None without a barrier
+        self.__barrier = parse_barrier(getattr(cmd_par, CommandLineKeywords.BARRIER) or
+                                       os.getenv(EnvironmentVariablesKeywords.BARRIER))
+        # The address of the container identifies it in the message headers, the logs and the clock files
+        self.__container = container_address()
         self.__auth = None
         self.__tls = None
 
@@ -278,6 +543,234 @@ class ClientParameters:
     def tls(self):
         return self.__tls
 
+    @property
+    def engine(self):
+        return self.__engine
+
+    @property
+    def workers(self):
+        return self.__workers
+
+    @property
+    def msg_size(self):
+        return self.__msg_size
+
+    @property
+    def msg_sizes(self):
+        return self.__msg_sizes
+
+    @property
+    def sweep_phases(self):
+        """The publishing phases, one per size of the sweep"""
+        return len(self.__msg_sizes) if self.__msg_sizes else 1
+
+    @property
+    def payload_entropy(self):
+        return self.__payload_entropy
+
+    @property
+    def payload_seed(self):
+        return self.__payload_seed
+
+    @property
+    def header_format(self):
+        return self.__header_format
+
+    @property
+    def rate(self):
+        return self.__rate
+
+    @property
+    def container_rate(self):
+        return self.__container_rate
+
+    @property
+    def arrival(self):
+        return self.__arrival
+
+    @property
+    def burst_on(self):
+        return self.__burst_on
+
+    @property
+    def burst_off(self):
+        return self.__burst_off
+
+    @property
+    def arrival_seed(self):
+        return self.__arrival_seed
+
+    @property
+    def histogram_precision(self):
+        return self.__histogram_precision
+
+    @property
+    def log_sample(self):
+        return self.__log_sample
+
+    @property
+    def log_format(self):
+        return self.__log_format
+
+    @property
+    def ring_size(self):
+        return self.__ring_size
+
+    @property
+    def clock_samples(self):
+        return self.__clock_samples
+
+    @property
+    def clock_timeout(self):
+        return self.__clock_timeout
+
+    @property
+    def tls_connections(self):
+        return self.__tls_connections
+
+    @property
+    def placement(self):
+        return self.__placement
+
+    def client_node(self, role: str, index: int) -> str:
+        """The broker node of the client of the role created in the given position, cycling through the plan
+        when the container runs more clients than planned"""
+        _nodes = (self.__placement or {}).get(role)
+        if not _nodes:
+            return self.__hostname
+        return _nodes[index % len(_nodes)] or self.__hostname
+
+    @property
+    def connect_rate(self):
+        return self.__connect_rate
+
+    @property
+    def ramp(self):
+        return self.__ramp
+
+    @property
+    def ramp_step(self):
+        return self.__ramp_step
+
+    @property
+    def scenario(self):
+        return self.__scenario
+
+    @property
+    def offline_period(self):
+        return self.__offline_period
+
+    @property
+    def topic_tree_depth(self):
+        return self.__topic_tree_depth
+
+    @property
+    def share_group(self):
+        return self.__share_group
+
+    @property
+    def share_format(self):
+        return self.__share_format
+
+    @property
+    def share_groups(self):
+        return self.__share_groups
+
+    @property
+    def protocol(self):
+        return self.__protocol
+
+    @property
+    def topic_aliases(self):
+        return self.__topic_aliases
+
+    @property
+    def max_inflight(self):
+        return self.__max_inflight
+
+    @property
+    def barrier(self):
+        return self.__barrier
+
+    @property
+    def container(self):
+        return self.__container
+
+    @property
+    def sub_offline_period(self):
+        """Seconds each subscriber stays disconnected, 0 when the subscribers are always connected"""
+        return self.__offline_period if self.__scenario == Scenarios.BACKLOG else 0
+
+    @property
+    def client_rate(self):
+        """The rate of each publisher, the container rate is split evenly among the publishers"""
+        if self.__container_rate:
+            return self.__container_rate / max(self.__pub_clients, 1)
+        return self.__rate
+
+    def topic_tree(self) -> TopicTree:
+        """The topic tree of the wildcard fan-out scenario rooted at --topic, None if disabled"""
+        if not self.__topic_tree_depth:
+            return None
+        return TopicTree(self.__topic, self.__topic_tree_depth, self.__topic_tree_branching, self.__pub_clients,
+                         self.__sub_clients, single_level=self.__topic_tree_single_level,
+                         multi_level=self.__topic_tree_multi_level, seed=self.__topic_tree_seed)
+
+    def tree_expected_messages(self, tree: TopicTree) -> list:
+        """The messages each subscriber waits for, published by all the publisher containers"""
+        return tree.expected_messages(self.__pub_count, self.__topic_tree_pub_containers)
+
+    def get_share_group(self, name: str = None) -> ShareGroup:
+        """The shared subscription group of the given name, by default the one of --share-group, None for
+        plain subscriptions. The members of the container wait together for --sub-count messages"""
+        name = name or self.__share_group
+        if name is None:
+            return None
+        if name not in self.__share_groups:
+            self.__share_groups[name] = ShareGroup(name, self.__sub_count * self.sweep_phases,
+                                                   share_format=self.__share_format,
+                                                   idle=self.__share_idle)
+        return self.__share_groups[name]
+
+    def connect_ramp(self) -> ConnectRamp:
+        """The pacing of the connections of the clients, None to connect them all at once"""
+        if not self.__connect_rate:
+            return None
+        return ConnectRamp(self.__connect_rate, profile=self.__ramp, step=self.__ramp_step)
+
+    def pub_options(self) -> dict:
+        """The keyword arguments shared by all the publishers of the container"""
+        return {
+            'msg_size': self.msg_size,
+            'msg_sizes': self.msg_sizes,
+            'payload_entropy': self.payload_entropy,
+            'payload_seed': self.payload_seed,
+            'header_format': self.header_format,
+            'rate': self.client_rate,
+            'arrival': self.arrival,
+            'burst_on': self.burst_on,
+            'burst_off': self.burst_off,
+            'arrival_seed': self.arrival_seed,
+            'histogram_precision': self.histogram_precision,
+            'container_id': host_id(self.container),
+            'protocol': self.protocol,
+            'topic_aliases': self.topic_aliases,
+            'max_inflight': self.max_inflight
+        }
+
+    def sub_options(self) -> dict:
+        """The keyword arguments shared by all the subscribers of the container"""
+        return {
+            'histogram_precision': self.histogram_precision,
+            'log_sample': self.log_sample,
+            'container_id': host_id(self.container),
+            'offline_period': self.sub_offline_period,
+            'share_group': self.get_share_group(),
+            'protocol': self.protocol,
+            'size_classes': self.msg_sizes,
+            'node_matrix': self.__placement is not None
+        }
+
     def validate_parameters(self):
         if self.__topic is None and self.__multiple_topics is None:
             raise Exception('The parameters --topic and --multiple-topics can not be both None type')
@@ -295,6 +788,9 @@ class ClientParameters:
         is_positive(self.__pub_clients, 'number of publishers')
         is_positive(self.__sub_count, 'number of messages per subscriber')
         is_positive(self.__pub_count, 'number of messages per publisher')
+        if self.__msg_sizes and self.__header_format != HeaderFormat.PROPERTIES and \
+                min(self.__msg_sizes) < HEADER_SIZE:
+            raise ContainerShortMessageError(HEADER_SIZE)
 
         if isinstance(self.__qos, int):
             if self.__qos not in [0, 1, 2]:
@@ -302,6 +798,70 @@ class ClientParameters:
         else:
             raise Exception('The QOS parameter must be int type ')
 
+        if self.__engine not in Engines.ALL:
+            raise Exception(f'The engine parameter must be one of {Engines.ALL}')
+        if self.__workers < 1:
+            raise Exception('The number of workers must be at least 1')
+        if self.__payload_entropy not in PayloadEntropy.ALL:
+            raise Exception(f'The payload entropy must be one of {PayloadEntropy.ALL}')
+        if self.__header_format not in HeaderFormat.ALL:
+            raise Exception(f'The header format must be one of {HeaderFormat.ALL}')
+        if self.__protocol not in MQTTProtocol.ALL:
+            raise Exception(f'The MQTT protocol version must be one of {MQTTProtocol.ALL}')
+        if self.__header_format == HeaderFormat.PROPERTIES and self.__protocol != MQTTProtocol.V5:
+            raise Exception('The properties header format needs MQTT v5 (--protocol 5)')
+        is_positive(self.__topic_aliases, 'number of topic aliases')
+        is_positive(self.__max_inflight, 'number of messages in flight')
+        if self.__rate < 0 or self.__container_rate < 0:
+            raise Exception('The publish rates must be positive')
+        if self.__arrival not in ArrivalProcess.ALL:
+            raise Exception(f'The arrival process must be one of {ArrivalProcess.ALL}')
+        if self.__burst_on <= 0 or self.__burst_off < 0:
+            raise Exception('The burst on period must be positive and the off period not negative')
+        if not 1 <= self.__histogram_precision <= 5:
+            raise Exception('The histogram precision must be between 1 and 5 significant figures')
+        if not 0 <= self.__log_sample <= 1:
+            raise Exception('The log sample must be a fraction between 0 and 1')
+        if self.__log_format not in LogFormat.ALL:
+            raise Exception(f'The log format must be one of {LogFormat.ALL}')
+        if self.__ring_size < 1:
+            raise Exception('The ring size must be at least 1')
+        is_positive(self.__clock_samples, 'number of clock samples')
+        if self.__clock_timeout <= 0:
+            raise Exception('The clock timeout must be positive')
+        is_positive(self.__tls_connections, 'number of TLS connections')
+        if self.__tls_connections and not self.__cacert:
+            raise Exception('The TLS handshakes are measured against the broker of --cacert, which must be set')
+        if self.__connect_rate < 0:
+            raise Exception('The connection rate must be positive')
+        if self.__ramp not in RampProfile.ALL:
+            raise Exception(f'The ramp profile must be one of {RampProfile.ALL}')
+        if self.__ramp_step < 1:
+            raise Exception('The ramp step must be at least 1 client')
+        is_positive(self.__topic_tree_depth, 'topic tree depth')
+        if self.__topic_tree_depth:
+            if self.__topic is None:
+                raise Exception('The topic tree is rooted at --topic, which must be set')
+            if self.__topic_tree_branching < 1 or self.__topic_tree_pub_containers < 1:
+                raise Exception('The topic tree branching and publisher containers must be at least 1')
+            if self.__topic_tree_single_level < 0 or self.__topic_tree_multi_level < 0 or \
+                    self.__topic_tree_single_level + self.__topic_tree_multi_level > 1:
+                raise Exception('The wildcard ratios of the topic tree must be fractions with a sum of at most 1')
+        if self.__share_format not in ShareFormat.ALL:
+            raise Exception(f'The shared subscription format must be one of {ShareFormat.ALL}')
+        if self.__share_idle <= 0:
+            raise Exception('The shared group idle time must be positive')
+        if self.__share_group is not None and self.__topic_tree_depth:
+            raise Exception('The subscribers of a topic tree can not be members of a shared group')
+        if self.__scenario not in Scenarios.ALL:
+            raise Exception(f'The scenario must be one of {Scenarios.ALL}')
+        if self.__scenario == Scenarios.BACKLOG:
+            if self.__offline_period <= 0:
+                raise Exception('The offline period of the backlog scenario must be positive')
+            if self.__qos == 0:
+                print('Warning: most brokers do not queue QoS 0 messages for offline subscribers, '
+                      'the backlog scenario is meant for QoS 1 and 2')
+
         if self.__cacert:
             self.__tls = {'ca_certs': self.__cacert}
 
@@ -383,6 +943,9 @@ class MultipleTopics(object):
             else:
                 if not isinstance(topics, str):
                     raise ContainerUnexpectedTypeError(Keywords.TOPICS)
+            _share_group = get_item_from_json(group, Keywords.SHARE_GROUP)
+            if _share_group is not None and not isinstance(_share_group, str):
+                raise ContainerUnexpectedTypeError(Keywords.SHARE_GROUP, f'(row {_ind})')
 
         if self.__subscribers > self.__sub_clients:
             print(f'Error: The number of subscribers (--sub-clients {self.__sub_clients})  is smaller '
@@ -404,9 +967,105 @@ class MultipleTopics(object):
             # return argparse.ArgumentError('The JSON file could not be located')
 
 
+class InterMessageWatchdog:
+    """A single thread per process checking the inter-message timeout of all its subscribers on a coarse
+    tick, instead of a timer thread re-created at every message"""
+
+    def __init__(self, tick: float = WATCHDOG_TICK):
+        self.__tick = tick
+        self.__clients = set()
+        self.__lock = Lock()
+        self.__stopped = Event()
+        self.__thread = None
+
+    def watch(self, client):
+        with self.__lock:
+            self.__clients.add(client)
+            if self.__thread is None or not self.__thread.is_alive():
+                self.__stopped.clear()
+                self.__thread = Thread(target=self._run, name='intermsg-watchdog', daemon=True)
+                self.__thread.start()
+
+    def unwatch(self, client):
+        with self.__lock:
+            self.__clients.discard(client)
+
+    def stop(self):
+        self.__stopped.set()
+
+    def _run(self):
+        while not self.__stopped.wait(self.__tick):
+            _now = time.monotonic()
+            with self.__lock:
+                _expired = [client for client in self.__clients if client.intermsg_expired(_now)]
+                self.__clients.difference_update(_expired)
+                if not self.__clients:
+                    # The thread is started again by the next watched client
+                    self.__thread = None
+                    self.__stopped.set()
+            for client in _expired:
+                client.intermessage_timeout()
+
+
+_WATCHDOGS = {}
+_WATCHDOGS_LOCK = Lock()
+
+
+def get_watchdog() -> InterMessageWatchdog:
+    """The watchdog of the current process, the clients started as processes get their own one, the
+    clients of a thread engine worker share the one of the worker"""
+    _pid = os.getpid()
+    with _WATCHDOGS_LOCK:
+        if _pid not in _WATCHDOGS:
+            _WATCHDOGS[_pid] = InterMessageWatchdog()
+        return _WATCHDOGS[_pid]
+
+
+class BacklogDrain:
+    """The messages queued by the broker for a subscriber while it was offline, and how fast they arrive
+    once it reconnects. A message belongs to the backlog when it was published before the subscriber
+    reconnected, according to the timestamp in its header"""
+
+    def __init__(self):
+        self.offline_ns = None
+        self.reconnect_ns = None
+        self.connack_ns = None
+        self.session_present = None
+        self.__messages = 0
+        self.__last_ns = None
+
+    @property
+    def messages(self):
+        return self.__messages
+
+    def record(self, pub_timestamp: int, arrival_ns: int):
+        if self.reconnect_ns is not None and pub_timestamp < self.reconnect_ns:
+            self.__messages += 1
+            self.__last_ns = arrival_ns
+
+    def time_to_empty(self) -> float:
+        """Seconds from the reconnection to the arrival of the last queued message"""
+        if self.__last_ns is None:
+            return 0.0
+        return (self.__last_ns - self.reconnect_ns) / 1e9
+
+    def summary(self, client_id: str = None) -> dict:
+        _time_to_empty = self.time_to_empty()
+        return {
+            'client_id': client_id,
+            'session_present': self.session_present,
+            'offline': (self.reconnect_ns - self.offline_ns) / 1e9 if self.reconnect_ns else None,
+            'reconnect_latency': (self.connack_ns - self.reconnect_ns) / 1e9 if self.connack_ns else None,
+            'backlog': self.__messages,
+            'time_to_empty': _time_to_empty,
+            'drain_rate': self.__messages / _time_to_empty if _time_to_empty > 0 else 0.0
+        }
+
+
 class MQTTClient(multiprocessing.Process):
     def __init__(self, host, topic, port: int = 1883, client_id: str = None, tls=None, auth=None,
-                 timeout: int = 60, max_count: int = 10, qos: int = 0):
+                 timeout: int = 60, max_count: int = 10, qos: int = 0, clean_session: bool = True,
+                 session_id: str = '', protocol: str = MQTTProtocol.V311):
         super(MQTTClient, self).__init__()
         self.__hostname = host
         self.__port = port
@@ -420,7 +1079,24 @@ class MQTTClient(multiprocessing.Process):
         self.__end_time = None
         self.__timeout = timeout
         self.__qos = qos
-        self.__client = mqtt.Client()
+        self.__protocol = protocol
+        self.__clean_session = clean_session
+        # A persistent session is bound to the MQTT client id, which must be the same at the reconnection
+        if protocol == MQTTProtocol.V5:
+            # The clean start flag is given to connect() in MQTT v5
+            self.__client = mqtt.Client(client_id=session_id, protocol=mqtt.MQTTv5)
+        else:
+            self.__client = mqtt.Client(client_id=session_id, clean_session=clean_session)
+        self.connect_init = None
+        self.connect_accomplish = None
+        # Monotonic instant at which the client connects, set by the connection ramp (None: right away)
+        self.connect_at = None
+        self.__connect_start_ns = None
+        # Set by the asyncio engine to the event loop driving the client
+        self.event_loop = None
+        # Start barrier of the container, set when the run is coordinated across the containers
+        self.barrier = None
+        self.__barrier_ready = False
 
     @property
     def hostname(self):
@@ -474,6 +1150,10 @@ class MQTTClient(multiprocessing.Process):
     def client(self):
         return self.__client
 
+    @property
+    def protocol(self):
+        return self.__protocol
+
     @topic.setter
     def topic(self, value):
         self.__topic = value
@@ -490,17 +1170,116 @@ class MQTTClient(multiprocessing.Process):
     def end_time(self, value):
         self.__end_time = value
 
+    def configure_client(self):
+        """Sets the TLS/auth options of the paho client, without connecting it"""
+        if self.tls:
+            self.client.tls_set(**self.tls)
+        if self.auth:
+            self.client.username_pw_set(**self.auth)
+        if self.__protocol == MQTTProtocol.V5:
+            self.client.on_disconnect = self.on_disconnect
+
+    def connect_delay(self, now: float = None) -> float:
+        """Seconds to wait for the connection slot of the client, 0 if it is due"""
+        if self.connect_at is None:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.connect_at - now)
+
+    def connect_client(self):
+        self.connect_init = datetime.datetime.utcnow()
+        self.__connect_start_ns = time.monotonic_ns()
+        if self.__protocol == MQTTProtocol.V5:
+            _properties = None
+            if not self.__clean_session:
+                _properties = Properties(PacketTypes.CONNECT)
+                _properties.SessionExpiryInterval = SESSION_EXPIRY
+            self.client.connect(self.hostname, port=self.port, clean_start=self.__clean_session,
+                                properties=_properties)
+        else:
+            self.client.connect(self.hostname, port=self.port)
+
+    def connack_received(self, rc):
+        """Reports the CONNECT to CONNACK latency of the client, None for a refused connection"""
+        _connack_ns = time.monotonic_ns() if rc == 0 else None
+        self.reason_received('CONNACK', rc)
+        if rc == 0:
+            self.connect_accomplish = datetime.datetime.utcnow()
+        else:
+            print(f'Client {self.client_id} connection refused: {reason_string(rc)}')
+        CONNECT_QUEUE.put((self.client_id, self.__connect_start_ns, _connack_ns))
+
+    def barrier_ready(self, role: str) -> bool:
+        """Counts the client at the start barrier once, whatever its reconnections and resubscriptions
+        :return: False if the client was already counted
+        """
+        if self.__barrier_ready:
+            return False
+        self.__barrier_ready = True
+        self.barrier.ready(role)
+        return True
+
+    def reason_received(self, packet: str, reason_code):
+        """Reports the reason code of an MQTT v5 packet, the 3.1.1 return codes are not collected"""
+        if isinstance(reason_code, ReasonCodes):
+            REASON_QUEUE.put((self.client_id, packet, reason_code.value, reason_code.getName()))
+
+    def on_disconnect(self, client, userdata, rc, properties=None):
+        # Sent by the broker (e.g. session taken over, quota exceeded) or Success for our own disconnection
+        self.reason_received('DISCONNECT', rc)
+
+    def stop_client(self):
+        """Stops the network loop and the process hosting the client, if any"""
+        self.client.loop_stop()
+        try:
+            self.terminate()
+        except AttributeError:
+            # The client is not running in its own process (e.g. asyncio engine)
+            pass
+
+    def done(self) -> bool:
+        """Whether the client has finished its work and can be disconnected"""
+        return self.end_time is not None
+
+    def report(self):
+        """Pushes the client results to the main process once it has finished"""
+
     def run(self) -> None: ...
 
 
 class Sub(MQTTClient):
-    def __init__(self, *args, intermsg_timeout: int = 120, **kwargs):
+    def __init__(self, *args, intermsg_timeout: int = 120, histogram_precision: int = DEFAULT_SIGNIFICANT_FIGURES,
+                 log_sample: float = 1.0, container_id: int = 0, offline_period: float = 0,
+                 share_group: ShareGroup = None, size_classes: list = None, node_matrix: bool = False, **kwargs):
+        if size_classes:
+            # The subscriber waits for the messages of every phase of the size sweep
+            kwargs['max_count'] = kwargs.get('max_count', 10) * len(size_classes)
+        if offline_period:
+            # Persistent session with an id unique among the containers
+            kwargs.update(clean_session=False, session_id=f'mqttbench-{container_id}-{kwargs.get("client_id")}')
         MQTTClient.__init__(self, *args, **kwargs)
+        self.__offline_period = offline_period
+        # Set once the subscriptions are acknowledged and the subscriber has gone offline
+        self.__backlog = None
+        self.__pending_subscriptions = 0
+        self.__e2e_histogram = LatencyHistogram(histogram_precision)
+        self.__histogram_reported = False
+        self.__sequences = SequenceTracker()
+        self.__size_stats = SizeStats(size_classes, histogram_precision) if size_classes else None
+        self.__histogram_precision = histogram_precision
+        # E2E delays by broker node of the publishers, when the clients are spread over a cluster
+        self.__node_histograms = {} if node_matrix else None
+        self.__log_sample = log_sample
+        # Shared memory ring where the rows of the log are written, set before the client is started
+        self.__log_ring = None
+        self.__host_id = host_id(self.hostname)
+        self.__sub_number = client_number(self.client_id)
+        self.__container_id = container_id
         self.__end_time_lock = multiprocessing.Lock()
         self.__finished = False
         self.__intermsg_timeout = intermsg_timeout
-        self.__intermsg_timer = Timer(self.__intermsg_timeout * 2, self._intermessage_timeout)
-        self.__intermsg_timer.start()
+        # Monotonic deadline of the next message, checked by the watchdog of the process
+        self.__intermsg_deadline = None
         self.__received_msgs = 0
         # print(f'The topics in ({self.hostname}, {self.client_id})')
         # check if topic has been given as a strig, which in json is passed in a string format
@@ -509,11 +1288,44 @@ class Sub(MQTTClient):
             topic_list = self._json_str_to_list(self.topic)
             if len(topic_list) > 0:
                 self.topic = topic_list
+        self.__share_group = share_group
+        if share_group is not None:
+            # Member of the group, the messages of the topics are split among the members
+            self.topic = share_group.filter(self.topic)
 
     @property
     def finished(self):
         return self.__finished
 
+    @property
+    def intermsg_timeout(self):
+        return self.__intermsg_timeout
+
+    @property
+    def e2e_histogram(self):
+        return self.__e2e_histogram
+
+    @property
+    def timeout(self):
+        # The offline period does not count against the subscriber timeout
+        return MQTTClient.timeout.fget(self) + self.__offline_period
+
+    @property
+    def backlog(self):
+        return self.__backlog
+
+    @property
+    def share_group(self):
+        return self.__share_group
+
+    @property
+    def log_ring(self):
+        return self.__log_ring
+
+    @log_ring.setter
+    def log_ring(self, value):
+        self.__log_ring = value
+
     @staticmethod
     def _json_str_to_list(json_str):
         _json_list_1 = re.findall(r"'(.*?)'", json_str)
@@ -529,68 +1341,152 @@ class Sub(MQTTClient):
             _json_list_1 = _json_list_2
         return _json_list_1
 
-    def _intermessage_timeout(self):
+    def intermsg_expired(self, now: float) -> bool:
+        return self.__intermsg_deadline is not None and now > self.__intermsg_deadline
+
+    def intermessage_timeout(self):
         # print('Timeout expired; Stopping the client')
         self.__finished = True
         # self.terminate()
         # self.client.loop_stop()
 
         print('Timeout: Stopping the client')
-        self.client.loop_stop()
-        try:
-            print('Timeout: Terminating process')
-            self.terminate()
-        except AttributeError:
-            pass
-
-
-    def on_connect(self, client, userdata, flags, rc):
+        if self.__e2e_histogram.count:
+            # Keep the delays of the messages received before the timeout
+            self.report_histogram()
+        self.report_backlog()
+        self.stop_client()
+
+    def connect_client(self):
+        # The first message is given twice the inter-message timeout, as before the watchdog
+        self.__intermsg_deadline = time.monotonic() + self.__intermsg_timeout * 2
+        get_watchdog().watch(self)
+        MQTTClient.connect_client(self)
+
+    def stop_client(self):
+        get_watchdog().unwatch(self)
+        MQTTClient.stop_client(self)
+
+    def on_connect(self, client, userdata, flags, rc, properties=None):
+        if self.__backlog is not None:
+            self.reconnected(flags, rc)
+            return
+        self.connack_received(rc)
         # Added the condition to connect to passed topic
         if rc == 0:
             print(f'Client {self.client_id} connected to {self.hostname}')
             print(f'Client {self.client_id} subscribing to topics: {self.topic}')
-            if isinstance(self.topic, str):
-                # Single topic
-                client.subscribe(self.topic, qos=self.qos)
-            elif isinstance(self.topic, (list, tuple)):
-                # Multiple topics
-                for _topic in set(self.topic):
-                    client.subscribe(_topic, qos=self.qos)
-
-    def on_subscribe(self, client, obj, mid, granted_qos):
-        print(f'Client {self.client_id} subscribed to {self.hostname} with granted qos: {granted_qos}')
+            self.subscribe(client)
+
+    def subscribe(self, client):
+        if isinstance(self.topic, str):
+            # Single topic
+            self.__pending_subscriptions = 1
+            client.subscribe(self.topic, qos=self.qos)
+        elif isinstance(self.topic, (list, tuple)):
+            # Multiple topics
+            self.__pending_subscriptions = len(set(self.topic))
+            for _topic in set(self.topic):
+                client.subscribe(_topic, qos=self.qos)
+
+    def on_subscribe(self, client, obj, mid, granted_qos, properties=None):
+        print(f'Client {self.client_id} subscribed to {self.hostname} with granted qos: '
+              f'{", ".join(map(str, granted_qos))}')
+        for _reason_code in granted_qos:
+            # MQTT v5 gives a reason code per filter, e.g. shared subscriptions not supported
+            self.reason_received('SUBACK', _reason_code)
         # print("Subscribed: " + str(mid) + " " + str(granted_qos))
+        self.__pending_subscriptions -= 1
+        if self.barrier is not None and self.__pending_subscriptions == 0:
+            self.barrier_ready(BarrierRole.SUB)
+        if self.__offline_period and self.__backlog is None and self.__pending_subscriptions <= 0:
+            self.go_offline(client)
+
+    def go_offline(self, client):
+        """Leaves the broker with the session open, the messages published meanwhile are queued for
+        the subscriber until it comes back online"""
+        print(f'Client {self.client_id} going offline for {self.__offline_period} s')
+        self.__backlog = BacklogDrain()
+        # The inter-message timeout is suspended while the subscriber is away
+        self.__intermsg_deadline = None
+        self.__backlog.offline_ns = time.time_ns()
+        client.disconnect()
+        if self.event_loop is not None:
+            self.event_loop.call_later(self.__offline_period, self.come_back_online)
+        else:
+            Timer(self.__offline_period, self.come_back_online).start()
+
+    def come_back_online(self):
+        if self.__finished:
+            return
+        self.__intermsg_deadline = time.monotonic() + self.__intermsg_timeout * 2
+        if self.event_loop is None:
+            # The network thread has ended with the disconnection
+            self.client.loop_stop()
+        self.__backlog.reconnect_ns = time.time_ns()
+        try:
+            self.client.reconnect()
+        except OSError as err:
+            print(f'Client {self.client_id} could not reconnect to {self.hostname}: {err}')
+            return
+        if self.event_loop is None:
+            self.client.loop_start()
+
+    def reconnected(self, flags, rc):
+        self.__backlog.connack_ns = time.time_ns()
+        self.reason_received('CONNACK', rc)
+        if rc != 0:
+            print(f'Client {self.client_id} reconnection refused: {reason_string(rc)}')
+            return
+        self.__backlog.session_present = bool(flags.get('session present'))
+        print(f'Client {self.client_id} back online (session present: {self.__backlog.session_present})')
+        if not self.__backlog.session_present:
+            # The broker has lost the session, nothing is queued and the subscriptions are gone
+            self.subscribe(self.client)
 
     def on_message(self, client, userdata, msg):
-        self.__intermsg_timer.cancel()
-        self.__intermsg_timer = Timer(self.__intermsg_timeout, self._intermessage_timeout)
-        self.__intermsg_timer.start()
-
+        if self.__finished or is_control_topic(msg.topic):
+            # Messages still in flight when the asyncio engine has not yet disconnected the client, or
+            # clock synchronisation traffic matched by a wildcard subscription
+            return
+        _msg_arrival_time = time.time_ns()
+        self.__intermsg_deadline = time.monotonic() + self.__intermsg_timeout
         if self.start_time is None:
             self.start_time = datetime.datetime.utcnow()
-        _msg_arrival_time = datetime.datetime.utcnow()
         # Parse the msg
-        _pub_msg_dictt = parse_msg(msg)
-        if isinstance(_pub_msg_dictt['publish_timestamp'], datetime.datetime):
-            _pub_msg_host = _pub_msg_dictt['hostname']
-            _pub_msg_pub_id = _pub_msg_dictt['pub_id']
+        _header = parse_msg(msg)
+        if _header is not None:
+            _pub_qos, _pub_host, _pub_id, _pub_seq, _pub_con_init, _pub_con_accomplish, _pub_timestamp, \
+                _pub_container = _header
+            # Nothing is printed per message: the Docker log of the container would grow with the run
             self.__received_msgs += 1
-            print(f'New message: Receiver ({self.hostname}, {self.client_id}) & '
-                  f'Sender ({_pub_msg_host}, {_pub_msg_pub_id}) & '
-                  f'Total received: {self.__received_msgs}')
 
-            # print('The dict parsing works')
-            _msg_e2e_delay = _msg_arrival_time - _pub_msg_dictt['publish_timestamp']
+            _e2e_delay = _msg_arrival_time - _pub_timestamp
+            self.__e2e_histogram.record(_e2e_delay)
+            if self.__size_stats is not None:
+                self.__size_stats.record(len(msg.payload), _msg_arrival_time, _e2e_delay)
+            if self.__node_histograms is not None:
+                _node_histogram = self.__node_histograms.get(_pub_host)
+                if _node_histogram is None:
+                    _node_histogram = self.__node_histograms[_pub_host] = LatencyHistogram(self.__histogram_precision)
+                _node_histogram.record(_e2e_delay)
+            if self.__share_group is None:
+                # The members of a shared group only see a part of the sequence of each publisher
+                self.__sequences.record(_pub_container, _pub_host, _pub_id, msg.topic, _pub_seq)
+            if self.__backlog is not None:
+                self.__backlog.record(_pub_timestamp, _msg_arrival_time)
             # Write the result
-            write_to_log(pub_host=_pub_msg_dictt['hostname'], pub_id=_pub_msg_dictt['pub_id'],
-                         pub_con_init=_pub_msg_dictt['pub_con_init'],
-                         pub_con_accomplish=_pub_msg_dictt['pub_con_accomplish'],
-                         pub_timestamp=_pub_msg_dictt['publish_timestamp'], pub_qos=_pub_msg_dictt['pub_qos'],
-                         sub_host=self.hostname, sub_id=self.client_id, sub_timestamp=_msg_arrival_time,
-                         e2e_delay=_msg_e2e_delay)
+            if self.__log_ring is not None and (self.__log_sample >= 1 or random.random() < self.__log_sample):
+                write_to_log(self.__log_ring, pub_host=_pub_host, pub_id=_pub_id, pub_seq=_pub_seq,
+                             pub_con_init=_pub_con_init, pub_con_accomplish=_pub_con_accomplish,
+                             pub_timestamp=_pub_timestamp, pub_qos=_pub_qos, sub_host=self.__host_id,
+                             sub_id=self.__sub_number, sub_timestamp=_msg_arrival_time, e2e_delay=_e2e_delay,
+                             pub_container=_pub_container, sub_container=self.__container_id)
 
         self.msg_count += 1
-        if self.msg_count >= self.max_count:
+        if self.__share_group is not None:
+            self.__share_group.record()
+        if self.msg_count >= self.max_count or (self.__share_group is not None and self.__share_group.done()):
             # print('We hve entered in the final part ')
             self.__end_time_lock.acquire()
             if self.end_time is None:
@@ -600,31 +1496,73 @@ class Sub(MQTTClient):
             self.__finished = True
 
             print(f'Stopping client {self.client_id} on message')
-            self.client.loop_stop()
-            print(f'Terminating process on message in client {self.client_id} ')
-            self.terminate()
-
+            self.stop_client()
 
-    def run(self):
+    def configure_client(self):
+        MQTTClient.configure_client(self)
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
         self.client.on_subscribe = self.on_subscribe
-        if self.tls:
-            self.client.tls_set(**self.tls)
-        if self.auth:
-            self.client.username_pw_set(**self.auth)
-        self.client.connect(self.hostname, port=self.port)
+
+    def report_histogram(self):
+        if not self.__histogram_reported:
+            self.__histogram_reported = True
+            E2E_QUEUE.put((self.client_id, self.__e2e_histogram.to_dict()))
+            SEQUENCE_QUEUE.put((self.client_id, self.__host_id, self.__sequences.to_list()))
+            if self.__size_stats is not None:
+                SIZE_QUEUE.put((self.client_id, self.__size_stats.to_dict()))
+            if self.__node_histograms is not None:
+                NODE_QUEUE.put((self.__host_id, {_pub_host: _histogram.to_dict()
+                                                 for _pub_host, _histogram in self.__node_histograms.items()}))
+
+    def report_backlog(self):
+        if self.__backlog is not None:
+            BACKLOG_QUEUE.put(self.__backlog.summary(self.client_id))
+
+    def check_share_group(self):
+        """Ends the member once its group is done, the messages having gone to the other members"""
+        if self.__share_group is None or self.end_time is not None or not self.__share_group.done():
+            return
+        with self.__end_time_lock:
+            if self.end_time is None:
+                self.end_time = datetime.datetime.utcnow()
+                if self.start_time is None:
+                    # The member has not received anything
+                    self.start_time = self.end_time
+        self.__finished = True
+        print(f'Stopping client {self.client_id}, its shared group {self.__share_group.name} is done')
+
+    def done(self) -> bool:
+        self.check_share_group()
+        return MQTTClient.done(self)
+
+    def report(self):
+        self.report_histogram()
+        self.report_backlog()
+        if self.__share_group is not None:
+            SHARE_QUEUE.put((self.client_id, self.__share_group.name, self.__host_id, self.msg_count))
+        delta = self.end_time - self.start_time
+        SUB_QUEUE.put(delta.total_seconds())
+
+    def run(self):
+        self.configure_client()
+        time.sleep(self.connect_delay())
+        self.connect_client()
         self.client.loop_start()
         while True:
             # Time sleep is no useful when we have messages coming in bursts
             time.sleep(1)
+            self.check_share_group()
             self.__end_time_lock.acquire()
             if self.end_time:
-                delta = self.end_time - self.start_time
-                SUB_QUEUE.put(delta.total_seconds())
+                self.report()
                 self.client.loop_stop()
                 break
             self.__end_time_lock.release()
+            if self.__finished:
+                # Stopped by the inter-message watchdog
+                self.client.loop_stop()
+                break
             if self.start_time:
                 current_time = datetime.datetime.utcnow()
                 curr_delta = current_time - self.start_time
@@ -633,85 +1571,287 @@ class Sub(MQTTClient):
 
 
 class Pub(MQTTClient):
-    def __init__(self, *args, msg_size: int = 1024, **kwargs):
+    def __init__(self, *args, msg_size: int = 1024, payload_entropy: str = PayloadEntropy.RANDOM,
+                 payload_seed: int = None, header_format: str = HeaderFormat.BINARY, rate: float = 0,
+                 arrival: str = ArrivalProcess.CONSTANT, burst_on: float = 1.0, burst_off: float = 1.0,
+                 arrival_seed: int = None, histogram_precision: int = DEFAULT_SIGNIFICANT_FIGURES,
+                 container_id: int = 0, topic_aliases: int = 0, msg_sizes: list = None,
+                 max_inflight: int = MAX_INFLIGHT, **kwargs):
         MQTTClient.__init__(self, *args, **kwargs)
         self.msg_size = msg_size
         self.msg = None
-        self.connect_init = None
-        self.connect_accomplish = None
-        if self.msg_size < 51:
-            raise ContainerShortMessageError(50)
+        # The sizes of the sweep, max_count messages of each one in turn
+        self.__msg_sizes = msg_sizes or [msg_size]
+        if header_format == HeaderFormat.PROPERTIES:
+            # The header travels in the user properties, the payload can be as small as wanted
+            if self.protocol != MQTTProtocol.V5:
+                raise Exception('The properties header format needs MQTT v5 (--protocol 5)')
+        elif min(self.__msg_sizes) < HEADER_SIZE:
+            raise ContainerShortMessageError(HEADER_SIZE)
+        # The filler is generated once per process, each message only writes its header in the buffer
+        self.__payloads = [PayloadBuffer(get_pool(_size, entropy=payload_entropy, seed=payload_seed))
+                           for _size in self.__msg_sizes]
+        self.__payload = self.__payloads[0]
+        self.__header_format = header_format
+        self.__host_id = host_id(self.hostname)
+        self.__pub_id = client_number(self.client_id)
+        self.__container_id = container_id
+        # Sequence number of the last message and of each topic, the subscribers of some of the topics of a
+        # publisher would otherwise miss the numbers of the other topics
+        self.__seq = 0
+        self.__topic_seqs = {}
+        self.__connect_ns = None
+        self.__header_properties = None
+        # MQTT v5 topic aliases, limited by the Topic Alias Maximum of the broker once connected
+        self.__topic_aliases = topic_aliases if self.protocol == MQTTProtocol.V5 else 0
+        # QoS 1/2 messages awaiting their acknowledgement at once, 0 for no limit
+        self.__max_inflight = max_inflight
+        self.__aliases = {}
+        # Without a rate all the messages are published at once when the client connects
+        self.__scheduler = RateScheduler(rate, arrival=arrival, burst_on=burst_on, burst_off=burst_off,
+                                         seed=arrival_seed) if rate else None
+        self.__publish_task = None
+        # Send time of the messages waiting for the broker acknowledgement, by mid
+        self.__inflight = {}
+        self.__early_acks = {}
+        self.__inflight_lock = Lock()
+        self.__ack_histogram = LatencyHistogram(histogram_precision)
 
-    def create_msg(self):
+    @property
+    def seq(self):
+        return self.__seq
 
-        if self.connect_init is None:
-            self.connect_init = ''
-        if self.connect_accomplish is None:
-            self.connect_accomplish = ''
-        _pre_msg = self.hostname + '_' + self.client_id + '_' + str(self.connect_init) + '_' \
-                   + str(self.connect_accomplish) + '_' + str(datetime.datetime.utcnow()) + '_' \
-                   + str(self.qos) + '_'
-        return _pre_msg + ''.join(
-            random.choice(string.ascii_lowercase) for _ in range(self.msg_size - len(_pre_msg.encode('utf-8'))))
+    @property
+    def scheduler(self):
+        return self.__scheduler
+
+    def create_msg(self, topic: str = None):
+        self.__seq = self.__topic_seqs[topic] = self.__topic_seqs.get(topic, 0) + 1
+        if self.__connect_ns is None:
+            self.__connect_ns = (datetime_to_ns(self.connect_init), datetime_to_ns(self.connect_accomplish))
+        if self.__header_format == HeaderFormat.TEXT:
+            return self.__payload.build(encode_text_header(self.qos, self.__host_id, self.__pub_id, self.__seq,
+                                                           *self.__connect_ns, time.time_ns(),
+                                                           self.__container_id))
+        if self.__header_format == HeaderFormat.PROPERTIES:
+            self.__header_properties = encode_user_properties(self.qos, self.__host_id, self.__pub_id, self.__seq,
+                                                              *self.__connect_ns, time.time_ns(),
+                                                              self.__container_id)
+            return self.__payload.build(b'')
+        return self.__payload.pack(self.qos, self.__host_id, self.__pub_id, self.__seq, *self.__connect_ns,
+                                   time.time_ns(), self.__container_id)
+
+    @property
+    def ack_histogram(self):
+        return self.__ack_histogram
 
     def on_publish(self, client, userdata, mid):
         # print('The message was published')
         # Used for qos 1 and 2
         # For QoS 0, this simply means that the message has left the client
         # For other qoses, this means the handshake process has successfully ended
-        pass
-
-    def publish_msg(self, client, topic):
-        self.msg = self.create_msg()
-        client.publish(topic, payload=self.msg, qos=self.qos)
+        if self.qos == 0:
+            return
+        _ack_time = time.perf_counter_ns()
+        with self.__inflight_lock:
+            _send_time = self.__inflight.pop(mid, None)
+            if _send_time is None:
+                # The ack overtook the bookkeeping of a publish made from another thread
+                self.__early_acks[mid] = _ack_time
+                return
+        self.__ack_histogram.record(_ack_time - _send_time)
+
+    def _publish_properties(self, topic: str) -> tuple:
+        """The topic name and the MQTT v5 properties of the next message: the header as user properties,
+        and the alias of the topic, sent without its name once the broker knows the alias"""
+        if self.__header_properties is None and not self.__topic_aliases:
+            return topic, None
+        _properties = Properties(PacketTypes.PUBLISH)
+        if self.__header_properties is not None:
+            _properties.UserProperty = self.__header_properties
+        _alias = self.__aliases.get(topic)
+        if _alias is not None:
+            _properties.TopicAlias = _alias
+            return '', _properties
+        if len(self.__aliases) < self.__topic_aliases:
+            _properties.TopicAlias = self.__aliases[topic] = len(self.__aliases) + 1
+        return topic, _properties
+
+    def _send(self, client, topic):
+        """Publishes a new message, keeping its send time until the broker acknowledges it"""
+        self.msg = self.create_msg(topic)
+        _send_time = time.perf_counter_ns()
+        if self.protocol == MQTTProtocol.V5:
+            topic, _properties = self._publish_properties(topic)
+            _info = client.publish(topic, payload=self.msg, qos=self.qos, properties=_properties)
+        else:
+            _info = client.publish(topic, payload=self.msg, qos=self.qos)
+        if self.qos == 0:
+            return
+        with self.__inflight_lock:
+            _ack_time = self.__early_acks.pop(_info.mid, None)
+            if _ack_time is None:
+                self.__inflight[_info.mid] = _send_time
+                return
+        self.__ack_histogram.record(_ack_time - _send_time)
+
+    def _timed_out(self) -> bool:
         if self.start_time:
             current_time = datetime.datetime.utcnow()
             curr_delta = current_time - self.start_time
-            if curr_delta.total_seconds() > self.timeout:
-                raise Exception('We hit the pub timeout!')
+            return curr_delta.total_seconds() > self.timeout
+        return False
 
-    def on_connect(self, client, obj, flags, rc):
-        print('Pub successfully connected')
-        # print(mqtt.connack_string(rc))
+    def publish_msg(self, client, topic):
+        self._send(client, topic)
+        if self._timed_out():
+            raise Exception('We hit the pub timeout!')
+
+    def _topics_to_publish(self):
+        """The topic of each message, in publishing order, size after size for a sweep"""
+        for _size, _payload in zip(self.__msg_sizes, self.__payloads):
+            self.msg_size = _size
+            self.__payload = _payload
+            yield from self._phase_topics()
+
+    def _phase_topics(self):
+        """The topics of the max_count messages of a size"""
         _single_topic = True if isinstance(self.topic, str) else False
         _nr_topics_to_publish = 1 if _single_topic else len(self.topic)
-        self.start_time = datetime.datetime.utcnow()
-        if rc == 0:
-            self.connect_accomplish = self.start_time
-            # print('The loop started')
-            for i in range(0, self.max_count, _nr_topics_to_publish):
-                if _single_topic:
-                    self.publish_msg(client, self.topic)
-                else:
-                    # we have to publish for each topic in the list
-                    _items_to_print = _nr_topics_to_publish if self.max_count - i > _nr_topics_to_publish \
-                        else self.max_count - i
-                    for _topic in self.topic[:_items_to_print]:
-                        self.publish_msg(client, _topic)
-
-            self.end_time = datetime.datetime.utcnow()
-            delta = self.end_time - self.start_time
-            PUB_QUEUE.put(delta.total_seconds())
-
-    def run(self):
+        for i in range(0, self.max_count, _nr_topics_to_publish):
+            if _single_topic:
+                yield self.topic
+            else:
+                # we have to publish for each topic in the list
+                _items_to_print = _nr_topics_to_publish if self.max_count - i > _nr_topics_to_publish \
+                    else self.max_count - i
+                for _topic in self.topic[:_items_to_print]:
+                    yield _topic
+
+    def _publish_on_schedule(self, client, topic) -> bool:
+        """Publishes a message which is due, returns False once the publisher has timed out"""
+        if self._timed_out():
+            print(f'Client {self.client_id} hit the pub timeout after {self.__scheduler.sent} messages')
+            return False
+        self.__scheduler.mark_sent()
+        self._send(client, topic)
+        return True
+
+    def _publish_scheduled(self, client):
+        """Rate-controlled publishing in a thread, not to block the network loop of the process engine"""
+        self.__scheduler.start()
+        for _topic in self._topics_to_publish():
+            self.__scheduler.wait()
+            if not self._publish_on_schedule(client, _topic):
+                break
+        self._publishing_finished()
+
+    async def _publish_scheduled_async(self, client):
+        """Rate-controlled publishing as a task of the event loop of the asyncio engine"""
+        self.__scheduler.start()
+        for _topic in self._topics_to_publish():
+            # A late message is sent right away, but the other clients of the loop get their turn first
+            await asyncio.sleep(self.__scheduler.delay())
+            if not self._publish_on_schedule(client, _topic):
+                break
+        self._publishing_finished()
+
+    def _released(self, client, start_ns: int):
+        """Starts publishing at the start instant of the barrier, recording how late the client started"""
+        BARRIER_QUEUE.put((self.client_id, time.time_ns() - start_ns))
+        # Already in a thread of its own, but for the asyncio engine
+        self._start_publishing(client, in_thread=self.event_loop is None)
+
+    def _wait_for_barrier(self, client):
+        """Waits for the start instant in a thread, not to block the network loop of the client"""
+        self._released(client, self.barrier.sleep_until_start())
+
+    async def _wait_for_barrier_async(self, client):
+        """Waits for the start instant as a task of the event loop of the asyncio engine"""
+        while self.barrier.start_instant() is None:
+            await asyncio.sleep(BARRIER_TICK)
+        _start_ns = self.barrier.start_instant()
+        await asyncio.sleep(max(0.0, (_start_ns - time.time_ns()) / 1e9))
+        self._released(client, _start_ns)
+
+    def _publishing_finished(self):
+        _end_time = datetime.datetime.utcnow()
+        delta = _end_time - self.start_time
+        PUB_QUEUE.put(delta.total_seconds())
+        if self.__scheduler is not None:
+            RATE_QUEUE.put(self.__scheduler.summary(self.client_id))
+        self.end_time = _end_time
+
+    def on_connect(self, client, obj, flags, rc, properties=None):
+        print('Pub successfully connected')
+        # print(mqtt.connack_string(rc))
+        self.connack_received(rc)
+        # A broker without a Topic Alias Maximum accepts no alias
+        self.__topic_aliases = min(self.__topic_aliases, getattr(properties, 'TopicAliasMaximum', 0))
+        _receive_maximum = getattr(properties, 'ReceiveMaximum', None)
+        if self.qos > 0 and _receive_maximum:
+            # paho does not apply the Receive Maximum of the broker itself
+            client.max_inflight_messages_set(min(self.__max_inflight, _receive_maximum) if self.__max_inflight
+                                             else _receive_maximum)
+        if rc != 0:
+            self.start_time = datetime.datetime.utcnow()
+        elif self.barrier is None:
+            self._start_publishing(client)
+        elif self.barrier_ready(BarrierRole.PUB):
+            # The publishers of all the containers start at the same instant, once every client is ready. A
+            # reconnection goes on with the publishing loop already waiting or running
+            if self.event_loop is not None:
+                self.__publish_task = self.event_loop.create_task(self._wait_for_barrier_async(client))
+            else:
+                self.__publish_task = Thread(target=self._wait_for_barrier, args=(client,), daemon=True)
+                self.__publish_task.start()
 
-        if self.tls:
-            self.client.tls_set(**self.tls)
-        if self.auth:
-            self.client.username_pw_set(**self.auth)
+    def _start_publishing(self, client, in_thread: bool = False):
+        self.start_time = datetime.datetime.utcnow()
+        # print('The loop started')
+        if self.__scheduler is None:
+            for _topic in self._topics_to_publish():
+                self.publish_msg(client, _topic)
+            self._publishing_finished()
+        elif self.event_loop is not None:
+            self.__publish_task = self.event_loop.create_task(self._publish_scheduled_async(client))
+        elif in_thread:
+            self._publish_scheduled(client)
+        else:
+            self.__publish_task = Thread(target=self._publish_scheduled, args=(client,), daemon=True)
+            self.__publish_task.start()
 
+    def configure_client(self):
+        MQTTClient.configure_client(self)
         self.client.on_connect = self.on_connect
         self.client.on_publish = self.on_publish
+        if self.qos > 0:
+            self.client.max_inflight_messages_set(self.__max_inflight)
+
+    def done(self) -> bool:
+        """The messages are all published and, for QoS 1/2, acknowledged or given up at the pub timeout"""
+        if self.end_time is None:
+            return False
+        return not self.__inflight or self._timed_out()
+
+    def report(self):
+        if self.qos > 0:
+            if self.__inflight:
+                print(f'Client {self.client_id}: {len(self.__inflight)} messages not acknowledged by the broker')
+            ACK_QUEUE.put((self.client_id, self.__ack_histogram.to_dict()))
 
+    def run(self):
+        self.configure_client()
         # print('The client object was successfully created')
-        self.connect_init = datetime.datetime.utcnow()
-        self.client.connect(self.hostname, port=self.port)
+        time.sleep(self.connect_delay())
+        self.connect_client()
         self.client.loop_start()
 
         # Keep running until we have set the end_time parameter, which happen after everything is finished
         while True:
             time.sleep(1)
-            if self.end_time:
+            if self.done():
+                self.report()
                 self.client.loop_stop()
                 break
 
@@ -772,76 +1912,526 @@ def set_value(cmd_par, env_par, default: int, par_name: str) -> int:
             raise Exception('Unexpected parameter type')
 
 
+def set_float_value(cmd_par, env_par, default: float, par_name: str) -> float:
+    """Same as set_value, for the parameters accepting decimal values (e.g. rates)
+    :return: The parsed parameter value
+    """
+    _value = cmd_par if cmd_par is not None else env_par
+    if _value is None:
+        return default
+    try:
+        return float(_value)
+    except (TypeError, ValueError):
+        raise Exception('The %s parameter must be a number' % par_name)
+
+
 def is_positive(param: int, param_name: str):
     """Validate parameter to be positive"""
     if param < 0:
         raise Exception('The %s must be positive' % param_name)
 
 
-def initialize_log(host: str, dest_path: str = 'logs', file_name: str = None, prefix: str = ''):
-    """Initializes the csv file which will contain the received messages"""
+def initialize_log(host: str, dest_path: str = 'logs', file_name: str = None, prefix: str = '',
+                   log_format: str = LogFormat.CSV) -> str:
+    """Initializes the path of the log file which will contain the received messages"""
     octets = host.split('.')
     if len(octets) != 4:
         raise Exception('Hostname passed is invalid')
     if file_name is None:
         file_name = prefix + '_log_' + octets[3] + '.csv'
     # dest_path = dest_path + '_' + os.getenv('HOSTNAME')
-    output_path = os.path.join(dest_path, file_name)
+    output_path = log_path(os.path.join(dest_path, file_name), log_format)
     # Check if directory and file, else create it
     if not os.path.exists(output_path):
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    # Writing the file header
-    with open(output_path, 'w') as f:
-        f.write('hostname_origin;pub_client_id;publish_connect_init;')
-        f.write('publish_connect_ack;publish_timestamp;publish_qos;')
-        f.write('hostname_destination;sub_client;arrival_timestamp;e2e_delay')
-        f.write('\n')
-        f.close()
+    # The file and its header are written by the LogWriter
     return output_path
 
 
-def write(log, data):
-    print(f'The size of the logs {len(data)}')
-    with open(log, 'a') as f:
-        for ind, chunk in enumerate(data):
-            print(f'Writing the {ind}-th row')
-            f.write(chunk)
-            f.write('\n')
-        f.close()
+def histogram_path(log_file: str) -> str:
+    """The JSON file with the delay histograms, next to the csv log file"""
+    return os.path.splitext(log_file)[0] + '_e2e.json'
+
+
+def write_histograms(path: str, hostname: str, histograms: list) -> LatencyHistogram:
+    """Dumps the e2e delay histogram of each subscriber and their merge to a JSON file
+    :return: The histogram of the whole container
+    """
+    _container_histogram = LatencyHistogram(histograms[0][1].significant_figures)
+    for _client_id, _histogram in histograms:
+        _container_histogram.merge(_histogram)
+    with open(path, 'w') as f:
+        json.dump({'hostname': hostname,
+                   'unit': 'ns',
+                   'all': _container_histogram.to_dict(),
+                   'clients': {_client_id: _histogram.to_dict() for _client_id, _histogram in histograms}}, f)
+    return _container_histogram
+
+
+def clock_path(log_file: str) -> str:
+    """The JSON file with the clock offsets of the container, next to the log file"""
+    return os.path.splitext(log_file)[0] + '_clock.json'
+
+
+def container_address() -> str:
+    """The address of the container on its network"""
+    try:
+        return socket.gethostbyname(socket.gethostname())
+    except OSError:
+        return '127.0.0.1'
+
+
+def synchronise_clock(cl_param: ClientParameters) -> dict:
+    """Estimates the offset of the container clock through the broker, None if disabled or unanswered"""
+    if not cl_param.clock_samples:
+        return None
+    return measure_offset(cl_param.hostname, cl_param.container, port=cl_param.port, samples=cl_param.clock_samples,
+                          timeout=cl_param.clock_timeout, tls=cl_param.tls, auth=cl_param.auth)
+
+
+def tls_path(log_file: str) -> str:
+    """The JSON file with the TLS handshake measurements of the container, next to the log file"""
+    return os.path.splitext(log_file)[0] + '_tls.json'
+
+
+def measure_handshakes(cl_param: ClientParameters) -> dict:
+    """Full and resumed TLS handshakes with the broker, None if disabled or without a CA certificate"""
+    if not cl_param.tls_connections:
+        return None
+    if not cl_param.cacert:
+        print('Warning: the TLS handshakes are not measured without --cacert')
+        return None
+    return measure_tls(cl_param.hostname, cl_param.port, cl_param.cacert, connections=cl_param.tls_connections,
+                       auth=cl_param.auth, client_id=f'tls{host_id(cl_param.container)}')
+
+
+def write_tls(path: str, cl_param: ClientParameters, results: dict) -> dict:
+    """Dumps the handshake, CONNACK and CPU times of each TLS connection with their histograms"""
+    _summary = tls_summary(results, cl_param.histogram_precision)
+    with open(path, 'w') as f:
+        json.dump({'hostname': cl_param.hostname,
+                   'port': cl_param.port,
+                   'unit': 'ns',
+                   'results': results,
+                   'summary': summary_to_dict(_summary)}, f)
+    return _summary
+
+
+def write_clock(path: str, cl_param: ClientParameters, before: dict, after: dict) -> dict:
+    """Dumps the clock offsets measured before and after the clients ran, used to correct the e2e
+    delays between containers during the analysis"""
+    _clock = clock_report(cl_param.container, host_id(cl_param.container), before, after)
+    _clock['hostname'] = cl_param.hostname
+    with open(path, 'w') as f:
+        json.dump(_clock, f)
+    return _clock
 
 
 def parse_msg(msg):
-    """Parse the received message at the subscriber"""
-    # print('Parsing the arrived message')
+    """Parse the header of the received message at the subscriber
+    :return: (qos, host id, publisher id, sequence, connect init, connack, publish timestamp, publisher
+    container id), with the timestamps in ns since the epoch, or None if the payload has no known header
+    """
     if isinstance(msg, mqtt.MQTTMessage):
-        # String format of the arrived message
-        msg = msg.payload.decode("utf-8")
-    fields = msg.split("_", 6)
-    _dict = {
-        'hostname': fields[0],
-        'pub_id': fields[1],
-        'pub_con_init': datetime.datetime.strptime(fields[2], '%Y-%m-%d %H:%M:%S.%f'),
-        'pub_con_accomplish': datetime.datetime.strptime(fields[3], '%Y-%m-%d %H:%M:%S.%f'),
-        'publish_timestamp': datetime.datetime.strptime(fields[4], '%Y-%m-%d %H:%M:%S.%f'),
-        'pub_qos': fields[5]
+        # MQTT v5 messages may carry the header in their user properties
+        _user_properties = getattr(getattr(msg, 'properties', None), 'UserProperty', None)
+        if _user_properties:
+            _header = decode_user_properties(_user_properties)
+            if _header is not None:
+                return _header
+        msg = msg.payload
+    return decode_header(msg)
+
+
+def reason_string(rc) -> str:
+    """Readable form of an MQTT 3.1.1 CONNACK return code or of an MQTT v5 reason code"""
+    if isinstance(rc, ReasonCodes):
+        return rc.getName()
+    return mqtt.connack_string(rc)
+
+
+def write_to_log(log_ring: RingBuffer, pub_host: int = None, pub_id: int = None, pub_seq: int = None,
+                 pub_con_init: int = None, pub_con_accomplish: int = None, pub_timestamp: int = None,
+                 pub_qos: int = None, sub_host: int = None, sub_id: int = None, sub_timestamp: int = None,
+                 e2e_delay: int = None, pub_container: int = None, sub_container: int = None):
+    """Writing the line to the log ring, the hosts and clients are numeric ids and the times are in ns"""
+    # print('Writing the message to log')
+    log_ring.put((pub_host, pub_id, pub_seq, pub_con_init, pub_con_accomplish, pub_timestamp, pub_qos,
+                  sub_host, sub_id, sub_timestamp, e2e_delay, pub_container, sub_container))
+
+
+def create_log_rings(clients: list, cl_param: ClientParameters) -> list:
+    """Gives each subscriber the ring of the process it will run in: its own process for the process
+    engine, the event loop worker for the asyncio engine, so that every ring has a single producer. The
+    subscribers of the thread engine keep a ring of their own, each thread being the producer of its ring
+    :return: The rings, to be drained by the LogWriter
+    """
+    _rings = {}
+    _shards = async_engine.shard_count(len(clients), cl_param.workers)
+    for ind, client in enumerate(clients):
+        if not isinstance(client, Sub):
+            continue
+        _key = async_engine.shard_of(ind, _shards) if cl_param.engine == Engines.ASYNCIO else ind
+        if _key not in _rings:
+            _rings[_key] = RingBuffer(LOG_RECORD, cl_param.ring_size)
+        client.log_ring = _rings[_key]
+    return list(_rings.values())
+
+
+def print_rate_report(summaries: list):
+    """Prints the requested vs achieved rate of the rate-controlled publishers"""
+    if not summaries:
+        return
+    print('Publish rate (msg/s)')
+    print('client;arrival;requested;achieved;sent;max_lag_s')
+    for summary in summaries:
+        print('%s;%s;%.3f;%.3f;%d;%.6f' % (summary['client_id'], summary['arrival'], summary['requested_rate'],
+                                          summary['achieved_rate'], summary['sent'], summary['max_lag']))
+    print('Container requested rate: %.3f, achieved rate: %.3f' % (
+        sum(summary['requested_rate'] for summary in summaries),
+        sum(summary['achieved_rate'] for summary in summaries)))
+
+
+def print_ack_report(histograms: list, qos: int, rate: float = 0):
+    """Prints the broker acknowledgement latency of each publisher and of the whole container
+    :param rate: The publish rate of each publisher, 0 for a burst
+    """
+    if not histograms:
+        return
+    _ack = 'PUBACK' if qos == 1 else 'PUBCOMP'
+    print(f'{_ack} latency (publish to acknowledgement)')
+    if not rate:
+        # The timer starts at publish(): a burst is queued in the client before it is written, behind the
+        # messages in flight
+        print('The publishers sent a burst, the latency includes the wait in the queue of the client, '
+              'use --rate to time the broker alone')
+    _container_histogram = LatencyHistogram(histograms[0][1].significant_figures)
+    for client_id, histogram in histograms:
+        print(format_summary(client_id, histogram))
+        _container_histogram.merge(histogram)
+    print(format_summary('all publishers', _container_histogram))
+
+
+def schedule_connections(clients: list, cl_param: ClientParameters) -> float:
+    """Gives each client its connection slot on the ramp, in the order of the list (the subscribers first)
+    :return: The duration of the ramp in seconds, 0 if the clients connect all at once
+    """
+    _ramp = cl_param.connect_ramp()
+    if _ramp is None:
+        return 0.0
+    print(f'Connecting {len(clients)} clients at {_ramp.rate:g} clients/s ({_ramp.profile} ramp, '
+          f'{_ramp.duration(len(clients)):.3f} s)')
+    for client, _connect_at in zip(clients, _ramp.connect_times(len(clients))):
+        client.connect_at = _connect_at
+    return _ramp.duration(len(clients))
+
+
+def start_barrier(sub_threads: list, pub_threads: list, cl_param: ClientParameters, clock: dict) -> ContainerBarrier:
+    """Holds the publishers until the clients of all the containers are ready, None without a barrier
+    :param clock: The clock offset of the container, to start at the same instant as the other containers
+    """
+    if cl_param.barrier is None:
+        return None
+    _clients = {_role: len(_threads) for _role, _threads in ((BarrierRole.SUB, sub_threads),
+                                                              (BarrierRole.PUB, pub_threads)) if _threads}
+    barrier = ContainerBarrier(cl_param.hostname, cl_param.container, _clients, cl_param.barrier, port=cl_param.port,
+                               tls=cl_param.tls, auth=cl_param.auth, offset_ns=clock['offset_ns'] if clock else 0)
+    for client in sub_threads + pub_threads:
+        client.barrier = barrier
+    barrier.start()
+    return barrier
+
+
+def start_clients(clients: list, cl_param: ClientParameters) -> list:
+    """Starts the clients with the engine selected in the parameters, the clients wait for their
+    connection slot themselves
+    :return: The processes to wait for, the clients themselves for the process engine
+    or the workers for the asyncio and thread engines
+    """
+    if cl_param.engine == Engines.ASYNCIO:
+        print(f'Running {len(clients)} clients in {async_engine.shard_count(len(clients), cl_param.workers)} '
+              f'event loops')
+        return async_engine.start_engine(clients, workers=cl_param.workers)
+    if cl_param.engine == Engines.THREAD:
+        print(f'Running {len(clients)} clients in {async_engine.shard_count(len(clients), cl_param.workers)} '
+              f'worker processes')
+        return thread_engine.start_engine(clients, workers=cl_param.workers)
+    for client in clients:
+        client.start()
+    return clients
+
+
+def collect_connections(clients: int) -> list:
+    """The (client id, CONNECT instant, CONNACK instant) reported by the clients, the CONNACK is None
+    for a refused connection"""
+    _connections = []
+    for i in range(clients):
+        try:
+            _connections.append(CONNECT_QUEUE.get(timeout=1))
+        except queue.Empty:
+            break
+    return _connections
+
+
+def connect_histogram(connections: list, significant_figures: int) -> LatencyHistogram:
+    _histogram = LatencyHistogram(significant_figures)
+    for _client_id, _connect_ns, _connack_ns in connections:
+        if _connack_ns is not None:
+            _histogram.record(_connack_ns - _connect_ns)
+    return _histogram
+
+
+def connection_rate(connections: list) -> float:
+    """Sessions established per second, from the first CONNECT to the last CONNACK"""
+    _accepted = [(_connect_ns, _connack_ns) for _client_id, _connect_ns, _connack_ns in connections
+                 if _connack_ns is not None]
+    if not _accepted:
+        return 0.0
+    _elapsed = max(_connack_ns for _, _connack_ns in _accepted) - min(_connect_ns for _connect_ns, _ in _accepted)
+    return len(_accepted) / (_elapsed / 1e9) if _elapsed > 0 else 0.0
+
+
+def connect_path(log_file: str) -> str:
+    """The JSON file with the CONNACK latencies of the container, next to the log file"""
+    return os.path.splitext(log_file)[0] + '_connect.json'
+
+
+def write_connections(path: str, cl_param: ClientParameters, connections: list,
+                      histogram: LatencyHistogram):
+    """Dumps the CONNACK latency of each client, their histogram and the ramp they were paced with"""
+    with open(path, 'w') as f:
+        json.dump({'hostname': cl_param.hostname,
+                   'unit': 'ns',
+                   'connect_rate': cl_param.connect_rate,
+                   'ramp': cl_param.ramp,
+                   'ramp_step': cl_param.ramp_step,
+                   'refused': sum(1 for _connection in connections if _connection[2] is None),
+                   'achieved_rate': connection_rate(connections),
+                   'all': histogram.to_dict(),
+                   'clients': {_client_id: None if _connack_ns is None else _connack_ns - _connect_ns
+                               for _client_id, _connect_ns, _connack_ns in connections}}, f)
+
+
+def backlog_path(log_file: str) -> str:
+    """The JSON file with the offline backlog drained by the subscribers, next to the log file"""
+    return os.path.splitext(log_file)[0] + '_backlog.json'
+
+
+def backlog_totals(summaries: list) -> dict:
+    """The backlog of the whole container, drained in the time of the slowest subscriber"""
+    _backlog = sum(summary['backlog'] for summary in summaries)
+    _time_to_empty = max(summary['time_to_empty'] for summary in summaries)
+    return {
+        'backlog': _backlog,
+        'time_to_empty': _time_to_empty,
+        'drain_rate': _backlog / _time_to_empty if _time_to_empty > 0 else 0.0,
+        'sessions_lost': sum(1 for summary in summaries if summary['session_present'] is False)
     }
-    return _dict
 
 
-def write_to_log(pub_host: str = None, pub_id: str = None, pub_con_init: datetime.datetime = None,
-                 pub_con_accomplish: datetime.datetime = None, pub_timestamp: datetime.datetime = None,
-                 pub_qos: str = None, sub_host: str = None, sub_id: str = None,
-                 sub_timestamp: datetime.datetime = None, e2e_delay: datetime.timedelta = None):
-    """Writing the line to the log queue"""
-    # print('Writing the message to log')
-    log_format = '%s' + ';%s' * 9
-    LOG_QUEUE.put(log_format % (pub_host, pub_id, pub_con_init, pub_con_accomplish,
-                                pub_timestamp, pub_qos,
-                                sub_host, sub_id, sub_timestamp,
-                                e2e_delay))
-    if LOG_QUEUE.full():
-        print('The log queue is full')
-    print(f'Logs size {LOG_QUEUE.qsize()}')
+def write_backlog(path: str, cl_param: ClientParameters, summaries: list) -> dict:
+    _totals = backlog_totals(summaries)
+    with open(path, 'w') as f:
+        json.dump({'hostname': cl_param.hostname,
+                   'offline_period': cl_param.offline_period,
+                   'qos': cl_param.qos,
+                   'all': _totals,
+                   'clients': summaries}, f)
+    return _totals
+
+
+def print_backlog_report(summaries: list, totals: dict):
+    """Prints the messages queued for each offline subscriber and how fast they were delivered"""
+    if not summaries:
+        return
+    print('Offline backlog drain')
+    print('client;session_present;offline_s;reconnect_s;backlog;time_to_empty_s;drain_rate')
+    for summary in summaries:
+        print('%s;%s;%.3f;%.6f;%d;%.6f;%.3f' % (summary['client_id'], summary['session_present'],
+                                               summary['offline'] or 0, summary['reconnect_latency'] or 0,
+                                               summary['backlog'], summary['time_to_empty'],
+                                               summary['drain_rate']))
+    print('Container backlog: %d messages, time to empty: %.6f s, drain rate: %.3f msg/s, sessions lost: %d' % (
+        totals['backlog'], totals['time_to_empty'], totals['drain_rate'], totals['sessions_lost']))
+
+
+def sequence_path(log_file: str) -> str:
+    """The JSON file with the lost, duplicated and reordered messages, next to the log file"""
+    return os.path.splitext(log_file)[0] + '_sequence.json'
+
+
+def write_sequences(path: str, hostname: str, subscribers: list) -> dict:
+    """Dumps the sequence counts of each subscriber and their sums by (publisher host, subscriber host)
+    :param subscribers: (client id, subscriber host, publisher counts) of each subscriber
+    :return: The counts by pair
+    """
+    _pairs = pair_counts([(_sub_host, _publishers) for _client_id, _sub_host, _publishers in subscribers])
+    with open(path, 'w') as f:
+        json.dump({'hostname': hostname,
+                   'pairs': [dict(_counts, pub_host=host_name(_pub_host), sub_host=host_name(_sub_host))
+                             for (_pub_host, _sub_host), _counts in _pairs.items()],
+                   'clients': {_client_id: _publishers for _client_id, _sub_host, _publishers in subscribers}}, f)
+    return _pairs
+
+
+def print_sequence_report(pairs: dict):
+    """Prints the lost, duplicated and reordered messages between each pair of brokers"""
+    if not pairs:
+        return
+    print('Message sequence (publisher broker -> subscriber broker)')
+    print('pub_host;sub_host;' + ';'.join(SEQUENCE_COUNTS) + ';loss_ratio')
+    for (_pub_host, _sub_host), _counts in sorted(pairs.items()):
+        print(f'{host_name(_pub_host)};{host_name(_sub_host)};' +
+              ';'.join(str(_counts[_count]) for _count in SEQUENCE_COUNTS) + f';{loss_ratio(_counts):.6f}')
+
+
+def share_path(log_file: str) -> str:
+    """The JSON file with the distribution of the messages among the shared group members, next to the log file"""
+    return os.path.splitext(log_file)[0] + '_share.json'
+
+
+def write_share_groups(path: str, hostname: str, members: list, e2e_histograms: list) -> dict:
+    """Dumps the messages of each member of the shared groups and the e2e delays of the group through the
+    broker of each member, merged with the files of the other containers by shared.py
+    :param members: (client id, group, broker host of the member, received messages) of each member, the
+    members of a container may be placed on different nodes
+    :return: The groups of the container
+    """
+    _histograms = dict(e2e_histograms)
+    _groups = group_report([{'group': _group, 'client_id': _client_id, 'host': _host,
+                             'received': _received, 'histogram': _histograms.get(_client_id)}
+                            for _client_id, _group, _host, _received in members])
+    with open(path, 'w') as f:
+        json.dump({'hostname': hostname, 'groups': groups_to_dict(_groups)}, f)
+    return _groups
+
+
+def nodes_path(log_file: str) -> str:
+    """The JSON file with the e2e delays between the broker nodes of the cluster, next to the log file"""
+    return os.path.splitext(log_file)[0] + '_nodes.json'
+
+
+def write_node_matrix(path: str, hostname: str, node_histograms: list) -> dict:
+    """Dumps the e2e delays by (publisher node, subscriber node), merged with the files of the other
+    containers by placement.py
+    :param node_histograms: (subscriber host id, histograms by publisher host id) of each subscriber
+    """
+    _matrix = node_matrix([(host_name(_pub_host), host_name(_sub_host), LatencyHistogram.from_dict(_histogram))
+                           for _sub_host, _histograms in node_histograms
+                           for _pub_host, _histogram in _histograms.items()])
+    with open(path, 'w') as f:
+        json.dump({'hostname': hostname, 'unit': 'ns', 'matrix': matrix_to_list(_matrix)}, f)
+    return _matrix
+
+
+def sizes_path(log_file: str) -> str:
+    """The JSON file with the throughput and e2e delays by payload size of the sweep, next to the log file"""
+    return os.path.splitext(log_file)[0] + '_sizes.json'
+
+
+def write_sizes(path: str, hostname: str, size_stats: list) -> SizeStats:
+    """Dumps the size classes of the subscribers, merged with the files of the other containers by sweep.py
+    :param size_stats: (client id, size classes) of each subscriber
+    """
+    _container_stats = None
+    for _client_id, _stats in size_stats:
+        _stats = SizeStats.from_dict(_stats)
+        _container_stats = _stats if _container_stats is None else _container_stats.merge(_stats)
+    with open(path, 'w') as f:
+        json.dump({'hostname': hostname,
+                   'sizes': _container_stats.to_dict(),
+                   'table': _container_stats.table()}, f)
+    return _container_stats
+
+
+def collect_reason_codes() -> list:
+    """The (client id, packet, reason code, name) reported by the MQTT v5 clients, as many as they sent"""
+    _reasons = []
+    while True:
+        try:
+            _reasons.append(REASON_QUEUE.get(timeout=0.1))
+        except queue.Empty:
+            return _reasons
+
+
+def reason_counts(reasons: list) -> dict:
+    _counts = {}
+    for _client_id, _packet, _value, _name in reasons:
+        _counts[(_packet, _value, _name)] = _counts.get((_packet, _value, _name), 0) + 1
+    return _counts
+
+
+def reasons_path(log_file: str) -> str:
+    """The JSON file with the MQTT v5 reason codes received by the clients, next to the log file"""
+    return os.path.splitext(log_file)[0] + '_reasons.json'
+
+
+def write_reason_codes(path: str, hostname: str, reasons: list) -> dict:
+    """Dumps the count of each reason code and the clients which got an error (reason code >= 0x80)"""
+    _counts = reason_counts(reasons)
+    with open(path, 'w') as f:
+        json.dump({'hostname': hostname,
+                   'counts': [{'packet': _packet, 'reason_code': _value, 'name': _name, 'count': _count}
+                              for (_packet, _value, _name), _count in _counts.items()],
+                   'errors': [{'client_id': _client_id, 'packet': _packet, 'reason_code': _value, 'name': _name}
+                              for _client_id, _packet, _value, _name in reasons if _value >= 0x80]}, f)
+    return _counts
+
+
+def print_reason_report(counts: dict):
+    if not counts:
+        return
+    print('MQTT v5 reason codes')
+    for (_packet, _value, _name), _count in sorted(counts.items()):
+        print(f'  {_packet} 0x{_value:02X} {_name}: {_count}')
+
+
+def print_connect_report(connections: list, histogram: LatencyHistogram):
+    """Prints the CONNACK latency distribution and the achieved session establishment rate"""
+    if not connections:
+        return
+    _refused = sum(1 for _connection in connections if _connection[2] is None)
+    print(f'Connections: {len(connections) - _refused} accepted, {_refused} refused, '
+          f'{connection_rate(connections):.3f} sessions/s')
+    print(format_summary('CONNACK latency', histogram))
+
+
+def barrier_path(log_file: str) -> str:
+    """The JSON file with the start barrier of the container, next to the log file"""
+    return os.path.splitext(log_file)[0] + '_barrier.json'
+
+
+def collect_barrier_skews(expected: int) -> list:
+    """The (client id, start skew in ns) of the publishers released by the barrier"""
+    skews = []
+    for i in range(expected):
+        try:
+            skews.append(BARRIER_QUEUE.get(timeout=1))
+        except queue.Empty:
+            break
+    return skews
+
+
+def write_barrier(path: str, barrier: ContainerBarrier, skews: list) -> dict:
+    """Dumps the barrier of the container, merged with the files of the other containers by barrier.py"""
+    _barrier = barrier.report(skews)
+    with open(path, 'w') as f:
+        json.dump(_barrier, f)
+    return _barrier
+
+
+def print_barrier_report(barrier: dict, precision: int):
+    """Prints how late the publishers started after the shared start instant"""
+    if barrier['timed_out']:
+        print('Start barrier: no start signal from the coordinator, the container started on its own')
+    if not barrier['skews']:
+        return
+    _histogram = LatencyHistogram(precision)
+    for _skew in barrier['skews']:
+        _histogram.record(max(0, _skew['skew_ns']))
+    _summary = barrier_summary([barrier])
+    print(f'Start barrier: {_summary["publishers"]} publishers, spread {_summary["spread_ns"] / 1e6:.3f} ms')
+    print(format_summary('Start skew', _histogram))
 
 
 def arg_parse():
@@ -869,6 +2459,40 @@ def arg_parse():
                              'default count is 0.')
     parser.add_argument('--msg-size', type=int, dest='msg_size',
                         help='The payload size to use in bytes')
+    parser.add_argument('--msg-sizes', type=str, dest='msg_sizes', default=None,
+                        help='Sweeps the payload sizes in a single run: a list such as 64,256,1024 or a '
+                             'geometric range start:stop:factor such as 64:65536:4. The publishers publish '
+                             '--pub-count messages of each size in turn, the subscribers wait for --sub-count '
+                             'messages of each size and report the throughput and e2e delay by size. '
+                             'Overrides --msg-size. By default no sweep')
+    parser.add_argument('--payload-entropy', type=str, dest='payload_entropy', default=None,
+                        choices=PayloadEntropy.ALL,
+                        help='The content of the payload filler: random letters, a short repeated '
+                             'block (compressible) or a single repeated letter (fixed). By default random')
+    parser.add_argument('--payload-seed', type=int, dest='payload_seed', default=None,
+                        help='Seed of the random filler, to generate the same payloads across runs')
+    parser.add_argument('--header-format', type=str, dest='header_format', default=None,
+                        choices=HeaderFormat.ALL,
+                        help='Format of the timing header at the start of each payload: fixed-layout binary, '
+                             'or underscore separated text readable in Wireshark. With --protocol 5, properties '
+                             'sends it as user properties, the payload being only --msg-size bytes of filler, '
+                             'which can be smaller than the binary header. By default binary')
+    parser.add_argument('--protocol', type=str, default=None, choices=MQTTProtocol.ALL,
+                        help='The MQTT version of the clients, 5 collects the reason codes of the CONNACK, '
+                             'SUBACK and DISCONNECT packets. By default 3.1.1')
+    parser.add_argument('--topic-aliases', type=int, dest='topic_aliases', default=None,
+                        help='The MQTT v5 topic aliases of each publisher, up to the Topic Alias Maximum of the '
+                             'broker: the topics get an alias at their first message and are then published '
+                             'without their name. By default 0')
+    parser.add_argument('--max-inflight', type=int, dest='max_inflight', default=None,
+                        help='The QoS 1/2 messages of each publisher awaiting their acknowledgement at once, the '
+                             'next ones wait in the queue of the client. 0 removes the limit. By default %d'
+                             % MAX_INFLIGHT)
+    parser.add_argument('--barrier', type=str, default=None,
+                        help='Holds the publishers until the clients of every container of the run are ready, '
+                             'then starts them all at the same instant. The containers of each role in the run '
+                             'as JSON, e.g. {"sub": 5, "pub": 3}, released by "barrier.py coordinate". '
+                             'By default the publishers start as soon as they are connected')
     # Added
     parser.add_argument('--msg', type=str, dest='msg',
                         help='The payload of the publish message')
@@ -904,22 +2528,143 @@ def arg_parse():
                         help='A description of cluster topology. '
                              'Shall be used to set the name of log files of type: '
                              '*description*_*sub_1*')
+    parser.add_argument('--engine', type=str, default=None, choices=Engines.ALL,
+                        help='How the clients are run: one process per client (process), many '
+                             'clients multiplexed in one event loop per worker (asyncio) or many '
+                             'clients as threads of each worker process (thread). '
+                             'By default process')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='The number of worker processes hosting the clients of the asyncio and '
+                             'thread engines. '
+                             'By default the number of cores')
+    parser.add_argument('--histogram-precision', type=int, dest='histogram_precision', default=None,
+                        choices=range(1, 6),
+                        help='The significant figures kept by the latency histograms. By default 3')
+    parser.add_argument('--log-sample', type=float, dest='log_sample', default=None,
+                        help='The fraction of the received messages written as rows of the log file, '
+                             '0 keeps only the delay histograms. By default 1, all the messages')
+    parser.add_argument('--log-format', type=str, dest='log_format', default=None, choices=LogFormat.ALL,
+                        help='The format of the log file: semicolon separated csv or binary int64 columns '
+                             '(columnar), written in blocks. By default csv')
+    parser.add_argument('--ring-size', type=int, dest='ring_size', default=None,
+                        help='The number of log rows buffered in the shared memory ring of each subscriber '
+                             'process (or event loop) until the writer takes them, the rows arriving when '
+                             'the ring is full are dropped and counted. By default 16384')
+    parser.add_argument('--clock-samples', type=int, dest='clock_samples', default=None,
+                        help='The ping-pong exchanges with the clock responder, through the broker, before and '
+                             'after the measurements, e.g. 8. 0 disables the clock synchronisation. By default 0, '
+                             'the orchestrator running the responder sets it')
+    parser.add_argument('--clock-timeout', type=float, dest='clock_timeout', default=None,
+                        help='Seconds to wait for each answer of the clock responder. By default 2')
+    parser.add_argument('--placement', type=str, default=None,
+                        help='The broker node of each client as JSON, {"pub": [node of pub0, ...], "sub": [...]}, '
+                             'computed by the orchestrators from their placement strategy. The subscribers then '
+                             'report the e2e delays between the nodes. By default all the clients connect to '
+                             '--hostname')
+    parser.add_argument('--tls-connections', type=int, dest='tls_connections', default=None,
+                        help='Connections with a full TLS handshake, then with a resumed session, made to the '
+                             'broker before the clients to measure the handshake, CONNACK and client CPU times '
+                             'of each. Needs --cacert. By default 0, disabled')
+    parser.add_argument('--connect-rate', type=float, dest='connect_rate', default=None,
+                        help='The number of clients of the container connecting per second, subscribers first. '
+                             'By default 0, all the clients connect at once')
+    parser.add_argument('--ramp', type=str, default=None, choices=RampProfile.ALL,
+                        help='The profile of the connection ramp: one client at a time (linear) or groups of '
+                             '--ramp-step clients (stepped). By default linear')
+    parser.add_argument('--ramp-step', type=int, dest='ramp_step', default=None,
+                        help='The number of clients connecting together in each step of the stepped ramp. '
+                             'By default 1')
+    parser.add_argument('--scenario', type=str, default=None, choices=Scenarios.ALL,
+                        help='steady: clean sessions, the subscribers stay connected. backlog: persistent '
+                             'sessions, the subscribers go offline once subscribed and reconnect after '
+                             '--offline-period, measuring the drain of the queued messages. By default steady')
+    parser.add_argument('--share-group', type=str, dest='share_group', default=None,
+                        help='Subscribes the subscribers as members of this shared subscription group, the '
+                             'broker splitting the messages of the topics among them. The members of the '
+                             'container stop together once they have received --sub-count messages. '
+                             'By default plain subscriptions')
+    parser.add_argument('--share-format', type=str, dest='share_format', default=None, choices=ShareFormat.ALL,
+                        help='The shared subscription syntax of the broker: standard $share/<group>/<topic>, '
+                             'queue $queue/<topic> (EMQX) or hivemq_legacy $share:<group>:<topic>. '
+                             'By default standard')
+    parser.add_argument('--share-idle', type=float, dest='share_idle', default=None,
+                        help='Seconds without messages after which the members of a shared group stop, the '
+                             'rest of the messages going to the members in other containers. By default 5')
+    parser.add_argument('--offline-period', type=float, dest='offline_period', default=None,
+                        help='Seconds the subscribers of the backlog scenario stay disconnected. By default 10')
+    parser.add_argument('--topic-tree-depth', type=int, dest='topic_tree_depth', default=None,
+                        help='Generates a topic tree of this many levels below --topic: the publishers publish '
+                             'to its leaves and the subscribers subscribe to wildcard filters, waiting for the '
+                             'messages their filter matches instead of --sub-count. By default 0, disabled')
+    parser.add_argument('--topic-tree-branching', type=int, dest='topic_tree_branching', default=None,
+                        help='The children of each level of the topic tree. By default 2')
+    parser.add_argument('--topic-tree-single-level', type=float, dest='topic_tree_single_level', default=None,
+                        help='The fraction of the subscribers with a + wildcard in their filter. By default 0')
+    parser.add_argument('--topic-tree-multi-level', type=float, dest='topic_tree_multi_level', default=None,
+                        help='The fraction of the subscribers with a # wildcard in their filter. By default 0')
+    parser.add_argument('--topic-tree-seed', type=int, dest='topic_tree_seed', default=None,
+                        help='Seed of the choice of the subscriber filters')
+    parser.add_argument('--topic-tree-pub-containers', type=int, dest='topic_tree_pub_containers', default=None,
+                        help='The publisher containers running the same topic tree, each one publishing to the '
+                             'same leaves, to compute the messages expected by the subscribers. By default 1')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='The number of messages per second of each publisher, published on an open-loop '
+                             'schedule. By default 0, all the messages are published at once')
+    parser.add_argument('--container-rate', type=float, dest='container_rate', default=None,
+                        help='The number of messages per second of the whole container, split evenly among '
+                             'the publishers. Overrides --rate')
+    parser.add_argument('--arrival', type=str, default=None, choices=ArrivalProcess.ALL,
+                        help='The arrival process of the rate-controlled publishers: constant intervals, '
+                             'poisson or on/off bursts. By default constant')
+    parser.add_argument('--burst-on', type=float, dest='burst_on', default=None,
+                        help='Seconds of each burst of the on_off arrival process. By default 1')
+    parser.add_argument('--burst-off', type=float, dest='burst_off', default=None,
+                        help='Seconds of silence between the bursts of the on_off arrival process. By default 1')
+    parser.add_argument('--arrival-seed', type=int, dest='arrival_seed', default=None,
+                        help='Seed of the random inter-arrival times, to replay the same schedule across runs')
 
     return parser.parse_args()
 
 
-def main(host=None):
+def create_queues():
+    """Creates the result queues of a run. A pool container forks all its runs from the same agent, the
+    queues of a previous run may still hold its leftovers or be locked by one of its killed clients"""
+    global SUB_QUEUE, PUB_QUEUE, RATE_QUEUE, ACK_QUEUE, E2E_QUEUE, CONNECT_QUEUE, BACKLOG_QUEUE, SEQUENCE_QUEUE, \
+        SHARE_QUEUE, SIZE_QUEUE, NODE_QUEUE, REASON_QUEUE, BARRIER_QUEUE
+    SUB_QUEUE = multiprocessing.Queue()
+    PUB_QUEUE = multiprocessing.Queue()
+    RATE_QUEUE = multiprocessing.Queue()
+    ACK_QUEUE = multiprocessing.Queue()
+    E2E_QUEUE = multiprocessing.Queue()
+    CONNECT_QUEUE = multiprocessing.Queue()
+    BACKLOG_QUEUE = multiprocessing.Queue()
+    SEQUENCE_QUEUE = multiprocessing.Queue()
+    SHARE_QUEUE = multiprocessing.Queue()
+    SIZE_QUEUE = multiprocessing.Queue()
+    NODE_QUEUE = multiprocessing.Queue()
+    REASON_QUEUE = multiprocessing.Queue()
+    BARRIER_QUEUE = multiprocessing.Queue()
+
+
+def main(host=None, linger: bool = True):
+    """Runs the clients of the container and reports their results
+    :param linger: Keeps printing the completion line until the container is removed, a run dispatched to
+    a pool container returns once it is printed
+    """
     parser = arg_parse()
     opts = parser
 
     sub_threads = []
     pub_threads = []
 
+    create_queues()
     cl_param = ClientParameters(opts, host)
+    # Rejects the bad values before any client is created, and sets the TLS and authentication options
+    cl_param.validate_parameters()
 
     # Log file
-    log_file = initialize_log(cl_param.hostname, dest_path='/home/logs'
-                              , prefix=cl_param.description)
+    log_file = initialize_log(cl_param.hostname, dest_path='/home/logs', prefix=cl_param.description,
+                              log_format=cl_param.log_format)
 
     # start = time.time()
 
@@ -930,7 +2675,28 @@ def main(host=None):
         _multiple_topics_cl = MultipleTopics(parser, cl_param.multiple_topics)
         _multiple_topics_dict = _multiple_topics_cl.topics_dict
 
-    if cl_param.topic is not None:
+    _topic_tree = cl_param.topic_tree()
+    if _topic_tree is not None:
+        # Publishers on the leaves, subscribers on the filters, each waiting for the messages its filter matches
+        print(f'Topic tree: {_topic_tree.leaves} leaves, {len(set(_topic_tree.publisher_topics))} published')
+        for i, (_filter, _expected) in enumerate(zip(_topic_tree.filters,
+                                                     cl_param.tree_expected_messages(_topic_tree))):
+            _timeout = cl_param.sub_timeout
+            if cl_param.sub_clients > cl_param.sub_timeout:
+                _timeout = cl_param.sub_clients * 3.5
+            print(f'Client sub{i} subscribes to {_filter}, expecting {_expected} messages')
+            sub = Sub(cl_param.client_node(Role.SUB, len(sub_threads)), topic=_filter, port=cl_param.port,
+                      client_id='sub' + str(i), tls=cl_param.tls, auth=cl_param.auth, timeout=_timeout,
+                      max_count=_expected, qos=cl_param.qos, **cl_param.sub_options())
+            sub_threads.append(sub)
+
+        for i, _leaf in enumerate(_topic_tree.publisher_topics):
+            pub = Pub(cl_param.client_node(Role.PUB, len(pub_threads)), topic=_leaf, port=cl_param.port,
+                      client_id='pub' + str(i), tls=cl_param.tls, auth=cl_param.auth, timeout=cl_param.pub_timeout,
+                      max_count=cl_param.pub_count, qos=cl_param.qos, **cl_param.pub_options())
+            pub_threads.append(pub)
+
+    elif cl_param.topic is not None:
         # print('Single topics')
         # ALL Subscribers and publishers shall work on one single topic
         for i in range(cl_param.sub_clients):
@@ -938,18 +2704,16 @@ def main(host=None):
             _timeout = cl_param.sub_timeout
             if cl_param.sub_clients > cl_param.sub_timeout:
                 _timeout = cl_param.sub_clients * 3.5
-            sub = Sub(cl_param.hostname, topic=cl_param.topic, port=cl_param.port, client_id='sub' + str(i),
-                      tls=cl_param.tls, auth=cl_param.auth, timeout=_timeout,
-                      max_count=cl_param.sub_count, qos=cl_param.qos)
+            sub = Sub(cl_param.client_node(Role.SUB, len(sub_threads)), topic=cl_param.topic, port=cl_param.port,
+                      client_id='sub' + str(i), tls=cl_param.tls, auth=cl_param.auth, timeout=_timeout,
+                      max_count=cl_param.sub_count, qos=cl_param.qos, **cl_param.sub_options())
             sub_threads.append(sub)
-            sub.start()
 
         for i in range(cl_param.pub_clients):
-            pub = Pub(cl_param.hostname, topic=cl_param.topic, port=cl_param.port, client_id='pub' + str(i),
-                      tls=cl_param.tls, auth=cl_param.auth, timeout=cl_param.pub_timeout,
-                      max_count=cl_param.pub_count, qos=cl_param.qos)
+            pub = Pub(cl_param.client_node(Role.PUB, len(pub_threads)), topic=cl_param.topic, port=cl_param.port,
+                      client_id='pub' + str(i), tls=cl_param.tls, auth=cl_param.auth, timeout=cl_param.pub_timeout,
+                      max_count=cl_param.pub_count, qos=cl_param.qos, **cl_param.pub_options())
             pub_threads.append(pub)
-            pub.start()
 
     if _multiple_topics_dict is not None:
         # print('Multiple topics')
@@ -974,26 +2738,29 @@ def main(host=None):
                     # Single topic
                     _topics.append(_all)
             _nr_subs = _cluster[Keywords.SUBS]
+            # The group of the cluster overrides --share-group
+            _sub_options = cl_param.sub_options()
+            if _cluster.get(Keywords.SHARE_GROUP) is not None:
+                _sub_options['share_group'] = cl_param.get_share_group(_cluster[Keywords.SHARE_GROUP])
             for _sub_ind in range(_nr_subs):
                 _sub_client_id += 1
                 # set the timeout depending on the number of subs
                 _timeout = cl_param.sub_timeout
                 if cl_param.sub_clients > cl_param.sub_timeout:
                     _timeout = cl_param.sub_clients * 3.5
-                sub = Sub(cl_param.hostname, topic=_topics, port=cl_param.port,
+                sub = Sub(cl_param.client_node(Role.SUB, len(sub_threads)), topic=_topics, port=cl_param.port,
                           client_id='sub' + str(_sub_client_id), tls=cl_param.tls,
                           auth=cl_param.auth, timeout=_timeout,
-                          max_count=cl_param.sub_count, qos=cl_param.qos)
+                          max_count=cl_param.sub_count, qos=cl_param.qos, **_sub_options)
                 sub_threads.append(sub)
-                sub.start()
             _nr_pubs = _cluster[Keywords.PUBS]
             for _pub_ind in range(_nr_pubs):
                 _pub_client_id += 1
-                pub = Pub(cl_param.hostname, topic=_topics, port=cl_param.port,
+                pub = Pub(cl_param.client_node(Role.PUB, len(pub_threads)), topic=_topics, port=cl_param.port,
                           client_id='pub' + str(_pub_client_id), tls=cl_param.tls, auth=cl_param.auth,
-                          timeout=cl_param.pub_timeout, max_count=cl_param.pub_count, qos=cl_param.qos)
+                          timeout=cl_param.pub_timeout, max_count=cl_param.pub_count, qos=cl_param.qos,
+                          **cl_param.pub_options())
                 pub_threads.append(pub)
-                pub.start()
 
         if _default_topic is not None:
             if _all is not None:
@@ -1005,63 +2772,81 @@ def main(host=None):
                     _default_topic.append(_all)
             # The default subscribing item -> the remaining clients which ought to connect to the default topics
             for _pub_ind in range(cl_param.pub_clients - _multiple_topics_cl.publishers):
-                pub = Pub(cl_param.hostname, topic=_default_topic, port=cl_param.port,
+                pub = Pub(cl_param.client_node(Role.PUB, len(pub_threads)), topic=_default_topic, port=cl_param.port,
                           client_id='pub' + str(_multiple_topics_cl.publishers + _pub_ind),
                           tls=cl_param.tls, auth=cl_param.auth, timeout=cl_param.pub_timeout,
-                          max_count=cl_param.pub_count, qos=cl_param.qos)
+                          max_count=cl_param.pub_count, qos=cl_param.qos, **cl_param.pub_options())
                 pub_threads.append(pub)
-                pub.start()
 
             for _sub_ind in range(cl_param.sub_clients - _multiple_topics_cl.subscribers):
                 # set the timeout depending on the number of subs
                 _timeout = cl_param.sub_timeout
                 if cl_param.sub_clients > cl_param.sub_timeout:
                     _timeout = cl_param.sub_clients * 3.5
-                sub = Sub(cl_param.hostname, topic=_default_topic, port=cl_param.port,
+                sub = Sub(cl_param.client_node(Role.SUB, len(sub_threads)), topic=_default_topic, port=cl_param.port,
                           client_id='sub' + str(_multiple_topics_cl.subscribers + _sub_ind), tls=cl_param.tls,
                           auth=cl_param.auth, timeout=_timeout,
-                          max_count=cl_param.sub_count, qos=cl_param.qos)
+                          max_count=cl_param.sub_count, qos=cl_param.qos, **cl_param.sub_options())
                 sub_threads.append(sub)
-                sub.start()
 
         elif _default_topic is None and _all is not None:
             # For in case just when we haven't
             for _pub_ind in range(cl_param.pub_clients - _multiple_topics_cl.publishers):
-                pub = Pub(cl_param.hostname, topic=_all, port=cl_param.port,
+                pub = Pub(cl_param.client_node(Role.PUB, len(pub_threads)), topic=_all, port=cl_param.port,
                           client_id='pub' + str(_multiple_topics_cl.publishers + _pub_ind),
                           tls=cl_param.tls, auth=cl_param.auth, timeout=cl_param.pub_timeout,
-                          max_count=cl_param.pub_count, qos=cl_param.qos)
+                          max_count=cl_param.pub_count, qos=cl_param.qos, **cl_param.pub_options())
                 pub_threads.append(pub)
-                pub.start()
 
             for _sub_ind in range(cl_param.sub_clients - _multiple_topics_cl.subscribers):
                 # set the timeout depending on the number of subs
                 _timeout = cl_param.sub_timeout
                 if cl_param.sub_clients > cl_param.sub_timeout:
                     _timeout = cl_param.sub_clients * 3.5
-                sub = Sub(cl_param.hostname, topic=_all, port=cl_param.port,
+                sub = Sub(cl_param.client_node(Role.SUB, len(sub_threads)), topic=_all, port=cl_param.port,
                           client_id='sub' + str(_multiple_topics_cl.subscribers + _sub_ind), tls=cl_param.tls,
                           auth=cl_param.auth, timeout=_timeout,
-                          max_count=cl_param.sub_count, qos=cl_param.qos)
+                          max_count=cl_param.sub_count, qos=cl_param.qos, **cl_param.sub_options())
                 sub_threads.append(sub)
-                sub.start()
+
+    # Clock offset before the measurements, the clients are not connected yet
+    _clock_before = synchronise_clock(cl_param)
+    # The TLS handshakes too, so that the load of the clients does not weigh on them
+    _tls_results = measure_handshakes(cl_param)
+    _tls_summary = write_tls(tls_path(log_file), cl_param, _tls_results) if _tls_results else None
+
+    # The log is filled by the writer while the clients are running
+    log_writer = LogWriter(create_log_rings(sub_threads + pub_threads, cl_param), log_file,
+                           log_format=cl_param.log_format)
+    log_writer.start()
 
     # You can insert the logic of the default as well
-    start_timer = datetime.datetime.utcnow()
-    for client in sub_threads:
-        client.join(cl_param.sub_timeout)
-        curr_time = datetime.datetime.utcnow()
-        delta = start_timer - curr_time
-        if delta.total_seconds() >= cl_param.sub_timeout:
-            raise Exception('Timed out waiting for threads to return')
-
-    start_timer = datetime.datetime.utcnow()
-    for client in pub_threads:
-        client.join(cl_param.pub_timeout)
-        curr_time = datetime.datetime.utcnow()
-        delta = start_timer - curr_time
-        if delta.total_seconds() >= cl_param.sub_timeout:
-            raise Exception('Timed out waiting for threads to return')
+    _ramp_duration = schedule_connections(sub_threads + pub_threads, cl_param)
+    _barrier = start_barrier(sub_threads, pub_threads, cl_param, _clock_before)
+    # The clients may wait for the other containers at the barrier
+    _ramp_duration += _barrier.timeout if _barrier is not None else 0
+    engine_workers = start_clients(sub_threads + pub_threads, cl_param)
+
+    if cl_param.engine == Engines.PROCESS:
+        start_timer = datetime.datetime.utcnow()
+        for client in sub_threads:
+            client.join(cl_param.sub_timeout + cl_param.sub_offline_period + _ramp_duration)
+            curr_time = datetime.datetime.utcnow()
+            delta = start_timer - curr_time
+            if delta.total_seconds() >= cl_param.sub_timeout:
+                raise Exception('Timed out waiting for threads to return')
+
+        start_timer = datetime.datetime.utcnow()
+        for client in pub_threads:
+            client.join(cl_param.pub_timeout + _ramp_duration)
+            curr_time = datetime.datetime.utcnow()
+            delta = start_timer - curr_time
+            if delta.total_seconds() >= cl_param.sub_timeout:
+                raise Exception('Timed out waiting for threads to return')
+    else:
+        for worker in engine_workers:
+            worker.join(max(cl_param.sub_timeout + cl_param.sub_offline_period, cl_param.pub_timeout) +
+                        _ramp_duration)
 
     # Let's do some maths
     # Used to shut down the threads when they connection errors are present
@@ -1108,34 +2893,95 @@ def main(host=None):
         print("%s publishing workers failed" % failed_count)
     pub_times = numpy.array(pub_times)
 
-    # Get the log from sub
-    _ind_log = 0
-    print('Pulling the data from the log queue')
-    logs = []
-    while not LOG_QUEUE.empty():
-        logs.append(LOG_QUEUE.get(timeout=cl_param.sub_timeout))
-        _ind_log += 1
-        print(f'Pulling {_ind_log}-th item from log')
-
-    # logs = []
-    # for i in range(nr_msg):
-    #     try:
-    #         logs.append(LOG_QUEUE.get(_sub_timeout))
-    #     except multiprocessing.queues.Empty:
-    #         continue
-
-    # if len(sub_times) < _sub_clients:
-    #     failed_count = _sub_clients - len(sub_times)
-    #     print("%s subscription workers failed" % failed_count)
-    # if len(pub_times) < _pub_clients:
-    #     failed_count = _pub_clients - len(pub_times)
-    #     print("%s publishing workers failed" % failed_count)
-
-    # if LOG_QUEUE.qsize() < nr_msg:
-    #     print('Something went wrong with logging. There are less messages logged than sent')
-
-    # Writing the result to log file
-    write(log_file, logs)
+    rate_summaries = []
+    if cl_param.client_rate:
+        for i in range(_active_pub_clients):
+            try:
+                rate_summaries.append(RATE_QUEUE.get(timeout=1))
+            except queue.Empty:
+                break
+
+    e2e_histograms = []
+    for i in range(_active_sub_clients):
+        try:
+            _client_id, _histogram = E2E_QUEUE.get(timeout=1)
+        except queue.Empty:
+            break
+        e2e_histograms.append((_client_id, LatencyHistogram.from_dict(_histogram)))
+
+    sequences = []
+    for i in range(len(e2e_histograms)):
+        try:
+            sequences.append(SEQUENCE_QUEUE.get(timeout=1))
+        except queue.Empty:
+            break
+
+    share_members = []
+    if cl_param.share_groups:
+        for i in range(sum(1 for sub in sub_threads if sub.share_group is not None)):
+            try:
+                share_members.append(SHARE_QUEUE.get(timeout=1))
+            except queue.Empty:
+                break
+
+    size_stats = []
+    if cl_param.msg_sizes:
+        for i in range(len(e2e_histograms)):
+            try:
+                size_stats.append(SIZE_QUEUE.get(timeout=1))
+            except queue.Empty:
+                break
+
+    node_histograms = []
+    if cl_param.placement is not None:
+        for i in range(len(e2e_histograms)):
+            try:
+                node_histograms.append(NODE_QUEUE.get(timeout=1))
+            except queue.Empty:
+                break
+
+    backlog_summaries = []
+    if cl_param.sub_offline_period:
+        for i in range(_active_sub_clients):
+            try:
+                backlog_summaries.append(BACKLOG_QUEUE.get(timeout=1))
+            except queue.Empty:
+                break
+    _backlog_totals = write_backlog(backlog_path(log_file), cl_param, backlog_summaries) \
+        if backlog_summaries else None
+
+    ack_histograms = []
+    if cl_param.qos > 0:
+        for i in range(_active_pub_clients):
+            try:
+                _client_id, _histogram = ACK_QUEUE.get(timeout=1)
+            except queue.Empty:
+                break
+            ack_histograms.append((_client_id, LatencyHistogram.from_dict(_histogram)))
+
+    _barrier_report = write_barrier(barrier_path(log_file), _barrier, collect_barrier_skews(len(pub_threads))) \
+        if _barrier is not None else None
+
+    connections = collect_connections(len(sub_threads) + len(pub_threads))
+    reasons = collect_reason_codes() if cl_param.protocol == MQTTProtocol.V5 else []
+    _connect_histogram = connect_histogram(connections, cl_param.histogram_precision)
+    if connections:
+        write_connections(connect_path(log_file), cl_param, connections, _connect_histogram)
+
+    # Write the rows still in the log rings
+    print(f'{log_writer.close()} rows written to {log_file}')
+    if log_writer.dropped:
+        print(f'{log_writer.dropped} rows dropped because the log rings were full, see --ring-size')
+
+    _clock_after = synchronise_clock(cl_param)
+    if _clock_before or _clock_after:
+        _clock = write_clock(clock_path(log_file), cl_param, _clock_before, _clock_after)
+        for _phase in ('before', 'after'):
+            if _clock[_phase]:
+                print(f'Clock offset {_phase}: {_clock[_phase]["offset_ns"] / 1e6:.3f} ms '
+                      f'(rtt {_clock[_phase]["rtt_ns"] / 1e6:.3f} ms)')
+        if _clock['drift_ppm'] is not None:
+            print(f'Clock drift: {_clock["drift_ppm"]:.3f} ppm')
 
     # Benchmarking components
     sub_mean_duration = sub_std_duration = sub_avg_throughput = sub_total_thpt = 0
@@ -1147,18 +2993,24 @@ def main(host=None):
     print(pub_times)
 
     # Check whether sub are present
-    if cl_param.sub_count * cl_param.sub_clients > 0:
+    # The subscribers of a topic tree wait for different numbers of messages, the members of a shared group
+    # split the messages of the group
+    _sub_total_count = sum(sub.max_count for sub in sub_threads if sub.share_group is None) + \
+        sum(_group.received for _group in cl_param.share_groups.values())
+    if _sub_total_count > 0:
         sub_mean_duration = numpy.mean(sub_times)
         sub_std_duration = numpy.std(sub_times)
-        sub_avg_throughput = float(cl_param.sub_count) / float(sub_mean_duration)
-        sub_total_thpt = float(cl_param.sub_count * cl_param.sub_clients) / float(sub_mean_duration)
+        sub_avg_throughput = float(_sub_total_count) / len(sub_threads) / float(sub_mean_duration)
+        sub_total_thpt = float(_sub_total_count) / float(sub_mean_duration)
 
-    if cl_param.pub_count * cl_param.pub_clients > 0:
+    # Each phase of a size sweep publishes pub_count messages
+    _pub_count = cl_param.pub_count * cl_param.sweep_phases
+    if _pub_count * cl_param.pub_clients > 0:
         pub_mean_duration = numpy.mean(pub_times)
         pub_std_duration = numpy.std(pub_times)
-        pub_avg_throughput = float(cl_param.pub_count) / float(pub_mean_duration)
+        pub_avg_throughput = float(_pub_count) / float(pub_mean_duration)
         pub_total_thpt = float(
-            cl_param.pub_count * cl_param.pub_clients) / float(pub_mean_duration)
+            _pub_count * cl_param.pub_clients) / float(pub_mean_duration)
 
     # Explanation of the parameters:
     # pub_times is the overall publish time for each of the clients,
@@ -1201,11 +3053,37 @@ Total Throughput (msg_count * clients) / (avg. sub time): %s
         pub_avg_throughput,
         pub_total_thpt,
     ))
+    if e2e_histograms:
+        _e2e_histogram = write_histograms(histogram_path(log_file), cl_param.hostname, e2e_histograms)
+        print(format_summary('End-to-end delay', _e2e_histogram))
+    if sequences:
+        print_sequence_report(write_sequences(sequence_path(log_file), cl_param.hostname, sequences))
+    if size_stats:
+        print('Payload size sweep')
+        print_size_table(write_sizes(sizes_path(log_file), cl_param.hostname, size_stats).table())
+    if node_histograms:
+        print_node_matrix(write_node_matrix(nodes_path(log_file), cl_param.hostname, node_histograms))
+    if share_members:
+        print_groups(write_share_groups(share_path(log_file), cl_param.hostname, share_members, e2e_histograms))
+    print_rate_report(rate_summaries)
+    print_ack_report(ack_histograms, cl_param.qos, cl_param.client_rate)
+    print_connect_report(connections, _connect_histogram)
+    if _barrier_report is not None:
+        print_barrier_report(_barrier_report, cl_param.histogram_precision)
+    if _tls_summary is not None:
+        print_tls_report(_tls_summary)
+    if reasons:
+        print_reason_report(write_reason_codes(reasons_path(log_file), cl_param.hostname, reasons))
+    if _backlog_totals is not None:
+        print_backlog_report(backlog_summaries, _backlog_totals)
 
     _hostname = os.getenv('HOSTNAME')
+    _watched = sub_threads if cl_param.engine == Engines.PROCESS else engine_workers
     while True:
-        if all((not sub.is_alive()) for sub in sub_threads):
+        if all((not sub.is_alive()) for sub in _watched):
             print(f'{_hostname} finished its operation')
+            if not linger:
+                return
         time.sleep(2)
 
 
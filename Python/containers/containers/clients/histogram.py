@@ -0,0 +1,163 @@
+import json
+import math
+import sys
+
+DEFAULT_SIGNIFICANT_FIGURES = 3
+# Percentiles printed in the summaries
+SUMMARY_PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LatencyHistogram:
+    """Log-linear histogram of integer values (e.g. latencies in ns), in the style of HdrHistogram.
+
+    Values are grouped in buckets whose width grows with the magnitude of the value, so that any
+    recorded value is known with the given number of significant figures whatever its size. Only
+    the non-empty buckets are stored, which keeps the histogram small enough to be queued between
+    processes, merged and dumped to JSON.
+    """
+
+    def __init__(self, significant_figures: int = DEFAULT_SIGNIFICANT_FIGURES):
+        if not 1 <= significant_figures <= 5:
+            raise ValueError('The significant figures of the histogram must be between 1 and 5')
+        self.__significant_figures = significant_figures
+        # Values below the sub-bucket count are stored exactly, larger ones with the same relative precision
+        self.__sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_figures))
+        self.__half_bits = self.__sub_bucket_bits - 1
+        self.__counts = {}
+        self.__count = 0
+        self.__total = 0
+        self.__min = None
+        self.__max = None
+
+    @property
+    def significant_figures(self):
+        return self.__significant_figures
+
+    @property
+    def count(self):
+        return self.__count
+
+    @property
+    def total(self):
+        return self.__total
+
+    @property
+    def buckets(self):
+        """The counts of the non-empty buckets, by bucket index"""
+        return self.__counts
+
+    @property
+    def min(self):
+        return self.__min
+
+    @property
+    def max(self):
+        return self.__max
+
+    def _index(self, value: int) -> int:
+        _shift = value.bit_length() - self.__sub_bucket_bits
+        if _shift <= 0:
+            return value
+        return (_shift << self.__half_bits) + (value >> _shift)
+
+    def _highest_equivalent(self, index: int) -> int:
+        """The largest value falling in the bucket of the index"""
+        _shift = max(0, (index >> self.__half_bits) - 1)
+        return ((index - (_shift << self.__half_bits)) << _shift) + (1 << _shift) - 1
+
+    def record(self, value: int, count: int = 1):
+        """Records a non-negative value, negative ones (e.g. from unsynchronised clocks) are clamped to 0"""
+        value = max(0, int(value))
+        _index = self._index(value)
+        self.__counts[_index] = self.__counts.get(_index, 0) + count
+        self.__count += count
+        self.__total += value * count
+        if self.__min is None or value < self.__min:
+            self.__min = value
+        if self.__max is None or value > self.__max:
+            self.__max = value
+
+    def merge(self, other: 'LatencyHistogram'):
+        """Adds the values of another histogram of the same precision"""
+        if other.significant_figures != self.__significant_figures:
+            raise ValueError('Only histograms with the same significant figures can be merged')
+        for _index, _count in other.buckets.items():
+            self.__counts[_index] = self.__counts.get(_index, 0) + _count
+        self.__count += other.count
+        self.__total += other.total
+        for _value in (other.min, other.max):
+            if _value is not None:
+                self.__min = _value if self.__min is None else min(self.__min, _value)
+                self.__max = _value if self.__max is None else max(self.__max, _value)
+        return self
+
+    def mean(self) -> float:
+        return self.__total / self.__count if self.__count else 0.0
+
+    def percentile(self, percentile: float) -> int:
+        """The value below which the given percentage of the recorded values fall"""
+        if not self.__count:
+            return 0
+        _target = max(1, math.ceil(percentile / 100 * self.__count))
+        _seen = 0
+        for _index in sorted(self.__counts):
+            _seen += self.__counts[_index]
+            if _seen >= _target:
+                return min(self._highest_equivalent(_index), self.__max)
+        return self.__max
+
+    def summary(self, percentiles: tuple = SUMMARY_PERCENTILES) -> dict:
+        _summary = {'count': self.__count, 'min': self.__min or 0, 'mean': self.mean()}
+        for _percentile in percentiles:
+            _summary[f'p{_percentile:g}'] = self.percentile(_percentile)
+        _summary['max'] = self.__max or 0
+        return _summary
+
+    def to_dict(self) -> dict:
+        """JSON-compatible representation, also used to pass the histogram through the queues"""
+        return {
+            'significant_figures': self.__significant_figures,
+            'count': self.__count,
+            'total': self.__total,
+            'min': self.__min,
+            'max': self.__max,
+            'counts': {str(_index): _count for _index, _count in sorted(self.__counts.items())}
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LatencyHistogram':
+        _histogram = cls(data['significant_figures'])
+        _histogram._load(data)
+        return _histogram
+
+    def _load(self, data: dict):
+        self.__counts = {int(_index): _count for _index, _count in data['counts'].items()}
+        self.__count = data['count']
+        self.__total = data['total']
+        self.__min = data['min']
+        self.__max = data['max']
+
+
+def format_summary(label: str, histogram: LatencyHistogram, unit: float = 1e6, unit_name: str = 'ms') -> str:
+    """One line summary of a histogram of ns values, by default printed in ms"""
+    _summary = histogram.summary()
+    _values = ' '.join(f'{_key}={_value / unit:.3f}' for _key, _value in _summary.items() if _key != 'count')
+    return f'{label}: count={_summary["count"]} {_values} ({unit_name})'
+
+
+def merge_histogram_files(paths: list) -> LatencyHistogram:
+    """Merges the container histograms of the JSON files written next to the csv logs"""
+    _histogram = None
+    for path in paths:
+        with open(path, 'r') as f:
+            _container_histogram = LatencyHistogram.from_dict(json.load(f)['all'])
+        _histogram = _container_histogram if _histogram is None else _histogram.merge(_container_histogram)
+    return _histogram
+
+
+if __name__ == '__main__':
+    # python histogram.py logs/*_e2e.json -> summary of the delays of all the containers
+    if len(sys.argv) < 2:
+        print(f'Usage: {sys.argv[0]} <histogram json files>')
+        exit(1)
+    print(format_summary('End-to-end delay', merge_histogram_files(sys.argv[1:])))
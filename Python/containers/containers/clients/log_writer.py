@@ -0,0 +1,176 @@
+import json
+import os
+import struct
+import sys
+import time
+from threading import Event, Thread
+
+import numpy
+
+from payload import host_name
+
+
+class LogFormat:
+    CSV = 'csv'
+    COLUMNAR = 'columnar'
+    ALL = (CSV, COLUMNAR)
+
+
+# Columns of the log file, the clients write the rows in the log rings as records of the same order
+LOG_COLUMNS = ('hostname_origin', 'pub_client_id', 'sequence', 'publish_connect_init_ns', 'publish_connect_ack_ns',
+               'publish_timestamp_ns', 'publish_qos', 'hostname_destination', 'sub_client', 'arrival_timestamp_ns',
+               'e2e_delay_ns', 'publisher_container', 'subscriber_container')
+LOG_ROW_FORMAT = '%s' + ';%s' * (len(LOG_COLUMNS) - 1)
+LOG_EXTENSIONS = {LogFormat.CSV: '.csv', LogFormat.COLUMNAR: '.col'}
+# Hosts and clients are stored as their numeric id, written back as names in the csv
+_HOST_COLUMNS = tuple(LOG_COLUMNS.index(_column) for _column in ('hostname_origin', 'hostname_destination',
+                                                                   'publisher_container', 'subscriber_container'))
+_SUB_CLIENT_COLUMN = LOG_COLUMNS.index('sub_client')
+LOG_RECORD = numpy.dtype([(_column, '<i8') for _column in LOG_COLUMNS])
+
+# Rows written at most in one go from a ring, so a long backlog is still flushed regularly
+LOG_BATCH_SIZE = 4096
+# Seconds between two flushes of the written rows to the file
+LOG_FLUSH_INTERVAL = 1.0
+# Seconds between two polls of the rings when they are all empty
+LOG_POLL_INTERVAL = 0.05
+LOG_BUFFER_SIZE = 1 << 20
+
+COLUMNAR_MAGIC = b'MQTTLOG1'
+# Every block of the columnar file starts with its number of rows, followed by one int64 array per column
+COLUMNAR_BLOCK = struct.Struct('<I')
+COLUMNAR_DTYPE = numpy.dtype('<i8')
+
+
+def format_log_row(row: tuple) -> str:
+    """Formats a log record, with the hosts in dotted form and the subscriber named as in the clients"""
+    row = list(row)
+    for _ind in _HOST_COLUMNS:
+        row[_ind] = host_name(row[_ind])
+    row[_SUB_CLIENT_COLUMN] = 'sub%d' % row[_SUB_CLIENT_COLUMN]
+    return LOG_ROW_FORMAT % tuple(row)
+
+
+class LogWriter(Thread):
+    """Drains the log rings of the clients in batches while they are running and appends the rows to the
+    log file through a large buffer, flushed at least every flush interval. It lives in the main process,
+    away from the network loops of the clients, and a container stopped halfway still leaves the rows
+    received until the last flush on disk.
+    """
+
+    def __init__(self, rings: list, path: str, log_format: str = LogFormat.CSV, batch_size: int = LOG_BATCH_SIZE,
+                 flush_interval: float = LOG_FLUSH_INTERVAL, buffer_size: int = LOG_BUFFER_SIZE):
+        super(LogWriter, self).__init__(name='log-writer', daemon=True)
+        if log_format not in LogFormat.ALL:
+            raise ValueError(f'The log format must be one of {LogFormat.ALL}')
+        self.__rings = rings
+        self.__path = path
+        self.__log_format = log_format
+        self.__batch_size = batch_size
+        self.__flush_interval = flush_interval
+        self.__closing = Event()
+        self.__rows = 0
+        self.__file = open(path, 'wb', buffering=buffer_size)
+        self._write_header()
+        self.__file.flush()
+
+    @property
+    def path(self):
+        return self.__path
+
+    @property
+    def rows(self):
+        return self.__rows
+
+    @property
+    def dropped(self):
+        """The rows lost because a ring was full"""
+        return sum(ring.dropped for ring in self.__rings)
+
+    def _write_header(self):
+        if self.__log_format == LogFormat.CSV:
+            self.__file.write((';'.join(LOG_COLUMNS) + '\n').encode('ascii'))
+        else:
+            _header = json.dumps({'columns': LOG_COLUMNS, 'dtype': COLUMNAR_DTYPE.str}).encode('ascii')
+            self.__file.write(COLUMNAR_MAGIC + COLUMNAR_BLOCK.pack(len(_header)) + _header)
+
+    def _write_batch(self, batch: numpy.ndarray):
+        if self.__log_format == LogFormat.CSV:
+            self.__file.write(('\n'.join(map(format_log_row, batch.tolist())) + '\n').encode('utf-8'))
+        else:
+            self.__file.write(COLUMNAR_BLOCK.pack(len(batch)))
+            for _column in LOG_COLUMNS:
+                self.__file.write(batch[_column].astype(COLUMNAR_DTYPE, copy=False).tobytes())
+        self.__rows += len(batch)
+
+    def _drain(self) -> int:
+        """Writes a batch from each ring
+        :return: The number of rows written
+        """
+        _written = 0
+        for ring in self.__rings:
+            batch = ring.read(self.__batch_size)
+            if len(batch):
+                self._write_batch(batch)
+                _written += len(batch)
+        return _written
+
+    def run(self):
+        _last_flush = time.monotonic()
+        while not self.__closing.is_set():
+            if not self._drain():
+                self.__closing.wait(LOG_POLL_INTERVAL)
+            if time.monotonic() - _last_flush >= self.__flush_interval:
+                self.__file.flush()
+                _last_flush = time.monotonic()
+
+    def close(self, timeout: float = None) -> int:
+        """Writes the rows still in the rings and closes the file
+        :return: The number of rows written
+        """
+        self.__closing.set()
+        self.join(timeout)
+        while self._drain():
+            pass
+        self.__file.close()
+        return self.__rows
+
+
+def log_path(log_file: str, log_format: str) -> str:
+    """The path of the log file with the extension of the format"""
+    return os.path.splitext(log_file)[0] + LOG_EXTENSIONS[log_format]
+
+
+def read_columnar(path: str) -> dict:
+    """Reads a columnar log file, a block truncated by a stopped container is left out
+    :return: The numpy array of each column, by column name
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f'{path} is not a columnar log file')
+        _header = json.loads(f.read(COLUMNAR_BLOCK.unpack(f.read(COLUMNAR_BLOCK.size))[0]))
+        _columns = _header['columns']
+        _dtype = numpy.dtype(_header['dtype'])
+        _blocks = []
+        while True:
+            _size = f.read(COLUMNAR_BLOCK.size)
+            if len(_size) < COLUMNAR_BLOCK.size:
+                break
+            _rows = COLUMNAR_BLOCK.unpack(_size)[0]
+            _data = f.read(_rows * len(_columns) * _dtype.itemsize)
+            if len(_data) < _rows * len(_columns) * _dtype.itemsize:
+                break
+            _blocks.append(numpy.frombuffer(_data, dtype=_dtype).reshape(len(_columns), _rows))
+    _values = numpy.concatenate(_blocks, axis=1) if _blocks else numpy.empty((len(_columns), 0), dtype=_dtype)
+    return {_column: _values[_ind] for _ind, _column in enumerate(_columns)}
+
+
+if __name__ == '__main__':
+    # python log_writer.py logs/_log_2.col > _log_2.csv -> converts a columnar log to csv
+    if len(sys.argv) != 2:
+        print(f'Usage: {sys.argv[0]} <columnar log file>')
+        exit(1)
+    _log = read_columnar(sys.argv[1])
+    print(';'.join(_log))
+    for _row in zip(*(_values.tolist() for _values in _log.values())):
+        print(format_log_row(_row))
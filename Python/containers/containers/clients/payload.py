@@ -0,0 +1,218 @@
+import datetime
+import ipaddress
+import os
+import random
+import re
+import string
+import struct
+import zlib
+
+
+class PayloadEntropy:
+    RANDOM = 'random'
+    COMPRESSIBLE = 'compressible'
+    FIXED = 'fixed'
+    ALL = (RANDOM, COMPRESSIBLE, FIXED)
+
+
+class HeaderFormat:
+    BINARY = 'binary'
+    TEXT = 'text'
+    # MQTT v5 user properties, the payload is only the filler
+    PROPERTIES = 'properties'
+    ALL = (BINARY, TEXT, PROPERTIES)
+
+
+# Minimum size of the pre-generated filler, so that consecutive random payloads differ
+POOL_MIN_SIZE = 64 * 1024
+# Length of the block repeated over the whole filler in compressible mode
+COMPRESSIBLE_BLOCK = 64
+# Byte-to-lowercase table: the filler stays printable, as the old random.choice filler
+_LOWERCASE_TABLE = bytes(ord(string.ascii_lowercase[_b % len(string.ascii_lowercase)]) for _b in range(256))
+
+_POOLS = {}
+
+# First byte of a binary header: not printable, so it can't be mistaken for a text header
+HEADER_MAGIC = 0xB5
+HEADER_VERSION = 2
+# magic, version, qos, pad, host id, publisher id, sequence number,
+# connect init, connack and publish timestamps (ns since the epoch), publisher container id
+HEADER = struct.Struct('!BBBxIIQqqqI')
+HEADER_SIZE = HEADER.size
+# qos, host, publisher id, sequence number, connect init, connack, publish timestamp, publisher container
+TEXT_HEADER = '%d_%s_%d_%d_%d_%d_%d_%s_'
+# Host names may hold underscores (docker compose names), so the host is what lies between the qos and the
+# numbers following it: the filler is lowercase letters only and the last underscore closes the header
+TEXT_HEADER_PATTERN = re.compile(rb'(\d+)_(.+)_(-?\d+)_(-?\d+)_(-?\d+)_(-?\d+)_(-?\d+)_([^_]+)_')
+# Longer than any text header, the pattern is only searched at the start of the payload
+TEXT_HEADER_MAX_SIZE = 1024
+# User property names of the header fields, in the order of the decoded header
+PROPERTY_KEYS = ('q', 'h', 'p', 's', 'ci', 'ca', 't', 'c')
+_EPOCH = datetime.datetime(1970, 1, 1)
+_HOST_NAMES = {}
+
+
+def host_id(hostname: str) -> int:
+    """Numeric id of a host: the IPv4 address as integer, or a checksum of the name"""
+    try:
+        return int(ipaddress.IPv4Address(hostname))
+    except ipaddress.AddressValueError:
+        _host_id = zlib.crc32(hostname.encode('utf-8'))
+        # Names are only known to the processes which have seen them, the others print the id as address
+        _HOST_NAMES[_host_id] = hostname
+        return _host_id
+
+
+def host_name(_host_id: int) -> str:
+    """Dotted representation of a host id, cached since a run only sees a few hosts"""
+    _name = _HOST_NAMES.get(_host_id)
+    if _name is None:
+        _name = _HOST_NAMES[_host_id] = str(ipaddress.IPv4Address(_host_id))
+    return _name
+
+
+def client_number(client_id: str) -> int:
+    """Numeric id of a client: the trailing number of ids like pub12, or a checksum of the id"""
+    _match = re.search(r'(\d+)$', client_id)
+    if _match:
+        return int(_match.group(1))
+    return zlib.crc32(client_id.encode('utf-8'))
+
+
+def datetime_to_ns(value: datetime.datetime) -> int:
+    """Nanoseconds since the epoch of a naive UTC datetime, 0 if it is not set"""
+    if value is None:
+        return 0
+    return (value - _EPOCH) // datetime.timedelta(microseconds=1) * 1000
+
+
+def encode_text_header(qos: int, _host_id: int, pub_id: int, seq: int, connect_init: int, connack: int,
+                       publish: int, container_id: int) -> bytes:
+    """Underscore separated header, readable in Wireshark"""
+    return (TEXT_HEADER % (qos, host_name(_host_id), pub_id, seq, connect_init, connack, publish,
+                           host_name(container_id))).encode('ascii')
+
+
+def encode_user_properties(qos: int, _host_id: int, pub_id: int, seq: int, connect_init: int, connack: int,
+                           publish: int, container_id: int) -> list:
+    """The header as (name, value) user properties of an MQTT v5 PUBLISH, with short names as they are
+    sent with every message"""
+    return list(zip(PROPERTY_KEYS, map(str, (qos, _host_id, pub_id, seq, connect_init, connack, publish,
+                                             container_id))))
+
+
+def decode_user_properties(properties: list) -> tuple:
+    """Decodes the header carried by the user properties of a message, as decode_header, None if the
+    properties do not hold a header"""
+    _values = dict(properties)
+    try:
+        return tuple(int(_values[_key]) for _key in PROPERTY_KEYS)
+    except (KeyError, ValueError):
+        return None
+
+
+def decode_header(payload) -> tuple:
+    """Decodes a binary or text header
+    :return: (qos, host id, publisher id, sequence, connect init, connack, publish timestamp, publisher
+    container id) or None if the payload doesn't start with a known header
+    """
+    if len(payload) >= HEADER_SIZE and payload[0] == HEADER_MAGIC:
+        _fields = HEADER.unpack_from(payload)
+        if _fields[1] != HEADER_VERSION:
+            return None
+        return _fields[2:]
+    _match = TEXT_HEADER_PATTERN.match(bytes(payload[:TEXT_HEADER_MAX_SIZE]))
+    if _match is None:
+        return None
+    _fields = _match.groups()
+    try:
+        return (int(_fields[0]), host_id(_fields[1].decode('ascii')), int(_fields[2]), int(_fields[3]),
+                int(_fields[4]), int(_fields[5]), int(_fields[6]), host_id(_fields[7].decode('ascii')))
+    except UnicodeDecodeError:
+        return None
+
+
+class PayloadPool:
+    """Filler bytes generated once per process and shared by all the publishers of the same size"""
+
+    def __init__(self, msg_size: int, entropy: str = PayloadEntropy.RANDOM, seed: int = None):
+        if entropy not in PayloadEntropy.ALL:
+            raise ValueError(f'The payload entropy must be one of {PayloadEntropy.ALL}')
+        self.__msg_size = msg_size
+        self.__entropy = entropy
+        self.__size = max(msg_size * 2, POOL_MIN_SIZE) if entropy == PayloadEntropy.RANDOM else msg_size
+        if entropy == PayloadEntropy.FIXED:
+            _filler = b'a' * self.__size
+        else:
+            _length = self.__size if entropy == PayloadEntropy.RANDOM else COMPRESSIBLE_BLOCK
+            _filler = self._random_bytes(_length, seed).translate(_LOWERCASE_TABLE)
+            if entropy == PayloadEntropy.COMPRESSIBLE:
+                _filler = (_filler * (self.__size // COMPRESSIBLE_BLOCK + 1))[:self.__size]
+        self.__filler = memoryview(_filler)
+
+    @property
+    def msg_size(self):
+        return self.__msg_size
+
+    @property
+    def entropy(self):
+        return self.__entropy
+
+    @property
+    def rotating(self):
+        """Whether consecutive messages take their filler from different offsets of the pool"""
+        return self.__entropy == PayloadEntropy.RANDOM
+
+    @staticmethod
+    def _random_bytes(length: int, seed: int = None) -> bytes:
+        if seed is None:
+            return os.urandom(length)
+        return random.Random(seed).getrandbits(length * 8).to_bytes(length, 'little')
+
+    def filler(self, length: int, offset: int = 0) -> memoryview:
+        """A read-only window of the pool, without copying it"""
+        offset = offset % (len(self.__filler) - length + 1)
+        return self.__filler[offset:offset + length]
+
+
+def get_pool(msg_size: int, entropy: str = PayloadEntropy.RANDOM, seed: int = None) -> PayloadPool:
+    """Returns the pool of the current process for the given size, creating it the first time"""
+    _key = (msg_size, entropy, seed)
+    if _key not in _POOLS:
+        _POOLS[_key] = PayloadPool(msg_size, entropy=entropy, seed=seed)
+    return _POOLS[_key]
+
+
+class PayloadBuffer:
+    """Message buffer of a single publisher: the filler is copied from the pool and for each message
+    only the header is written, together with a fresh filler window when the pool is rotating"""
+
+    def __init__(self, pool: PayloadPool):
+        self.__pool = pool
+        self.__buffer = bytearray(pool.msg_size)
+        self.__header_len = None
+        self.__offset = random.randrange(pool.msg_size or 1)
+
+    def _fill(self, header_len: int):
+        if self.__pool.rotating or header_len != self.__header_len:
+            _filler_len = len(self.__buffer) - header_len
+            self.__buffer[header_len:] = self.__pool.filler(_filler_len, self.__offset)
+            # The next message takes a different window of the pool
+            self.__offset += 2 * _filler_len + 1
+        self.__header_len = header_len
+
+    def build(self, header: bytes) -> bytes:
+        _header_len = len(header)
+        if _header_len >= len(self.__buffer):
+            return bytes(header)
+        self.__buffer[:_header_len] = header
+        self._fill(_header_len)
+        return bytes(self.__buffer)
+
+    def pack(self, *values) -> bytes:
+        """Packs the binary header in place at the start of the buffer"""
+        if HEADER_SIZE >= len(self.__buffer):
+            return HEADER.pack(HEADER_MAGIC, HEADER_VERSION, *values)
+        HEADER.pack_into(self.__buffer, 0, HEADER_MAGIC, HEADER_VERSION, *values)
+        self._fill(HEADER_SIZE)
+        return bytes(self.__buffer)
@@ -0,0 +1,225 @@
+import argparse
+import bisect
+import hashlib
+import json
+
+from histogram import LatencyHistogram, format_summary
+
+# Points of each node on the consistent hashing ring, per unit of weight
+VIRTUAL_NODES = 64
+
+
+class Placement:
+    # All the clients of a container on the broker of the container, as without a plan
+    CONTAINER = 'container'
+    # Client after client on the next node, across the containers
+    ROUND_ROBIN = 'round_robin'
+    # Consistent hashing of the client ids, a node leaving the cluster only moves its own clients
+    HASH = 'hash'
+    # Round robin with as many clients per node as its weight (capacity)
+    WEIGHTED = 'weighted'
+    # Publishers round robin on the publisher nodes, subscribers on the subscriber nodes
+    SPLIT = 'split'
+    ALL = (CONTAINER, ROUND_ROBIN, HASH, WEIGHTED, SPLIT)
+
+
+class Role:
+    PUB = 'pub'
+    SUB = 'sub'
+    ALL = (PUB, SUB)
+
+
+def parse_nodes(spec: str) -> list:
+    """The broker nodes of a comma separated list, None if empty"""
+    if not spec:
+        return None
+    return [_node.strip() for _node in spec.split(',') if _node.strip()] or None
+
+
+def parse_weights(spec: str) -> list:
+    """The integer weights of a comma separated list, None if empty"""
+    _weights = parse_nodes(spec)
+    if _weights is None:
+        return None
+    try:
+        return [int(_weight) for _weight in _weights]
+    except ValueError:
+        raise ValueError(f'The node weights {spec} must be a comma separated list of integers')
+
+
+def client_key(role: str, container: int, client: int) -> str:
+    """The id of a client among all the containers of a role, e.g. pub2-5 for the sixth publisher of the
+    third container"""
+    return f'{role}{container}-{client}'
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+def weighted_sequence(nodes: list, weights: list) -> list:
+    """Smooth weighted round robin: a cycle of sum(weights) nodes, each node appearing as many times as
+    its weight and spread over the cycle rather than in blocks"""
+    _current = [0] * len(nodes)
+    _total = sum(weights)
+    _sequence = []
+    for _ in range(_total):
+        for _ind, _weight in enumerate(weights):
+            _current[_ind] += _weight
+        _chosen = max(range(len(nodes)), key=lambda _ind: _current[_ind])
+        _current[_chosen] -= _total
+        _sequence.append(nodes[_chosen])
+    return _sequence
+
+
+class PlacementPlan:
+    """The broker node of every client of a cluster run.
+
+    The orchestrators compute the plan once, before creating the containers, and pass each container
+    the node of each of its clients. The plan only depends on its parameters, so the publisher and the
+    subscriber orchestrators place their clients consistently on their own.
+    """
+
+    def __init__(self, nodes: list, strategy: str = Placement.ROUND_ROBIN, weights: list = None,
+                 pub_nodes: list = None, sub_nodes: list = None, virtual_nodes: int = VIRTUAL_NODES):
+        if strategy not in Placement.ALL:
+            raise ValueError(f'The placement strategy must be one of {Placement.ALL}')
+        if not nodes:
+            raise ValueError('The placement needs at least one broker node')
+        if weights is not None and (len(weights) != len(nodes) or min(weights) < 1):
+            raise ValueError('The placement needs a weight of at least 1 for each node')
+        self.__strategy = strategy
+        self.__nodes = list(nodes)
+        self.__weights = list(weights) if weights else [1] * len(self.__nodes)
+        self.__role_nodes = {Role.PUB: list(pub_nodes or self.__nodes), Role.SUB: list(sub_nodes or self.__nodes)}
+        self.__sequence = weighted_sequence(self.__nodes, self.__weights)
+        self.__ring = sorted((_hash(f'{_node}#{_point}'), _node) for _node, _weight in zip(self.__nodes, self.__weights)
+                             for _point in range(virtual_nodes * _weight))
+        self.__ring_keys = [_key for _key, _ in self.__ring]
+
+    @property
+    def strategy(self):
+        return self.__strategy
+
+    @property
+    def nodes(self):
+        return self.__nodes
+
+    def node(self, role: str, container: int, client: int, offset: int) -> str:
+        """The node of a client, None for the broker of its container
+        :param offset: The clients of the role in the containers before this one, the containers of a json
+        configuration may run different numbers of clients
+        """
+        _index = offset + client
+        if self.__strategy == Placement.ROUND_ROBIN:
+            return self.__nodes[_index % len(self.__nodes)]
+        if self.__strategy == Placement.WEIGHTED:
+            return self.__sequence[_index % len(self.__sequence)]
+        if self.__strategy == Placement.HASH:
+            _point = bisect.bisect_left(self.__ring_keys, _hash(client_key(role, container, client)))
+            return self.__ring[_point % len(self.__ring)][1]
+        if self.__strategy == Placement.SPLIT:
+            _nodes = self.__role_nodes[role]
+            return _nodes[_index % len(_nodes)]
+        return None
+
+    def container_plan(self, role: str, container: int, clients: int, offset: int = None) -> list:
+        """The node of each client of the role in a container
+        :param offset: The clients of the role in the containers before this one, by default as many as in
+        this container for each of them
+        """
+        if offset is None:
+            offset = container * clients
+        return [self.node(role, container, _client, offset) for _client in range(clients)]
+
+    def plan(self, containers: int, pub_clients: int, sub_clients: int) -> dict:
+        """The node of every client of the run, by role and container"""
+        return {'strategy': self.__strategy,
+                'nodes': self.__nodes,
+                Role.PUB: [self.container_plan(Role.PUB, _ind, pub_clients) for _ind in range(containers)],
+                Role.SUB: [self.container_plan(Role.SUB, _ind, sub_clients) for _ind in range(containers)]}
+
+
+def node_loads(plan: dict) -> dict:
+    """The clients of each role on each node of a plan"""
+    _loads = {}
+    for _role in Role.ALL:
+        for _container in plan.get(_role, []):
+            for _node in _container:
+                _loads.setdefault(_node, dict.fromkeys(Role.ALL, 0))[_role] += 1
+    return _loads
+
+
+def node_matrix(entries: list) -> dict:
+    """Merges the e2e delay histograms by (publisher node, subscriber node)
+    :param entries: (publisher node, subscriber node, histogram) of each subscriber and publisher node
+    """
+    _matrix = {}
+    for _pub_node, _sub_node, _histogram in entries:
+        _matrix.setdefault((_pub_node, _sub_node), LatencyHistogram(_histogram.significant_figures)).merge(_histogram)
+    return _matrix
+
+
+def matrix_to_list(matrix: dict) -> list:
+    """JSON-compatible form of the node matrix"""
+    return [{'pub_node': _pub_node, 'sub_node': _sub_node, 'histogram': _histogram.to_dict()}
+            for (_pub_node, _sub_node), _histogram in sorted(matrix.items())]
+
+
+def print_node_matrix(matrix: dict):
+    """The p50/p99 e2e delay in ms from each publisher node (rows) to each subscriber node (columns)"""
+    _pub_nodes = sorted({_pub_node for _pub_node, _ in matrix})
+    _sub_nodes = sorted({_sub_node for _, _sub_node in matrix})
+    print('Cross-node e2e delay p50/p99 (ms), publisher node -> subscriber node')
+    print('pub_node\\sub_node;' + ';'.join(_sub_nodes))
+    for _pub_node in _pub_nodes:
+        _cells = []
+        for _sub_node in _sub_nodes:
+            _histogram = matrix.get((_pub_node, _sub_node))
+            _cells.append(f'{_histogram.percentile(50) / 1e6:.3f}/{_histogram.percentile(99) / 1e6:.3f}'
+                          if _histogram is not None and _histogram.count else '')
+        print(f'{_pub_node};' + ';'.join(_cells))
+    for (_pub_node, _sub_node), _histogram in sorted(matrix.items()):
+        print(format_summary(f'{_pub_node} -> {_sub_node}', _histogram))
+
+
+def merge_node_files(paths: list) -> dict:
+    """Merges the node matrices of the JSON files written next to the logs of the subscriber containers"""
+    _entries = []
+    for path in paths:
+        with open(path, 'r') as f:
+            for _entry in json.load(f)['matrix']:
+                _entries.append((_entry['pub_node'], _entry['sub_node'],
+                                 LatencyHistogram.from_dict(_entry['histogram'])))
+    return node_matrix(_entries)
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(description='Placement of the clients on the nodes of a broker cluster')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    _plan = subparsers.add_parser('plan', help='Print the node of every client')
+    _plan.add_argument('--nodes', required=True, help='The broker nodes, comma separated')
+    _plan.add_argument('--strategy', default=Placement.ROUND_ROBIN, choices=Placement.ALL)
+    _plan.add_argument('--weights', default=None, help='The capacity of each node, comma separated')
+    _plan.add_argument('--pub-nodes', dest='pub_nodes', default=None, help='The nodes of the publishers (split)')
+    _plan.add_argument('--sub-nodes', dest='sub_nodes', default=None, help='The nodes of the subscribers (split)')
+    _plan.add_argument('--containers', type=int, default=1)
+    _plan.add_argument('--pub-clients', type=int, dest='pub_clients', default=1)
+    _plan.add_argument('--sub-clients', type=int, dest='sub_clients', default=1)
+    _matrix = subparsers.add_parser('matrix', help='Merge the cross-node e2e delays of the containers')
+    _matrix.add_argument('files', nargs='+', help='The _nodes.json files of the subscriber containers')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # python placement.py plan --nodes 10.0.0.2,10.0.0.3 --strategy hash --containers 4 ... -> the plan as JSON
+    # python placement.py matrix logs/*_nodes.json -> e2e delays between the nodes of the whole run
+    _args = arg_parse()
+    if _args.command == 'plan':
+        _plan = PlacementPlan(parse_nodes(_args.nodes), _args.strategy, weights=parse_weights(_args.weights),
+                              pub_nodes=parse_nodes(_args.pub_nodes), sub_nodes=parse_nodes(_args.sub_nodes))
+        _placement = _plan.plan(_args.containers, _args.pub_clients, _args.sub_clients)
+        _placement['loads'] = node_loads(_placement)
+        print(json.dumps(_placement, indent=2))
+    else:
+        print_node_matrix(merge_node_files(_args.files))
@@ -0,0 +1,146 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import time
+import traceback
+
+# Unix socket the agent of a pool container listens on for the runs
+POOL_SOCKET = '/tmp/pool_agent.sock'
+# The results of the previous run are removed before each run, they are collected in between
+LOGS_DIRECTORY = '/home/logs'
+# Seconds a dispatch waits for an agent which is still importing the client script
+CONNECT_TIMEOUT = 60
+# Seconds given to each leftover client process of a run to exit once killed
+KILL_TIMEOUT = 5
+
+
+def finished_marker(run_id: str) -> str:
+    """Printed by the agent once a run is over and its results written"""
+    return f'finished run {run_id}'
+
+
+def failed_marker(run_id: str) -> str:
+    """Printed by the agent when a run ended with an error"""
+    return f'failed run {run_id}'
+
+
+def _load_script():
+    try:
+        # The client script is mounted as script.py in the containers
+        import script as client_script
+    except ImportError:
+        import container_python as client_script
+    return client_script
+
+
+def _clear_logs(directory: str):
+    if not os.path.isdir(directory):
+        return
+    for _name in os.listdir(directory):
+        _path = os.path.join(directory, _name)
+        if os.path.isfile(_path):
+            os.remove(_path)
+
+
+def _kill_clients(timeout: float = KILL_TIMEOUT):
+    """Kills the client processes a run leaves behind, e.g. after a timed-out join, so that they neither
+    publish during the next runs nor write their results into them"""
+    for process in multiprocessing.active_children():
+        process.kill()
+        process.join(timeout)
+
+
+def _exit_code(status: int) -> int:
+    if os.WIFEXITED(status):
+        return os.WEXITSTATUS(status)
+    return -os.WTERMSIG(status)
+
+
+def run(client_script, server: socket.socket, request: dict, logs: str = LOGS_DIRECTORY) -> int:
+    """Runs the client script in a fork of the agent: the run starts with the modules already imported and
+    with none of the state of the previous runs, the script creates its result queues in each run and the
+    client processes left by the run are killed with it
+    :param request: The run id and the environment of the run, as passed to a new container
+    :return: The exit code of the run
+    """
+    _clear_logs(logs)
+    _pid = os.fork()
+    if _pid == 0:
+        _status = 1
+        try:
+            server.close()
+            os.environ.update(request['environment'])
+            sys.argv = ['script.py']
+            client_script.main(linger=False)
+            _status = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            _kill_clients()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(_status)
+    _, _status = os.waitpid(_pid, 0)
+    return _exit_code(_status)
+
+
+def serve(path: str = POOL_SOCKET, logs: str = LOGS_DIRECTORY):
+    """Imports the client script once, then runs the dispatched runs one after the other"""
+    client_script = _load_script()
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    print(f'Pool agent of {os.getenv("HOSTNAME")} ready', flush=True)
+    while True:
+        connection, _ = server.accept()
+        with connection:
+            request = json.loads(connection.makefile('r').readline())
+            connection.sendall(b'ok\n')
+        print(f'Starting run {request["run_id"]}', flush=True)
+        _code = run(client_script, server, request, logs)
+        _marker = finished_marker(request['run_id']) if _code == 0 else failed_marker(request['run_id'])
+        print(f'{os.getenv("HOSTNAME")} {_marker} with status {_code}', flush=True)
+
+
+def dispatch(run_id: str, environment: dict, path: str = POOL_SOCKET, timeout: float = CONNECT_TIMEOUT):
+    """Hands a run to the agent of the container, waiting for the end of the previous run"""
+    _deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.connect(path)
+                client.sendall(json.dumps({'run_id': run_id, 'environment': environment}).encode('utf-8') + b'\n')
+                if client.makefile('r').readline().strip() != 'ok':
+                    raise ConnectionError(f'The pool agent refused the run {run_id}')
+                return
+        except (FileNotFoundError, ConnectionRefusedError):
+            if time.monotonic() > _deadline:
+                raise
+            time.sleep(0.2)
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(description='Agent keeping the client script loaded in a pool container')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    _serve = subparsers.add_parser('serve', help='Run the dispatched runs, the entrypoint of the pool containers')
+    _serve.add_argument('--socket', default=POOL_SOCKET)
+    _dispatch = subparsers.add_parser('dispatch', help='Start a run with the given environment')
+    _dispatch.add_argument('--socket', default=POOL_SOCKET)
+    _dispatch.add_argument('--run-id', dest='run_id', required=True)
+    _dispatch.add_argument('environment', help='The environment variables of the run, as a JSON object')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # python3 pool_agent.py serve -> entrypoint of a pool container
+    # python3 pool_agent.py dispatch --run-id 3f2a '{"CLIENT_SUB_CLIENTS": "10", ...}' -> through exec_run
+    _args = arg_parse()
+    if _args.command == 'serve':
+        serve(_args.socket)
+    else:
+        dispatch(_args.run_id, json.loads(_args.environment), _args.socket)
@@ -0,0 +1,80 @@
+import mmap
+
+import numpy
+
+# Default number of records of a ring
+RING_SIZE = 16384
+
+# Header slots, the indexes written by the producer and by the consumer sit on different cache lines
+_HEAD = 0
+_DROPPED = 1
+_TAIL = 8
+_HEADER_SLOTS = 16
+_HEADER_DTYPE = numpy.dtype('<i8')
+_HEADER_SIZE = _HEADER_SLOTS * _HEADER_DTYPE.itemsize
+
+
+class RingBuffer:
+    """Single-producer single-consumer ring of fixed-size records in anonymous shared memory.
+
+    The ring must be created before the producer process is forked, which inherits the mapping. The
+    producer only moves the head and the consumer only moves the tail, so no lock is needed: a record
+    is written before the head is moved past it and read before the tail is. When the ring is full
+    the record is dropped and counted, the producer never waits for the consumer.
+    """
+
+    def __init__(self, dtype: numpy.dtype, capacity: int = RING_SIZE):
+        if capacity < 1:
+            raise ValueError('The capacity of the ring must be positive')
+        self.__dtype = numpy.dtype(dtype)
+        self.__capacity = capacity
+        self.__memory = mmap.mmap(-1, _HEADER_SIZE + capacity * self.__dtype.itemsize)
+        self.__header = numpy.frombuffer(self.__memory, dtype=_HEADER_DTYPE, count=_HEADER_SLOTS)
+        self.__records = numpy.frombuffer(self.__memory, dtype=self.__dtype, count=capacity, offset=_HEADER_SIZE)
+
+    @property
+    def capacity(self):
+        return self.__capacity
+
+    @property
+    def dtype(self):
+        return self.__dtype
+
+    @property
+    def dropped(self):
+        """The number of records lost because the ring was full"""
+        return int(self.__header[_DROPPED])
+
+    @property
+    def pending(self):
+        """The number of records written and not yet read"""
+        return int(self.__header[_HEAD] - self.__header[_TAIL])
+
+    def put(self, record: tuple) -> bool:
+        """Writes a record, from the producer process only
+        :return: False if the ring was full and the record has been dropped
+        """
+        _head = int(self.__header[_HEAD])
+        if _head - int(self.__header[_TAIL]) >= self.__capacity:
+            self.__header[_DROPPED] += 1
+            return False
+        self.__records[_head % self.__capacity] = record
+        self.__header[_HEAD] = _head + 1
+        return True
+
+    def read(self, max_records: int = None) -> numpy.ndarray:
+        """Copies out the records written so far, from the consumer process only"""
+        _tail = int(self.__header[_TAIL])
+        _count = int(self.__header[_HEAD]) - _tail
+        if max_records is not None:
+            _count = min(_count, max_records)
+        if _count <= 0:
+            return self.__records[:0].copy()
+        _start = _tail % self.__capacity
+        _stop = _start + _count
+        if _stop <= self.__capacity:
+            _records = self.__records[_start:_stop].copy()
+        else:
+            _records = numpy.concatenate((self.__records[_start:], self.__records[:_stop - self.__capacity]))
+        self.__header[_TAIL] = _tail + _count
+        return _records
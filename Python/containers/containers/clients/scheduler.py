@@ -0,0 +1,173 @@
+import math
+import random
+import time
+
+
+class ArrivalProcess:
+    CONSTANT = 'constant'
+    POISSON = 'poisson'
+    ON_OFF = 'on_off'
+    ALL = (CONSTANT, POISSON, ON_OFF)
+
+
+class RateScheduler:
+    """Open-loop schedule of the publish instants of a single client.
+
+    Every send time is computed from the start of the schedule and the sum of the inter-arrival
+    times, never from the time the previous message actually left, so a late publish does not shift
+    the following ones (no drift) and the offered load stays the requested one. The arrivals are
+    generated in 'active' time: with the on/off model the active time only flows during the on
+    periods, and the rate inside a burst is raised so that the average over a whole on/off cycle is
+    the requested one.
+    """
+
+    def __init__(self, rate: float, arrival: str = ArrivalProcess.CONSTANT, burst_on: float = 1.0,
+                 burst_off: float = 0.0, seed: int = None):
+        if rate <= 0:
+            raise ValueError('The publish rate must be positive')
+        if arrival not in ArrivalProcess.ALL:
+            raise ValueError(f'The arrival process must be one of {ArrivalProcess.ALL}')
+        if arrival == ArrivalProcess.ON_OFF and (burst_on <= 0 or burst_off < 0):
+            raise ValueError('The on period of the bursts must be positive and the off period not negative')
+        self.__rate = rate
+        self.__arrival = arrival
+        self.__burst_on = burst_on
+        self.__burst_off = burst_off if arrival == ArrivalProcess.ON_OFF else 0.0
+        # Rate while the source is active
+        self.__peak_rate = rate * (self.__burst_on + self.__burst_off) / self.__burst_on \
+            if arrival == ArrivalProcess.ON_OFF else rate
+        self.__random = random.Random(seed)
+        self.__active_time = 0.0
+        self.__start = None
+        self.__first_send = None
+        self.__last_send = None
+        self.__sent = 0
+        self.__max_lag = 0.0
+
+    @property
+    def rate(self):
+        return self.__rate
+
+    @property
+    def arrival(self):
+        return self.__arrival
+
+    @property
+    def sent(self):
+        return self.__sent
+
+    @property
+    def max_lag(self):
+        """The largest delay, in seconds, of a publish with respect to its scheduled instant"""
+        return self.__max_lag
+
+    def start(self, now: float = None):
+        """Anchors the schedule, the first message is due immediately"""
+        self.__start = time.monotonic() if now is None else now
+        self.__active_time = 0.0
+
+    def _wall_offset(self, active_time: float) -> float:
+        """Maps the active time to the time elapsed since the start, skipping the off periods"""
+        if not self.__burst_off:
+            return active_time
+        _periods = math.floor(active_time / self.__burst_on)
+        return _periods * (self.__burst_on + self.__burst_off) + active_time - _periods * self.__burst_on
+
+    def next_send_time(self) -> float:
+        """The monotonic instant at which the next message is due"""
+        if self.__start is None:
+            self.start()
+        return self.__start + self._wall_offset(self.__active_time)
+
+    def delay(self, now: float = None) -> float:
+        """Seconds to wait before the next message is due, 0 if it is already late"""
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.next_send_time() - now)
+
+    def wait(self):
+        """Sleeps until the next message is due"""
+        _delay = self.delay()
+        if _delay > 0:
+            time.sleep(_delay)
+
+    def mark_sent(self, now: float = None):
+        """Records a publish and moves the schedule to the next arrival"""
+        now = time.monotonic() if now is None else now
+        self.__max_lag = max(self.__max_lag, now - self.next_send_time())
+        if self.__first_send is None:
+            self.__first_send = now
+        self.__last_send = now
+        self.__sent += 1
+        if self.__arrival == ArrivalProcess.POISSON:
+            self.__active_time += self.__random.expovariate(self.__peak_rate)
+        else:
+            # Computed from the count rather than summed, not to accumulate rounding errors
+            self.__active_time = self.__sent / self.__peak_rate
+
+    def achieved_rate(self) -> float:
+        """Messages per second actually published, measured between the first and the last publish"""
+        if self.__sent < 2 or self.__last_send <= self.__first_send:
+            return 0.0
+        return (self.__sent - 1) / (self.__last_send - self.__first_send)
+
+    def summary(self, client_id: str = None) -> dict:
+        return {
+            'client_id': client_id,
+            'arrival': self.__arrival,
+            'requested_rate': self.__rate,
+            'achieved_rate': self.achieved_rate(),
+            'sent': self.__sent,
+            'max_lag': self.__max_lag
+        }
+
+
+class RampProfile:
+    LINEAR = 'linear'
+    STEPPED = 'stepped'
+    ALL = (LINEAR, STEPPED)
+
+
+class ConnectRamp:
+    """Connection instants of the clients of a container, to avoid a connect storm at the broker.
+
+    With the linear profile one client connects every 1/rate seconds, with the stepped profile the
+    clients connect in groups of 'step' clients, a group every step/rate seconds, so that the average
+    is the requested rate in both cases. Like the RateScheduler, the instants are computed from the
+    start of the ramp and a late connection does not shift the following ones.
+    """
+
+    def __init__(self, rate: float, profile: str = RampProfile.LINEAR, step: int = 1):
+        if rate <= 0:
+            raise ValueError('The connection rate must be positive')
+        if profile not in RampProfile.ALL:
+            raise ValueError(f'The ramp profile must be one of {RampProfile.ALL}')
+        if step < 1:
+            raise ValueError('The ramp step must be at least 1 client')
+        self.__rate = rate
+        self.__profile = profile
+        self.__step = step if profile == RampProfile.STEPPED else 1
+
+    @property
+    def rate(self):
+        return self.__rate
+
+    @property
+    def profile(self):
+        return self.__profile
+
+    @property
+    def step(self):
+        return self.__step
+
+    def offset(self, index: int) -> float:
+        """Seconds from the start of the ramp at which the client at the given position connects"""
+        return (index // self.__step) * self.__step / self.__rate
+
+    def duration(self, clients: int) -> float:
+        """Seconds between the first and the last connection of the given number of clients"""
+        return self.offset(clients - 1) if clients > 0 else 0.0
+
+    def connect_times(self, clients: int, start: float = None) -> list:
+        """The monotonic instant of the connection of each client"""
+        start = time.monotonic() if start is None else start
+        return [start + self.offset(_index) for _index in range(clients)]
@@ -0,0 +1,180 @@
+import json
+import sys
+
+# Sequence numbers tracked behind the highest one received from each publisher
+SEQUENCE_WINDOW = 1 << 16
+
+
+class SequenceWindow:
+    """Sliding bitmap of the sequence numbers received from a single publisher.
+
+    The window starts at the first sequence number received, the messages published before the
+    subscription are not counted. A number is a duplicate when its bit is already set and out of
+    order when it arrives after a higher one. The numbers leaving the window without being received
+    are lost: a message reordered farther than the window is counted as lost and then as late, as it
+    can not be told apart from a duplicate anymore. Each message costs a few integer operations,
+    whatever the loss, and the memory is bounded by the window.
+    """
+
+    __slots__ = ('__window', '__bits', '__base', '__highest', '__received', '__lost', '__duplicates',
+                 '__reordered', '__late')
+
+    def __init__(self, window: int = SEQUENCE_WINDOW):
+        if window < 8 or window % 8:
+            raise ValueError('The sequence window must be a positive multiple of 8')
+        self.__window = window
+        self.__bits = bytearray(window // 8)
+        self.__base = None
+        self.__highest = None
+        self.__received = 0
+        self.__lost = 0
+        self.__duplicates = 0
+        self.__reordered = 0
+        self.__late = 0
+
+    @property
+    def received(self):
+        return self.__received
+
+    @property
+    def duplicates(self):
+        return self.__duplicates
+
+    @property
+    def reordered(self):
+        return self.__reordered
+
+    @property
+    def late(self):
+        return self.__late
+
+    @property
+    def highest(self):
+        return self.__highest
+
+    def record(self, seq: int):
+        if self.__base is None:
+            self.__base = self.__highest = seq
+        elif seq < self.__base:
+            self.__late += 1
+            return
+        elif seq >= self.__base + self.__window:
+            self._slide(seq - self.__window + 1)
+        _slot = seq % self.__window
+        _mask = 1 << (_slot & 7)
+        _byte = _slot >> 3
+        if self.__bits[_byte] & _mask:
+            self.__duplicates += 1
+            return
+        self.__bits[_byte] |= _mask
+        self.__received += 1
+        if seq < self.__highest:
+            self.__reordered += 1
+        else:
+            self.__highest = seq
+
+    def _slide(self, base: int):
+        """Moves the window start to the given number, counting the numbers left behind as lost"""
+        _end = min(base, self.__base + self.__window)
+        for _seq in range(self.__base, _end):
+            _slot = _seq % self.__window
+            _mask = 1 << (_slot & 7)
+            if self.__bits[_slot >> 3] & _mask:
+                self.__bits[_slot >> 3] &= ~_mask
+            else:
+                self.__lost += 1
+        # Numbers skipped beyond the whole window
+        self.__lost += base - _end
+        self.__base = base
+
+    def lost(self) -> int:
+        """Numbers below the highest received one that never arrived"""
+        if self.__base is None:
+            return 0
+        _missing = 0
+        for _seq in range(self.__base, self.__highest + 1):
+            _slot = _seq % self.__window
+            if not self.__bits[_slot >> 3] & (1 << (_slot & 7)):
+                _missing += 1
+        return self.__lost + _missing
+
+    def summary(self) -> dict:
+        return {
+            'received': self.__received,
+            'lost': self.lost(),
+            'duplicates': self.__duplicates,
+            'reordered': self.__reordered,
+            'late': self.__late,
+            'highest': self.__highest
+        }
+
+
+class SequenceTracker:
+    """The sequence windows of all the publishers heard by a subscriber, by (publisher container,
+    publisher host, publisher id, topic). A publisher numbers the messages of each of its topics on their
+    own, a subscriber of only some of them sees every number of those topics"""
+
+    def __init__(self, window: int = SEQUENCE_WINDOW):
+        self.__window = window
+        self.__publishers = {}
+
+    def record(self, pub_container: int, pub_host: int, pub_id: int, topic: str, seq: int):
+        _key = (pub_container, pub_host, pub_id, topic)
+        _sequence = self.__publishers.get(_key)
+        if _sequence is None:
+            _sequence = self.__publishers[_key] = SequenceWindow(self.__window)
+        _sequence.record(seq)
+
+    def to_list(self) -> list:
+        """The counts of each publisher, in a form which can be queued between processes and dumped to JSON"""
+        _publishers = []
+        for (_pub_container, _pub_host, _pub_id, _topic), _sequence in self.__publishers.items():
+            _summary = _sequence.summary()
+            _summary.update(pub_container=_pub_container, pub_host=_pub_host, pub_id=_pub_id, topic=_topic)
+            _publishers.append(_summary)
+        return _publishers
+
+
+SEQUENCE_COUNTS = ('received', 'lost', 'duplicates', 'reordered', 'late')
+
+
+def pair_counts(subscribers: list) -> dict:
+    """Sums the counts of the publishers by (publisher host, subscriber host) pair
+    :param subscribers: (subscriber host, publisher counts from SequenceTracker.to_list) of each subscriber
+    """
+    _pairs = {}
+    for _sub_host, _publishers in subscribers:
+        for _publisher in _publishers:
+            _pair = _pairs.setdefault((_publisher['pub_host'], _sub_host), dict.fromkeys(SEQUENCE_COUNTS, 0))
+            for _count in SEQUENCE_COUNTS:
+                _pair[_count] += _publisher[_count]
+    return _pairs
+
+
+def loss_ratio(counts: dict) -> float:
+    _expected = counts['received'] + counts['lost']
+    return counts['lost'] / _expected if _expected else 0.0
+
+
+def merge_sequence_files(paths: list) -> dict:
+    """Sums the pair counts of the JSON files written next to the logs of the containers"""
+    _pairs = {}
+    for path in paths:
+        with open(path, 'r') as f:
+            for _entry in json.load(f)['pairs']:
+                _pair = _pairs.setdefault((_entry['pub_host'], _entry['sub_host']),
+                                          dict.fromkeys(SEQUENCE_COUNTS, 0))
+                for _count in SEQUENCE_COUNTS:
+                    _pair[_count] += _entry[_count]
+    return _pairs
+
+
+if __name__ == '__main__':
+    # python sequence.py logs/*_sequence.json -> losses, duplicates and reordering of the whole run
+    if len(sys.argv) < 2:
+        print(f'Usage: {sys.argv[0]} <sequence json files>')
+        exit(1)
+    print('pub_host;sub_host;' + ';'.join(SEQUENCE_COUNTS) + ';loss_ratio')
+    for (_pub_host, _sub_host), _counts in sorted(merge_sequence_files(sys.argv[1:]).items()):
+        print(f'{_pub_host};{_sub_host};' + ';'.join(str(_counts[_count]) for _count in SEQUENCE_COUNTS) +
+              f';{loss_ratio(_counts):.6f}')
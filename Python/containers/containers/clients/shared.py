@@ -0,0 +1,152 @@
+import json
+import multiprocessing
+import sys
+import time
+
+from histogram import LatencyHistogram, format_summary
+from payload import host_name
+
+# Seconds without messages after which the members of a group stop waiting for the rest of the messages
+SHARE_IDLE = 5.0
+
+
+class ShareFormat:
+    # MQTT 5 syntax, also accepted for MQTT 3.1.1 clients by EMQX, HiveMQ 4, VerneMQ and Mosquitto 2
+    STANDARD = 'standard'
+    # EMQX queue subscription, a single anonymous group per topic
+    QUEUE = 'queue'
+    # HiveMQ 3 syntax
+    HIVEMQ_LEGACY = 'hivemq_legacy'
+    ALL = (STANDARD, QUEUE, HIVEMQ_LEGACY)
+
+
+def shared_filter(topic: str, group: str, share_format: str = ShareFormat.STANDARD) -> str:
+    """The subscription filter making the subscriber a member of the shared group of the topic"""
+    if share_format == ShareFormat.QUEUE:
+        return f'$queue/{topic}'
+    if share_format == ShareFormat.HIVEMQ_LEGACY:
+        return f'$share:{group}:{topic}'
+    return f'$share/{group}/{topic}'
+
+
+class ShareGroup:
+    """The members of a shared subscription group running in the container.
+
+    The broker hands each message to a single member, so no member knows how many messages it will
+    get: the members count the messages of the whole group in shared memory, and all stop once the
+    group has received the expected messages, or has not received anything for 'idle' seconds (the
+    rest of the messages going to the members in other containers). Created before the clients are
+    forked, like the log rings.
+    """
+
+    def __init__(self, name: str, expected: int, share_format: str = ShareFormat.STANDARD, idle: float = SHARE_IDLE):
+        self.__name = name
+        self.__expected = expected
+        self.__share_format = share_format
+        self.__idle = idle
+        self.__received = multiprocessing.Value('q', 0)
+        # Monotonic instant of the last message of the group, 0 before the first one
+        self.__last = multiprocessing.Value('d', 0.0, lock=False)
+
+    @property
+    def name(self):
+        return self.__name
+
+    @property
+    def received(self):
+        return self.__received.value
+
+    def filter(self, topics):
+        """The shared subscription filters of a topic or of a list of topics"""
+        if isinstance(topics, str):
+            return shared_filter(topics, self.__name, self.__share_format)
+        return [shared_filter(_topic, self.__name, self.__share_format) for _topic in topics]
+
+    def record(self):
+        with self.__received.get_lock():
+            self.__received.value += 1
+        self.__last.value = time.monotonic()
+
+    def done(self, now: float = None) -> bool:
+        if self.__expected and self.__received.value >= self.__expected:
+            return True
+        now = time.monotonic() if now is None else now
+        return self.__last.value > 0 and now - self.__last.value > self.__idle
+
+
+def fairness(counts: list) -> float:
+    """The ratio between the messages of the busiest and of the idlest member, None if a member got none"""
+    if not counts or min(counts) == 0:
+        return None
+    return max(counts) / min(counts)
+
+
+def group_report(members: list) -> dict:
+    """Distribution and latency of the members of each group
+    :param members: member dicts with group, client_id, host (broker of the member), received and the
+    e2e histogram of the member
+    :return: By group, the member counts, their fairness and the e2e delay histogram of each broker node
+    """
+    _groups = {}
+    for _member in members:
+        _group = _groups.setdefault(_member['group'], {'members': {}, 'nodes': {}})
+        _group['members'][_member['client_id']] = _member['received']
+        _histogram = _member['histogram']
+        if _histogram is not None and _histogram.count:
+            _group['nodes'].setdefault(_member['host'], LatencyHistogram(_histogram.significant_figures)) \
+                .merge(_histogram)
+    _summarize(_groups)
+    return _groups
+
+
+def _summarize(groups: dict):
+    for _group in groups.values():
+        _group['received'] = sum(_group['members'].values())
+        _group['fairness'] = fairness(list(_group['members'].values()))
+
+
+def groups_to_dict(groups: dict) -> dict:
+    """JSON-compatible form of the group report"""
+    return {_name: {'received': _group['received'],
+                    'fairness': _group['fairness'],
+                    'members': _group['members'],
+                    'nodes': {host_name(_host): _histogram.to_dict() for _host, _histogram in _group['nodes'].items()}}
+            for _name, _group in groups.items()}
+
+
+def print_groups(groups: dict, host_names: bool = True):
+    for _name, _group in sorted(groups.items()):
+        _fairness = 'n/a' if _group['fairness'] is None else f'{_group["fairness"]:.3f}'
+        print(f'Shared group {_name}: {_group["received"]} messages, {len(_group["members"])} members, '
+              f'fairness (max/min) {_fairness}')
+        for _client_id, _received in sorted(_group['members'].items()):
+            _share = _received / _group['received'] if _group['received'] else 0.0
+            print(f'  {_client_id}: {_received} ({_share:.2%})')
+        for _host, _histogram in sorted(_group['nodes'].items()):
+            print('  ' + format_summary(f'node {host_name(_host) if host_names else _host}', _histogram))
+
+
+def merge_share_files(paths: list) -> dict:
+    """Merges the groups of the JSON files written next to the logs of the containers, the members are
+    prefixed by the file they come from as the client ids repeat in every container"""
+    _groups = {}
+    for path in paths:
+        with open(path, 'r') as f:
+            _file_groups = json.load(f)['groups']
+        for _name, _file_group in _file_groups.items():
+            _group = _groups.setdefault(_name, {'members': {}, 'nodes': {}})
+            for _client_id, _received in _file_group['members'].items():
+                _group['members'][f'{path}:{_client_id}'] = _received
+            for _host, _data in _file_group['nodes'].items():
+                _histogram = LatencyHistogram.from_dict(_data)
+                _group['nodes'].setdefault(_host, LatencyHistogram(_histogram.significant_figures)).merge(_histogram)
+    _summarize(_groups)
+    return _groups
+
+
+if __name__ == '__main__':
+    # python shared.py logs/*_share.json -> distribution of the groups spread over several containers
+    if len(sys.argv) < 2:
+        print(f'Usage: {sys.argv[0]} <shared group json files>')
+        exit(1)
+    print_groups(merge_share_files(sys.argv[1:]), host_names=False)
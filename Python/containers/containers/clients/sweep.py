@@ -0,0 +1,148 @@
+import bisect
+import json
+import sys
+
+from histogram import LatencyHistogram, DEFAULT_SIGNIFICANT_FIGURES
+
+# Columns of the table of the sweep
+SWEEP_COLUMNS = ('size', 'messages', 'duration_s', 'msg_per_s', 'mb_per_s', 'p50_ms', 'p99_ms')
+
+
+def parse_sizes(spec: str) -> list:
+    """The payload sizes of a sweep, in publishing order
+    :param spec: A list such as '64,256,1024' or a geometric range 'start:stop:factor' such as
+    '64:65536:4', the stop size included when the range reaches it
+    """
+    if ':' in spec:
+        try:
+            _start, _stop, _factor = (float(_value) for _value in spec.split(':'))
+        except ValueError:
+            raise ValueError(f'The size range {spec} must be start:stop:factor')
+        if _start < 1 or _stop < _start or _factor <= 1:
+            raise ValueError(f'The size range {spec} needs 1 <= start <= stop and a factor above 1')
+        _sizes = []
+        _size = _start
+        while _size <= _stop:
+            if not _sizes or int(_size) != _sizes[-1]:
+                _sizes.append(int(_size))
+            _size *= _factor
+        return _sizes
+    try:
+        _sizes = [int(_value) for _value in spec.split(',') if _value.strip()]
+    except ValueError:
+        raise ValueError(f'The sizes {spec} must be a comma separated list of integers')
+    if not _sizes or min(_sizes) < 0:
+        raise ValueError(f'The sizes {spec} must be a non-empty list of positive sizes')
+    return _sizes
+
+
+def size_class(length: int, sizes: list) -> int:
+    """The size of the sweep a payload belongs to: the smallest one holding it, the largest otherwise
+    (a text header longer than the size is sent whole)
+    :param sizes: The sizes of the sweep, sorted
+    """
+    _ind = bisect.bisect_left(sizes, length)
+    return sizes[_ind] if _ind < len(sizes) else sizes[-1]
+
+
+def _empty_class(significant_figures: int) -> dict:
+    return {'messages': 0, 'bytes': 0, 'first_ns': None, 'last_ns': None,
+            'histogram': LatencyHistogram(significant_figures)}
+
+
+class SizeStats:
+    """The messages received by a subscriber in each size class of the sweep: count, bytes, first and
+    last arrival and e2e delay histogram. The throughput of a class is measured between its first and
+    last messages, the classes of consecutive phases may overlap in time."""
+
+    def __init__(self, sizes: list, significant_figures: int = DEFAULT_SIGNIFICANT_FIGURES):
+        self.__sizes = sorted(set(sizes))
+        self.__classes = {_size: _empty_class(significant_figures) for _size in self.__sizes}
+
+    @property
+    def classes(self):
+        return self.__classes
+
+    def record(self, length: int, arrival_ns: int, e2e_ns: int):
+        _class = self.__classes[size_class(length, self.__sizes)]
+        _class['messages'] += 1
+        _class['bytes'] += length
+        if _class['first_ns'] is None:
+            _class['first_ns'] = arrival_ns
+        _class['last_ns'] = arrival_ns
+        _class['histogram'].record(e2e_ns)
+
+    def merge(self, other: 'SizeStats') -> 'SizeStats':
+        for _size, _other in other.classes.items():
+            _class = self.__classes.get(_size)
+            if _class is None:
+                self.__sizes = sorted(self.__sizes + [_size])
+                _class = self.__classes[_size] = _empty_class(_other['histogram'].significant_figures)
+            _class['messages'] += _other['messages']
+            _class['bytes'] += _other['bytes']
+            if _other['first_ns'] is not None:
+                _class['first_ns'] = _other['first_ns'] if _class['first_ns'] is None \
+                    else min(_class['first_ns'], _other['first_ns'])
+                _class['last_ns'] = _other['last_ns'] if _class['last_ns'] is None \
+                    else max(_class['last_ns'], _other['last_ns'])
+            _class['histogram'].merge(_other['histogram'])
+        return self
+
+    def to_dict(self) -> dict:
+        """JSON-compatible form, the sizes as strings"""
+        return {str(_size): dict(_class, histogram=_class['histogram'].to_dict())
+                for _size, _class in self.__classes.items()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SizeStats':
+        _classes = {int(_size): dict(_class, histogram=LatencyHistogram.from_dict(_class['histogram']))
+                    for _size, _class in data.items()}
+        _significant_figures = next(iter(_classes.values()))['histogram'].significant_figures if _classes \
+            else DEFAULT_SIGNIFICANT_FIGURES
+        _stats = cls(list(_classes), _significant_figures)
+        _stats.classes.update(_classes)
+        return _stats
+
+    def table(self) -> list:
+        """A row of SWEEP_COLUMNS per size, the rates None when a class has less than two messages"""
+        _rows = []
+        for _size in self.__sizes:
+            _class = self.__classes[_size]
+            _duration = (_class['last_ns'] - _class['first_ns']) / 1e9 if _class['messages'] > 1 else 0
+            _histogram = _class['histogram']
+            _rows.append({
+                'size': _size,
+                'messages': _class['messages'],
+                'duration_s': _duration,
+                'msg_per_s': _class['messages'] / _duration if _duration else None,
+                'mb_per_s': _class['bytes'] / _duration / 1e6 if _duration else None,
+                'p50_ms': _histogram.percentile(50) / 1e6 if _histogram.count else None,
+                'p99_ms': _histogram.percentile(99) / 1e6 if _histogram.count else None
+            })
+        return _rows
+
+
+def print_size_table(rows: list):
+    print(';'.join(SWEEP_COLUMNS))
+    for _row in rows:
+        print(';'.join('' if _row[_column] is None else
+                       (f'{_row[_column]:.3f}' if isinstance(_row[_column], float) else str(_row[_column]))
+                       for _column in SWEEP_COLUMNS))
+
+
+def merge_size_files(paths: list) -> SizeStats:
+    """Merges the size classes of the JSON files written next to the logs of the subscriber containers"""
+    _stats = None
+    for path in paths:
+        with open(path, 'r') as f:
+            _file_stats = SizeStats.from_dict(json.load(f)['sizes'])
+        _stats = _file_stats if _stats is None else _stats.merge(_file_stats)
+    return _stats
+
+
+if __name__ == '__main__':
+    # python sweep.py logs/*_sizes.json -> throughput and e2e delay by payload size of the whole run
+    if len(sys.argv) < 2:
+        print(f'Usage: {sys.argv[0]} <size sweep json files>')
+        exit(1)
+    print_size_table(merge_size_files(sys.argv[1:]).table())
@@ -0,0 +1,35 @@
+import multiprocessing
+from threading import Thread
+
+from async_engine import shard_count, shard_of
+
+
+def _run_shard(clients: list):
+    """Runs each client of the shard in a thread of the worker process, with the same run loop, timeouts
+    and reports as a client started in its own process"""
+    threads = []
+    for client in clients:
+        thread = Thread(target=client.run, name=client.client_id, daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+
+def start_engine(clients: list, workers: int = 1) -> list:
+    """Splits the clients among the worker processes, each one hosting its clients as threads: the
+    clients keep their own paho network thread, but the container only runs as many processes as cores
+    :param clients: The Sub/Pub objects, created but not started
+    :param workers: The number of worker processes to use, usually one per core
+    :return: The started worker processes
+    """
+    workers = shard_count(len(clients), workers)
+    processes = []
+    for ind in range(workers):
+        _shard = [client for position, client in enumerate(clients) if shard_of(position, workers) == ind]
+        if not _shard:
+            continue
+        process = multiprocessing.Process(target=_run_shard, args=(_shard,), name=f'threads-{ind}')
+        process.start()
+        processes.append(process)
+    return processes
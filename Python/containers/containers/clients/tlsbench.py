@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import socket
+import ssl
+import subprocess
+import tempfile
+import time
+from threading import Thread
+
+from histogram import LatencyHistogram, format_summary
+
+# Connections of each mode of a TLS measurement
+TLS_CONNECTIONS = 20
+# Seconds to wait for the TCP connection, the handshake and the CONNACK of each connection
+TLS_TIMEOUT = 5.0
+# Minimal MQTT 3.1.1 packets, the measurement only needs the CONNACK of the broker
+CONNACK_SIZE = 4
+DISCONNECT = b'\xe0\x00'
+CONNACK = b'\x20\x02\x00\x00'
+# Phases of each connection: TCP connect, TLS handshake, CONNECT to CONNACK, and the CPU time of the
+# client thread for the whole connection
+TLS_PHASES = ('tcp', 'handshake', 'connack', 'cpu')
+
+
+class TLSMode:
+    # New session, with the certificate verification and the key exchange
+    FULL = 'full'
+    # Abbreviated handshake with the session ticket of the previous connection
+    RESUMED = 'resumed'
+    ALL = (FULL, RESUMED)
+
+
+def _remaining_length(length: int) -> bytes:
+    _encoded = bytearray()
+    while True:
+        length, _digit = length // 128, length % 128
+        _encoded.append(_digit | 0x80 if length else _digit)
+        if not length:
+            return bytes(_encoded)
+
+
+def _string(value: str) -> bytes:
+    _value = value.encode('utf-8')
+    return len(_value).to_bytes(2, 'big') + _value
+
+
+def connect_packet(client_id: str, auth: dict = None, keepalive: int = 60) -> bytes:
+    """An MQTT 3.1.1 CONNECT with a clean session, and the credentials of the broker if any"""
+    _flags = 0x02
+    _payload = _string(client_id)
+    if auth and auth.get('username') is not None:
+        _flags |= 0x80
+        _payload += _string(auth['username'])
+        if auth.get('password') is not None:
+            _flags |= 0x40
+            _payload += _string(auth['password'])
+    _variable = _string('MQTT') + bytes((4, _flags)) + keepalive.to_bytes(2, 'big')
+    return b'\x10' + _remaining_length(len(_variable) + len(_payload)) + _variable + _payload
+
+
+def _recv_exactly(sock, size: int) -> bytes:
+    _data = b''
+    while len(_data) < size:
+        _chunk = sock.recv(size - len(_data))
+        if not _chunk:
+            raise ConnectionError('Connection closed by the broker')
+        _data += _chunk
+    return _data
+
+
+def probe(context: ssl.SSLContext, hostname: str, port: int, session: ssl.SSLSession = None,
+          client_id: str = 'tlsbench', auth: dict = None, timeout: float = TLS_TIMEOUT) -> tuple:
+    """Connects once to the broker over TLS, up to the CONNACK
+    :param session: The session to resume, None for a full handshake
+    :return: (the durations of the phases in ns with whether the session was resumed, the TLS version
+    and the CONNACK return code; the session to resume the next connection with)
+    """
+    _cpu_start = time.thread_time_ns()
+    _start = time.perf_counter_ns()
+    _sock = socket.create_connection((hostname, port), timeout=timeout)
+    try:
+        _tcp = time.perf_counter_ns()
+        # Like the MQTT clients, otherwise the CONNECT waits behind the delayed ACK of the handshake
+        _sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        _tls = context.wrap_socket(_sock, server_hostname=hostname, session=session, do_handshake_on_connect=False)
+        _tls.do_handshake()
+        _handshake = time.perf_counter_ns()
+        _tls.sendall(connect_packet(client_id, auth))
+        _connack = _recv_exactly(_tls, CONNACK_SIZE)
+        _end = time.perf_counter_ns()
+        _cpu = time.thread_time_ns() - _cpu_start
+        _result = {'tcp': _tcp - _start, 'handshake': _handshake - _tcp, 'connack': _end - _handshake, 'cpu': _cpu,
+                   'reused': _tls.session_reused, 'version': _tls.version(), 'return_code': _connack[3]}
+        # Read after the CONNACK, as TLS 1.3 sends the session tickets after the handshake
+        _session = _tls.session
+        _tls.sendall(DISCONNECT)
+        _tls.close()
+        return _result, _session
+    finally:
+        _sock.close()
+
+
+def measure_tls(hostname: str, port: int, cafile: str, connections: int = TLS_CONNECTIONS, auth: dict = None,
+                timeout: float = TLS_TIMEOUT, client_id: str = 'tlsbench') -> dict:
+    """Full handshakes, then handshakes resuming the session of the previous connection
+    :return: The results of the connections of each mode
+    """
+    _context = ssl.create_default_context(cafile=cafile)
+    _results = {_mode: [] for _mode in TLSMode.ALL}
+    _session = None
+    for _mode in TLSMode.ALL:
+        for _ind in range(connections):
+            try:
+                _result, _new_session = probe(_context, hostname, port,
+                                              session=_session if _mode == TLSMode.RESUMED else None,
+                                              client_id=f'{client_id}-{_mode}-{_ind}', auth=auth, timeout=timeout)
+            except (OSError, ssl.SSLError) as err:
+                print(f'TLS connection to {hostname}:{port} failed: {err}')
+                _results[_mode].append(None)
+                continue
+            _results[_mode].append(_result)
+            # The last ticket is the freshest, TLS 1.3 tickets may be single use
+            _session = _new_session or _session
+    return _results
+
+
+def tls_summary(results: dict, significant_figures: int = 3) -> dict:
+    """The histogram of each phase by mode, with the failed and the actually resumed connections"""
+    _summary = {}
+    for _mode, _connections in results.items():
+        _succeeded = [_result for _result in _connections if _result is not None]
+        _histograms = {_phase: LatencyHistogram(significant_figures) for _phase in TLS_PHASES}
+        for _result in _succeeded:
+            for _phase in TLS_PHASES:
+                _histograms[_phase].record(_result[_phase])
+        _summary[_mode] = {
+            'connections': len(_connections),
+            'failed': len(_connections) - len(_succeeded),
+            'resumed': sum(1 for _result in _succeeded if _result['reused']),
+            'refused': sum(1 for _result in _succeeded if _result['return_code'] != 0),
+            'versions': sorted(set(_result['version'] for _result in _succeeded)),
+            'histograms': _histograms
+        }
+    return _summary
+
+
+def summary_to_dict(summary: dict) -> dict:
+    """JSON-compatible form of the summary"""
+    return {_mode: dict(_entry, histograms={_phase: _histogram.to_dict()
+                                            for _phase, _histogram in _entry['histograms'].items()})
+            for _mode, _entry in summary.items()}
+
+
+def print_tls_report(summary: dict):
+    for _mode, _entry in summary.items():
+        print(f'TLS {_mode} handshakes: {_entry["connections"]} connections, {_entry["failed"]} failed, '
+              f'{_entry["resumed"]} resumed, {", ".join(_entry["versions"]) or "no TLS version"}')
+        for _phase in TLS_PHASES:
+            print('  ' + format_summary(_phase, _entry['histograms'][_phase]))
+    _full = summary.get(TLSMode.FULL, {}).get('histograms', {}).get('handshake')
+    _resumed = summary.get(TLSMode.RESUMED, {}).get('histograms', {}).get('handshake')
+    if _full is not None and _resumed is not None and _full.count and _resumed.count and _resumed.mean():
+        print(f'Resumed handshakes are {_full.mean() / _resumed.mean():.2f}x faster than full handshakes, '
+              f'{summary[TLSMode.FULL]["histograms"]["cpu"].mean() / 1e3:.0f} vs '
+              f'{summary[TLSMode.RESUMED]["histograms"]["cpu"].mean() / 1e3:.0f} us of CPU per connection')
+
+
+def generate_certificates(directory: str, hostname: str = 'localhost') -> dict:
+    """Self-signed CA and a server certificate it signs for the hostname, created with openssl
+    :return: The paths of the CA certificate and of the server certificate and key
+    """
+    _paths = {_name: os.path.join(directory, _file) for _name, _file in
+              (('cafile', 'ca.pem'), ('ca_key', 'ca.key'), ('certfile', 'server.pem'), ('keyfile', 'server.key'),
+               ('csr', 'server.csr'), ('extensions', 'server.ext'))}
+    try:
+        socket.inet_aton(hostname)
+        _san = f'IP:{hostname}'
+    except OSError:
+        _san = f'DNS:{hostname}'
+    with open(_paths['extensions'], 'w') as f:
+        f.write(f'subjectAltName={_san},DNS:localhost,IP:127.0.0.1\n')
+    for _command in (
+            ('req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=mqttbench-ca',
+             '-keyout', _paths['ca_key'], '-out', _paths['cafile']),
+            ('req', '-newkey', 'rsa:2048', '-nodes', '-subj', f'/CN={hostname}',
+             '-keyout', _paths['keyfile'], '-out', _paths['csr']),
+            ('x509', '-req', '-days', '1', '-in', _paths['csr'], '-CA', _paths['cafile'], '-CAkey', _paths['ca_key'],
+             '-CAcreateserial', '-extfile', _paths['extensions'], '-out', _paths['certfile'])):
+        subprocess.run(('openssl',) + _command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return {_name: _paths[_name] for _name in ('cafile', 'certfile', 'keyfile')}
+
+
+class TLSStandIn:
+    """Local broker stand-in for the TLS measurements: completes the handshakes, with session tickets,
+    and answers the MQTT CONNECT with a CONNACK"""
+
+    def __init__(self, certfile: str, keyfile: str, host: str = '127.0.0.1', port: int = 0):
+        self.__context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.__context.load_cert_chain(certfile, keyfile)
+        self.__server = socket.create_server((host, port))
+        self.__running = False
+
+    @property
+    def port(self):
+        return self.__server.getsockname()[1]
+
+    def start(self):
+        self.__running = True
+        Thread(target=self._accept, daemon=True).start()
+
+    def stop(self):
+        self.__running = False
+        self.__server.close()
+
+    def _accept(self):
+        while self.__running:
+            try:
+                _conn, _ = self.__server.accept()
+            except OSError:
+                break
+            Thread(target=self._serve, args=(_conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.__context.wrap_socket(conn, server_side=True) as _tls:
+                # Fixed header and remaining length of the CONNECT
+                _recv_exactly(_tls, 1)
+                _length, _shift = 0, 0
+                while True:
+                    _byte = _recv_exactly(_tls, 1)[0]
+                    _length += (_byte & 0x7F) << _shift
+                    _shift += 7
+                    if not _byte & 0x80:
+                        break
+                _recv_exactly(_tls, _length)
+                _tls.sendall(CONNACK)
+                # Until the DISCONNECT or the end of the connection
+                _tls.recv(2)
+        except (OSError, ssl.SSLError, ConnectionError):
+            pass
+        finally:
+            conn.close()
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(description='Cost of the TLS handshakes and of their resumption')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    _measure = subparsers.add_parser('measure', help='Measure the handshakes with a TLS broker')
+    _measure.add_argument('--hostname', required=True)
+    _measure.add_argument('--port', type=int, default=8883)
+    _measure.add_argument('--cacert', required=True, help='The CA certificate of the broker')
+    _local = subparsers.add_parser('local', help='Measure the handshakes with a local stand-in, with '
+                                                 'certificates generated for the run')
+    _standin = subparsers.add_parser('standin', help='Run the stand-in, with certificates generated in a directory')
+    _standin.add_argument('--port', type=int, default=8883)
+    _standin.add_argument('--cert-dir', dest='cert_dir', required=True,
+                          help='Where the certificates are written, the clients need its ca.pem')
+    _standin.add_argument('--hostname', default='localhost', help='The name of the certificate of the stand-in')
+    for _parser in (_measure, _local):
+        _parser.add_argument('--connections', type=int, default=TLS_CONNECTIONS,
+                             help='The connections of each mode')
+        _parser.add_argument('--json', type=str, default=None, help='Where the results are dumped')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # python tlsbench.py local -> full and resumed handshakes with a stand-in on localhost
+    # python tlsbench.py measure --hostname 10.0.0.2 --cacert ca.pem -> the same with a broker
+    # python tlsbench.py standin --cert-dir certs -> a stand-in for the containers
+    _args = arg_parse()
+    if _args.command == 'standin':
+        os.makedirs(_args.cert_dir, exist_ok=True)
+        _certificates = generate_certificates(_args.cert_dir, _args.hostname)
+        _standin = TLSStandIn(_certificates['certfile'], _certificates['keyfile'], host='0.0.0.0', port=_args.port)
+        _standin.start()
+        print(f'TLS stand-in listening on port {_standin.port}, CA certificate {_certificates["cafile"]}')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            _standin.stop()
+        exit(0)
+    if _args.command == 'local':
+        with tempfile.TemporaryDirectory() as _cert_dir:
+            _certificates = generate_certificates(_cert_dir)
+            _standin = TLSStandIn(_certificates['certfile'], _certificates['keyfile'])
+            _standin.start()
+            _results = measure_tls('localhost', _standin.port, _certificates['cafile'], _args.connections)
+            _standin.stop()
+    else:
+        _results = measure_tls(_args.hostname, _args.port, _args.cacert, _args.connections)
+    _summary = tls_summary(_results)
+    print_tls_report(_summary)
+    if _args.json:
+        with open(_args.json, 'w') as f:
+            json.dump({'results': _results, 'summary': summary_to_dict(_summary)}, f)
@@ -0,0 +1,122 @@
+import argparse
+import json
+import random
+
+SINGLE_LEVEL_WILDCARD = '+'
+MULTI_LEVEL_WILDCARD = '#'
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """Whether a topic name matches a subscription filter, following the MQTT wildcard rules"""
+    _filter_levels = topic_filter.split('/')
+    _topic_levels = topic.split('/')
+    for _ind, _level in enumerate(_filter_levels):
+        if _level == MULTI_LEVEL_WILDCARD:
+            # Also matches the parent level itself
+            return True
+        if _ind >= len(_topic_levels):
+            return False
+        if _level != SINGLE_LEVEL_WILDCARD and _level != _topic_levels[_ind]:
+            return False
+    return len(_filter_levels) == len(_topic_levels)
+
+
+class TopicTree:
+    """Topic hierarchy of the wildcard fan-out scenario.
+
+    The tree has 'branching' children per level and 'depth' levels below the root, the publishers
+    publish to its leaves and the subscribers subscribe to filters built from the published leaves: a
+    fraction of them with a '+' replacing one level, a fraction with a '#' cutting the path, the others
+    to a literal leaf. Every filter matches at least one publisher. The plan only depends on the
+    parameters and the seed, so the publisher and the subscriber containers of a run build the same
+    tree on their own. The publisher i of each container publishes to the leaf i (modulo the leaves),
+    so all the publisher containers contribute the same messages to each leaf.
+    """
+
+    def __init__(self, root: str, depth: int, branching: int, publishers: int, subscribers: int,
+                 single_level: float = 0.0, multi_level: float = 0.0, seed: int = None):
+        if depth < 1 or branching < 1:
+            raise ValueError('The topic tree needs at least one level and one branch per level')
+        if single_level < 0 or multi_level < 0 or single_level + multi_level > 1:
+            raise ValueError('The wildcard ratios must be fractions with a sum of at most 1')
+        self.__root = root.rstrip('/')
+        self.__depth = depth
+        self.__branching = branching
+        self.__random = random.Random(seed)
+        self.__leaves = branching ** depth
+        self.__publisher_topics = [self.leaf(_ind % self.__leaves) for _ind in range(publishers)]
+        _published = sorted(set(self.__publisher_topics))
+        self.__filters = []
+        for _ind in range(subscribers):
+            _levels = self.__random.choice(_published).split('/') if _published else [self.__root]
+            _draw = self.__random.random()
+            if _draw < single_level:
+                # Any level below the root
+                _levels[self.__random.randint(1, len(_levels) - 1)] = SINGLE_LEVEL_WILDCARD
+            elif _draw < single_level + multi_level:
+                _levels = _levels[:self.__random.randint(1, len(_levels) - 1)] + [MULTI_LEVEL_WILDCARD]
+            self.__filters.append('/'.join(_levels))
+
+    @property
+    def leaves(self):
+        return self.__leaves
+
+    @property
+    def publisher_topics(self):
+        """The leaf of each publisher of the container"""
+        return self.__publisher_topics
+
+    @property
+    def filters(self):
+        """The filter of each subscriber of the container"""
+        return self.__filters
+
+    def leaf(self, index: int) -> str:
+        """The topic of the leaf at the given position, e.g. root/l0_1/l1_0 for a depth of 2"""
+        _levels = []
+        for _level in range(self.__depth - 1, -1, -1):
+            index, _branch = divmod(index, self.__branching)
+            _levels.append(f'l{_level}_{_branch}')
+        return '/'.join([self.__root] + _levels[::-1])
+
+    def expected_messages(self, pub_count: int, pub_containers: int = 1) -> list:
+        """The messages each subscriber receives when every publisher publishes pub_count messages
+        :param pub_containers: The containers running the same publishers
+        """
+        _per_topic = {}
+        for _topic in self.__publisher_topics:
+            _per_topic[_topic] = _per_topic.get(_topic, 0) + pub_count * pub_containers
+        return [sum(_count for _topic, _count in _per_topic.items() if topic_matches(_filter, _topic))
+                for _filter in self.__filters]
+
+    def summary(self, pub_count: int, pub_containers: int = 1) -> dict:
+        _expected = self.expected_messages(pub_count, pub_containers)
+        return {
+            'leaves': self.__leaves,
+            'published_leaves': len(set(self.__publisher_topics)),
+            'single_level_filters': sum(1 for _filter in self.__filters if SINGLE_LEVEL_WILDCARD in _filter),
+            'multi_level_filters': sum(1 for _filter in self.__filters if _filter.endswith(MULTI_LEVEL_WILDCARD)),
+            'expected_messages': sum(_expected),
+            'subscribers': [{'filter': _filter, 'expected': _count}
+                            for _filter, _count in zip(self.__filters, _expected)],
+            'publishers': self.__publisher_topics
+        }
+
+
+if __name__ == '__main__':
+    # python topic_tree.py --root bench --depth 3 --branching 4 ... -> the plan of the scenario as JSON
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root', type=str, default='pybench')
+    parser.add_argument('--depth', type=int, required=True)
+    parser.add_argument('--branching', type=int, required=True)
+    parser.add_argument('--pub-clients', type=int, dest='pub_clients', required=True)
+    parser.add_argument('--sub-clients', type=int, dest='sub_clients', required=True)
+    parser.add_argument('--pub-count', type=int, dest='pub_count', default=1)
+    parser.add_argument('--pub-containers', type=int, dest='pub_containers', default=1)
+    parser.add_argument('--single-level', type=float, dest='single_level', default=0.0)
+    parser.add_argument('--multi-level', type=float, dest='multi_level', default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    tree = TopicTree(args.root, args.depth, args.branching, args.pub_clients, args.sub_clients,
+                     single_level=args.single_level, multi_level=args.multi_level, seed=args.seed)
+    print(json.dumps(tree.summary(args.pub_count, args.pub_containers), indent=2))
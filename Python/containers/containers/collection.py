@@ -0,0 +1,108 @@
+import functools
+import io
+import os
+import tarfile
+import tempfile
+import threading
+
+from provisioning import Action, Provisioner, PROVISION_WORKERS
+
+# Result files collected from the containers: the csv or columnar logs, the e2e delay histograms, the
+# clock offsets, the CONNACK latencies, the offline backlog, the message sequence counts and the shared
+# subscription groups, the MQTT v5 reason codes, the TLS handshakes, the payload size sweep, the
+# cross-node delays and the start barrier
+LOG_FILE_EXTENSIONS = ('.csv', '.col', '_e2e.json', '_clock.json', '_connect.json', '_backlog.json',
+                       '_sequence.json', '_share.json', '_reasons.json', '_tls.json', '_sizes.json', '_nodes.json',
+                       '_barrier.json')
+# Bytes of a collected log file kept in memory before it is spooled to a temporary file
+SPOOL_SIZE = 64 * 1024 * 1024
+
+
+class ArchiveStream(io.RawIOBase):
+    """File-like view of the chunks of a Docker archive, read by tarfile in stream mode without holding the
+    whole archive"""
+
+    def __init__(self, chunks):
+        self.__chunks = iter(chunks)
+        self.__chunk = b''
+        self.__offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self.__offset >= len(self.__chunk):
+            try:
+                self.__chunk = next(self.__chunks)
+            except StopIteration:
+                return 0
+            self.__offset = 0
+        _size = min(len(buffer), len(self.__chunk) - self.__offset)
+        buffer[:_size] = self.__chunk[self.__offset:self.__offset + _size]
+        self.__offset += _size
+        return _size
+
+
+def is_log_file(name: str) -> bool:
+    """The result files written by the client script, among the content of its logs directory"""
+    return name.endswith(LOG_FILE_EXTENSIONS) and name.find('_log_') != -1
+
+
+def append_container_logs(container, docker_src_file: str, final_tar: tarfile.TarFile, lock: threading.Lock,
+                          directory: str = 'logs') -> int:
+    """Streams the archive of a directory of a container and appends its log files to the final archive,
+    under directory/container name
+    :return: The number of files appended
+    """
+    bits, _ = container.get_archive(docker_src_file)
+    _files = 0
+    with tarfile.open(fileobj=io.BufferedReader(ArchiveStream(bits)), mode='r|') as archive:
+        for member in archive:
+            _name = os.path.basename(member.name)
+            if not member.isfile() or not is_log_file(_name):
+                continue
+            # The members are read in turn from the stream, the file is buffered to release the stream
+            # without holding the final archive during the download
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as spool:
+                _source = archive.extractfile(member)
+                for chunk in iter(lambda: _source.read(io.DEFAULT_BUFFER_SIZE), b''):
+                    spool.write(chunk)
+                spool.seek(0)
+                member.name = f'{directory}/{container.name}/{_name}'
+                with lock:
+                    final_tar.addfile(member, spool)
+            _files += 1
+    return _files
+
+
+def create_tar_file_destination(destination: str, dst_file_prefix: str = None):
+    if not os.path.exists(destination):
+        os.mkdir(destination)
+    if dst_file_prefix is None:
+        dst_file_prefix = 'output'
+    index = 0
+    _dest = os.path.join(destination, (dst_file_prefix + '.tar'))
+    while os.path.exists(_dest):
+        index += 1
+        _dest = os.path.join(destination, (dst_file_prefix + '(%d).tar' % index))
+    return _dest
+
+
+def collect_containers_logs(containers, docker_src_file: str, destination: str, dst_file_prefix: str = None,
+                            workers: int = PROVISION_WORKERS) -> str:
+    """Streams the log files of the containers into a single archive, concurrently and without extracting
+    them, the files of each container under logs/container name
+    :return: The path of the archive
+    """
+    file_destination = create_tar_file_destination(destination, dst_file_prefix)
+    docker_src_directory_prefix = 'logs'
+    docker_src_file_final = os.path.join(docker_src_file, docker_src_directory_prefix)
+
+    _lock = threading.Lock()
+    with tarfile.open(file_destination, 'w') as final_tar:
+        print(f'Get archive {docker_src_file_final} from {len(containers)} containers')
+        _jobs = [(container.name, functools.partial(append_container_logs, container, docker_src_file_final, final_tar,
+                                                    _lock, docker_src_directory_prefix)) for container in containers]
+        _files, _ = Provisioner(workers=workers or PROVISION_WORKERS).batch(Action.COLLECT, _jobs, strict=False)
+    print(f'{sum(_count or 0 for _count in _files)} log files collected in {file_destination}')
+    return file_destination
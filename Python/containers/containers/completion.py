@@ -0,0 +1,103 @@
+import queue
+import threading
+import time
+
+# Printed by the client script once its results are written, then every 2 s until the container is removed
+FINISHED_MARKER = 'finished its operation'
+# Seconds given to an exited container to report its status code
+EXIT_TIMEOUT = 5
+
+
+class Completion:
+    FINISHED = 'finished'
+    # The container exited before printing the marker, e.g. the script raised
+    FAILED = 'failed'
+    TIMED_OUT = 'timed_out'
+    ALL = (FINISHED, FAILED, TIMED_OUT)
+
+
+class CompletionWatcher:
+    """Waits for all the containers of a run at once: a thread per container follows the log stream of
+    the container for the completion marker, instead of reading the whole log of every container at each
+    tick. The end of the stream means the container exited, which is reported as soon as it happens."""
+
+    def __init__(self, containers: list, deadlines: dict, marker: str = FINISHED_MARKER, failure_marker: str = None,
+                 since: int = None):
+        """
+        :param deadlines: The seconds each container has to finish from the start of the wait, by name
+        :param failure_marker: Printed by a container which keeps running after a failed run, e.g. a pool one
+        :param since: Follows the logs from this timestamp, to leave out the previous runs of the container
+        """
+        self.__containers = list(containers)
+        self.__deadlines = deadlines
+        self.__marker = marker.encode('utf-8')
+        self.__failure_marker = failure_marker.encode('utf-8') if failure_marker else None
+        self.__since = since
+        self.__outcomes = queue.Queue()
+        self.__streams = {}
+        self.__streams_lock = threading.Lock()
+
+    def _follow(self, container):
+        _tail = b''
+        _length = max(len(self.__marker), len(self.__failure_marker or b''))
+        try:
+            _stream = container.logs(stream=True, follow=True, since=self.__since)
+            with self.__streams_lock:
+                self.__streams[container.name] = _stream
+            for chunk in _stream:
+                # The marker may be split between two chunks
+                _text = _tail + chunk
+                if self.__marker in _text:
+                    self.__outcomes.put((container.name, Completion.FINISHED, None))
+                    return
+                if self.__failure_marker is not None and self.__failure_marker in _text:
+                    self.__outcomes.put((container.name, Completion.FAILED, self.__failure_marker.decode('utf-8')))
+                    return
+                _tail = _text[-_length:]
+            _status = container.wait(timeout=EXIT_TIMEOUT).get('StatusCode')
+            self.__outcomes.put((container.name, Completion.FAILED, f'exited with status {_status}'))
+        except Exception as err:
+            self.__outcomes.put((container.name, Completion.FAILED, str(err)))
+
+    def _close_streams(self):
+        with self.__streams_lock:
+            for _stream in self.__streams.values():
+                # Unblocks the threads still following a container
+                _close = getattr(_stream, 'close', None)
+                if _close is not None:
+                    _close()
+
+    def wait(self, fail_fast: bool = False) -> dict:
+        """Waits until every container finished, failed or passed its deadline
+        :param fail_fast: Stops waiting for the other containers at the first failure
+        :return: The (Completion, detail) of each container by name, the containers not awaited after a
+        failure are left out
+        """
+        _start = time.monotonic()
+        _pending = {container.name: _start + self.__deadlines[container.name] for container in self.__containers}
+        for container in self.__containers:
+            threading.Thread(target=self._follow, args=(container,), name=f'completion-{container.name}',
+                             daemon=True).start()
+        results = {}
+        while _pending:
+            try:
+                name, state, detail = self.__outcomes.get(timeout=max(0.0, min(_pending.values()) - time.monotonic()))
+            except queue.Empty:
+                _now = time.monotonic()
+                for name in [name for name, deadline in _pending.items() if deadline <= _now]:
+                    del _pending[name]
+                    results[name] = (Completion.TIMED_OUT, f'not finished after {self.__deadlines[name]:g} s')
+                    print(f'Container {name} did not finish within {self.__deadlines[name]:g} s')
+                continue
+            if name not in _pending:
+                continue
+            del _pending[name]
+            results[name] = (state, detail)
+            if state == Completion.FINISHED:
+                print(f'Container {name} finished its work after {time.monotonic() - _start:.1f} s')
+            else:
+                print(f'Container {name} failed: {detail}')
+                if fail_fast:
+                    break
+        self._close_streams()
+        return results
@@ -3,18 +3,32 @@ import os
 import time
 import argparse
 import json
+import datetime
 import copy
 import ipaddress
 import netaddr
+import pytz
 import multiprocessing
+import sys
 
 import Exceptions
+from pool import ContainerPool
+from provisioning import Provisioner, PROVISION_WORKERS
+from completion import Completion, CompletionWatcher
+from collection import collect_containers_logs
+
+# The placement plan is shared with the client script, mounted next to it in the containers
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'clients'))
+from placement import Placement, PlacementPlan, Role
+from pool_agent import finished_marker, failed_marker
+from orchestration import get_client_volumes, placement_plan, create_pool, provision_containers, container_deadline
 
 MSG_SIZE_LIMIT = 120
 PUB_PREFIX = "pub_"
 IMAGE_NAME = 'francigjeci/mqtt-py:3.8.2'
 TOTAL_BROKERS = 5
 PATH_MULTIPLE_TOPICS = '/home/multiple-topics.json'
+TIMEZONE = pytz.timezone('Europe/Rome')
 
 
 class Keywords:
@@ -41,6 +55,64 @@ class Keywords:
     CONTAINER_BROKER = 'hostname'
     DESCRIPTION = 'description'
     JSON_CONFIG = 'json_config'
+    ENGINE = 'engine'
+    WORKERS = 'workers'
+    MESSAGE_SIZE = 'msg_size'
+    PAYLOAD_ENTROPY = 'payload_entropy'
+    PAYLOAD_SEED = 'payload_seed'
+    HEADER_FORMAT = 'header_format'
+    RATE = 'rate'
+    CONTAINER_RATE = 'container_rate'
+    ARRIVAL = 'arrival'
+    BURST_ON = 'burst_on'
+    BURST_OFF = 'burst_off'
+    ARRIVAL_SEED = 'arrival_seed'
+    HISTOGRAM_PRECISION = 'histogram_precision'
+    LOG_SAMPLE = 'log_sample'
+    LOG_FORMAT = 'log_format'
+    RING_SIZE = 'ring_size'
+    CLOCK_SAMPLES = 'clock_samples'
+    CLOCK_TIMEOUT = 'clock_timeout'
+    CONNECT_RATE = 'connect_rate'
+    RAMP = 'ramp'
+    RAMP_STEP = 'ramp_step'
+    SCENARIO = 'scenario'
+    OFFLINE_PERIOD = 'offline_period'
+    TOPIC_TREE_DEPTH = 'topic_tree_depth'
+    TOPIC_TREE_BRANCHING = 'topic_tree_branching'
+    TOPIC_TREE_SINGLE_LEVEL = 'topic_tree_single_level'
+    TOPIC_TREE_MULTI_LEVEL = 'topic_tree_multi_level'
+    TOPIC_TREE_SEED = 'topic_tree_seed'
+    TOPIC_TREE_PUB_CONTAINERS = 'topic_tree_pub_containers'
+    SHARE_GROUP = 'share_group'
+    SHARE_FORMAT = 'share_format'
+    SHARE_IDLE = 'share_idle'
+    PROTOCOL = 'protocol'
+    TOPIC_ALIASES = 'topic_aliases'
+    MAX_INFLIGHT = 'max_inflight'
+    TLS_CONNECTIONS = 'tls_connections'
+    MSG_SIZES = 'msg_sizes'
+    PLACEMENT = 'placement'
+    NODES = 'nodes'
+    NODE_WEIGHTS = 'node_weights'
+    PUB_NODES = 'pub_nodes'
+    SUB_NODES = 'sub_nodes'
+    PROVISION_WORKERS = 'provision_workers'
+    POOL = 'pool'
+    BARRIER = 'barrier'
+
+
+# Options of the client script which are passed untouched from a JSON section to the container
+CLIENT_OPTIONS = (Keywords.ENGINE, Keywords.WORKERS, Keywords.MESSAGE_SIZE, Keywords.PAYLOAD_ENTROPY,
+                  Keywords.PAYLOAD_SEED, Keywords.HEADER_FORMAT, Keywords.RATE, Keywords.CONTAINER_RATE,
+                  Keywords.ARRIVAL, Keywords.BURST_ON, Keywords.BURST_OFF, Keywords.ARRIVAL_SEED,
+                  Keywords.HISTOGRAM_PRECISION, Keywords.LOG_SAMPLE, Keywords.LOG_FORMAT,
+                  Keywords.RING_SIZE, Keywords.CLOCK_SAMPLES, Keywords.CLOCK_TIMEOUT, Keywords.CONNECT_RATE,
+                  Keywords.RAMP, Keywords.RAMP_STEP, Keywords.SCENARIO, Keywords.OFFLINE_PERIOD,
+                  Keywords.TOPIC_TREE_DEPTH, Keywords.TOPIC_TREE_BRANCHING, Keywords.TOPIC_TREE_SINGLE_LEVEL,
+                  Keywords.TOPIC_TREE_MULTI_LEVEL, Keywords.TOPIC_TREE_SEED, Keywords.TOPIC_TREE_PUB_CONTAINERS,
+                  Keywords.SHARE_GROUP, Keywords.SHARE_FORMAT, Keywords.SHARE_IDLE, Keywords.PROTOCOL,
+                  Keywords.TOPIC_ALIASES, Keywords.MAX_INFLIGHT, Keywords.TLS_CONNECTIONS, Keywords.MSG_SIZES)
 
 
 class CommandLineKeywords:
@@ -90,6 +162,7 @@ class ContainerClients:
         self.__container_index = container_index
         self.__section_type = section_type
         self.__config = config
+        self.__options = {}
         if not self.__config:
             self.__broker = broker
             self.__topics = topics
@@ -109,6 +182,7 @@ class ContainerClients:
             self.__pub_count = config.get(Keywords.PUBS_COUNT, 0)
             self.__ip_range = config.get(Keywords.CONTAINER_IP_RANGE, None)
             self.__description = config.get(Keywords.DESCRIPTION, None)
+            self.__options = {_key: config[_key] for _key in CLIENT_OPTIONS if _key in config}
         elif isinstance(self.__config, str):
             if not os.path.exists(self.__config):
                 raise Exceptions.ConfigFileNotFoundError(self.__config)
@@ -122,6 +196,7 @@ class ContainerClients:
                 self.__pub_count = get_item_from_json(topics_dict, Keywords.PUBS_COUNT, default_value=0)
                 self.__ip_range = get_item_from_json(topics_dict, Keywords.CONTAINER_IP_RANGE, default_value=None)
                 self.__description = get_item_from_json(topics_dict, Keywords.DESCRIPTION, default_value=None)
+                self.__options = {_key: topics_dict[_key] for _key in CLIENT_OPTIONS if _key in topics_dict}
 
         self.__check_json_format()
 
@@ -165,6 +240,10 @@ class ContainerClients:
     def description(self):
         return self.__description
 
+    @property
+    def options(self):
+        return self.__options
+
     def __validate_broker(self):
         section_position = get_section_position(container_index=self.container_index, section_type=self.section_type)
         if self.ip_range is None and self.broker is None:
@@ -281,6 +360,7 @@ class ContainerClients:
             Keywords.PUBS: self.pub_clients,
             Keywords.PUBS_COUNT: self.pub_count
         }
+        _section.update(self.options)
         return _section
 
 
@@ -615,13 +695,65 @@ def map_command_parameters_to_environmental() -> dict:
         'msg': 'CLIENT_MESSAGE',
         'brief': 'CLIENT_BRIEF',
         'multiple_topics': 'CLIENT_MULTIPLE_TOPICS',
-        'description': 'DESCRIPTION'
+        'description': 'DESCRIPTION',
+        Keywords.ENGINE: 'CLIENT_ENGINE',
+        Keywords.WORKERS: 'CLIENT_WORKERS',
+        Keywords.MESSAGE_SIZE: 'CLIENT_MESSAGE_SIZE',
+        Keywords.PAYLOAD_ENTROPY: 'CLIENT_PAYLOAD_ENTROPY',
+        Keywords.PAYLOAD_SEED: 'CLIENT_PAYLOAD_SEED',
+        Keywords.HEADER_FORMAT: 'CLIENT_HEADER_FORMAT',
+        Keywords.RATE: 'CLIENT_RATE',
+        Keywords.CONTAINER_RATE: 'CLIENT_CONTAINER_RATE',
+        Keywords.ARRIVAL: 'CLIENT_ARRIVAL',
+        Keywords.BURST_ON: 'CLIENT_BURST_ON',
+        Keywords.BURST_OFF: 'CLIENT_BURST_OFF',
+        Keywords.ARRIVAL_SEED: 'CLIENT_ARRIVAL_SEED',
+        Keywords.HISTOGRAM_PRECISION: 'CLIENT_HISTOGRAM_PRECISION',
+        Keywords.LOG_SAMPLE: 'CLIENT_LOG_SAMPLE',
+        Keywords.LOG_FORMAT: 'CLIENT_LOG_FORMAT',
+        Keywords.RING_SIZE: 'CLIENT_RING_SIZE',
+        Keywords.CLOCK_SAMPLES: 'CLIENT_CLOCK_SAMPLES',
+        Keywords.CLOCK_TIMEOUT: 'CLIENT_CLOCK_TIMEOUT',
+        Keywords.CONNECT_RATE: 'CLIENT_CONNECT_RATE',
+        Keywords.RAMP: 'CLIENT_RAMP',
+        Keywords.RAMP_STEP: 'CLIENT_RAMP_STEP',
+        Keywords.SCENARIO: 'CLIENT_SCENARIO',
+        Keywords.OFFLINE_PERIOD: 'CLIENT_OFFLINE_PERIOD',
+        Keywords.TOPIC_TREE_DEPTH: 'CLIENT_TOPIC_TREE_DEPTH',
+        Keywords.TOPIC_TREE_BRANCHING: 'CLIENT_TOPIC_TREE_BRANCHING',
+        Keywords.TOPIC_TREE_SINGLE_LEVEL: 'CLIENT_TOPIC_TREE_SINGLE_LEVEL',
+        Keywords.TOPIC_TREE_MULTI_LEVEL: 'CLIENT_TOPIC_TREE_MULTI_LEVEL',
+        Keywords.TOPIC_TREE_SEED: 'CLIENT_TOPIC_TREE_SEED',
+        Keywords.TOPIC_TREE_PUB_CONTAINERS: 'CLIENT_TOPIC_TREE_PUB_CONTAINERS',
+        Keywords.SHARE_GROUP: 'CLIENT_SHARE_GROUP',
+        Keywords.SHARE_FORMAT: 'CLIENT_SHARE_FORMAT',
+        Keywords.SHARE_IDLE: 'CLIENT_SHARE_IDLE',
+        Keywords.PROTOCOL: 'CLIENT_PROTOCOL',
+        Keywords.TOPIC_ALIASES: 'CLIENT_TOPIC_ALIASES',
+        Keywords.MAX_INFLIGHT: 'CLIENT_MAX_INFLIGHT',
+        Keywords.TLS_CONNECTIONS: 'CLIENT_TLS_CONNECTIONS',
+        Keywords.MSG_SIZES: 'CLIENT_MESSAGE_SIZES'
     }
 
 
-def create_container(docker_client, args, image: str = IMAGE_NAME, network: str = 'pumba_net', volumes: list = None,
-                     working_dir='/home', detach=True, tty=True, stdin_open=True, hostname=None,
-                     name=None, **kwargs):
+def container_placement(plan: PlacementPlan, container: int, clients: int, offset: int = None) -> str:
+    """The node of each publisher of a container, passed as CLIENT_PLACEMENT, None without a plan
+    :param offset: The publishers of the containers before this one, by default as many as in this one
+    """
+    if plan is None:
+        return None
+    return json.dumps({Role.PUB: plan.container_plan(Role.PUB, container, clients, offset)})
+
+
+def container_barrier(args, containers: int) -> str:
+    """The publisher containers expected at the start barrier, passed as CLIENT_BARRIER, None unless --barrier"""
+    if not getattr(args, Keywords.BARRIER, False):
+        return None
+    return json.dumps({Role.PUB: containers})
+
+
+def container_environment(args, placement: str = None, barrier: str = None) -> dict:
+    """The environment variables passing the options of the arguments to the client script"""
     _env_vars = {}
     _map_keys_cmd_environmental_parameters = map_command_parameters_to_environmental()
     for cmd_par, env_par in _map_keys_cmd_environmental_parameters.items():
@@ -634,11 +766,23 @@ def create_container(docker_client, args, image: str = IMAGE_NAME, network: str
                 pass
             except TypeError:
                 pass
+    if placement is not None:
+        _env_vars['CLIENT_PLACEMENT'] = placement
+    if barrier is not None:
+        _env_vars['CLIENT_BARRIER'] = barrier
+    return _env_vars
+
+
+def create_container(docker_client, args, image: str = IMAGE_NAME, network: str = 'pumba_net', volumes: list = None,
+                     working_dir='/home', detach=True, tty=True, stdin_open=True, hostname=None,
+                     name=None, placement: str = None, entrypoint: str = 'python3 script.py', barrier: str = None,
+                     **kwargs):
+    _env_vars = container_environment(args, placement, barrier)
     print(f'Environmental parameters passed to container {name}') # kwargs["name"]
     print(_env_vars)
     return docker_client.containers.run(image,
                                         detach=detach,
-                                        entrypoint='python3 script.py',
+                                        entrypoint=entrypoint,
                                         working_dir=working_dir,
                                         tty=tty,
                                         # terminal driver, necessary since you are running the python in bash
@@ -653,12 +797,15 @@ def create_container(docker_client, args, image: str = IMAGE_NAME, network: str
                                         )
 
 
-def create_containers_from_json(json_config, docker_client):
-    container_volumes = [os.getcwd() + '/clients/container_python.py:/home/script.py']
-    containers = []
+def create_containers_from_json(json_config, docker_client, args=None, pool: ContainerPool = None):
+    container_volumes = get_client_volumes(os.getcwd())
+    specs = []
 
     multi_cont = MultipleContainers(json_config)
     container_clients = multi_cont.get_containers()
+    _plan = placement_plan(args, Role.PUB, container_clients) if args is not None else None
+    # The publishers of the previous sections, for the placement to continue across the sections
+    _offset = 0
 
     print("Creating new containers")
     for _ind, _cont in enumerate(container_clients):
@@ -698,31 +845,33 @@ def create_containers_from_json(json_config, docker_client):
                 del _args[Keywords.TOPICS]
             _container_volumes.append(os.path.abspath(_container_topic) + ':' + destination_json_file)
         container_name = f"{PUB_PREFIX}_{_ind}"
-        _container = create_container(docker_client, _args, volumes=_container_volumes, network='pumba_net',
-                                      hostname=container_name, name=container_name)
-        print(f"Container {container_name} created")
-        containers.append(_container)
-    return containers
+        _clients = _cont.get(Keywords.PUBS) or 1
+        specs.append((container_name, _args, _container_volumes,
+                      container_placement(_plan, _ind, _clients, _offset)))
+        _offset += _clients
+    return provision_containers(docker_client, args, specs, create_container, container_environment, pool,
+                                barrier=container_barrier(args, len(specs)))
 
 
-def kill_containers_with_prefix(docker_client, prefix: str = None) -> None:
+def kill_containers_with_prefix(docker_client, prefix: str = None, graceful: bool = False,
+                                workers: int = PROVISION_WORKERS) -> None:
+    """Removes the containers whose name contains the prefix, killed at once unless graceful"""
     print("Killing available containers")
-    for container in docker_client.containers.list(all=True):
-        if prefix is not None:
-            if prefix in container.name:
-                container.stop()
-                container.remove()
-                print(f"Container {container.name} killed")
-        else:
-            container.stop()
-            container.remove()
-            print(f"Container {container.name} killed")
+    for name in Provisioner(docker_client, workers=workers or PROVISION_WORKERS).teardown(prefix, graceful):
+        print(f"Container {name} killed")
 
 
 def arg_parse(hostname: str = None, port: int = None, topic=None, pub_clients: int = 1, containers: int = 5,
               pub_count: int = 1, qos: int = 0, username: str = None, password: str = None, pub_timeout: int = 60,
               cacert=None, multiple_topics: str = None, description: str = None, json_config: str = None,
-              msg_size=1024):
+              engine: str = None, workers: int = None,
+              msg_size=1024, payload_entropy: str = None, payload_seed: int = None, header_format: str = None,
+              rate: float = None, container_rate: float = None, arrival: str = None, burst_on: float = None,
+              burst_off: float = None, arrival_seed: int = None, connect_rate: float = None, ramp: str = None,
+              ramp_step: int = None, clock_samples: int = None, protocol: str = None, topic_aliases: int = None,
+              max_inflight: int = None, tls_connections: int = None, msg_sizes: str = None, placement: str = None,
+              nodes: str = None, node_weights: str = None, pub_nodes: str = None, sub_nodes: str = None,
+              provision_workers: int = PROVISION_WORKERS, pool: bool = False, barrier: bool = False):
     parser = argparse.ArgumentParser()
 
     parser.add_argument('-H', '--hostname', required=False, default=hostname)  # , default="mqtt.eclipse.org"
@@ -743,6 +892,65 @@ def arg_parse(hostname: str = None, port: int = None, topic=None, pub_clients: i
     parser.add_argument('-q', '--qos', required=False, type=int, default=qos, choices=[0, 1, 2])
     parser.add_argument('--msg-size', dest='msg_size', type=MessageValidation(MSG_SIZE_LIMIT), default=msg_size,
                         help='The payload size to use in bytes')
+    parser.add_argument('--msg-sizes', dest='msg_sizes', type=str, default=msg_sizes,
+                        help='Sweeps the payload sizes in a single run, a list 64,256,1024 or a geometric range '
+                             'start:stop:factor, publishing --pub-count messages of each size')
+    parser.add_argument('--payload-entropy', dest='payload_entropy', type=str, default=payload_entropy,
+                        choices=['random', 'compressible', 'fixed'],
+                        help='The content of the payload filler generated in the containers')
+    parser.add_argument('--payload-seed', dest='payload_seed', type=int, default=payload_seed,
+                        help='Seed of the random payload filler')
+    parser.add_argument('--header-format', dest='header_format', type=str, default=header_format,
+                        choices=['binary', 'text', 'properties'],
+                        help='Format of the timing header of the payloads, text is readable in Wireshark and '
+                             'properties sends it as MQTT v5 user properties')
+    parser.add_argument('--protocol', type=str, default=protocol, choices=['3.1.1', '5'],
+                        help='The MQTT version of the clients in the containers')
+    parser.add_argument('--topic-aliases', dest='topic_aliases', type=int, default=topic_aliases,
+                        help='The MQTT v5 topic aliases of each publisher')
+    parser.add_argument('--max-inflight', dest='max_inflight', type=int, default=max_inflight,
+                        help='The QoS 1/2 messages of each publisher awaiting their acknowledgement at once, 0 '
+                             'for no limit. By default the 20 of paho')
+    parser.add_argument('--tls-connections', dest='tls_connections', type=int, default=tls_connections,
+                        help='Full and resumed TLS handshakes measured by each container before its clients '
+                             'connect, needs --cacert')
+    parser.add_argument('--placement', type=str, default=placement, choices=Placement.ALL,
+                        help='How the clients are spread over the broker nodes: container (each container on its '
+                             'broker), round_robin, hash (consistent hashing of the client ids), weighted '
+                             '(--node-weights) or split (--pub-nodes and --sub-nodes)')
+    parser.add_argument('--nodes', type=str, default=nodes,
+                        help='The broker nodes of the placement, comma separated. By default the brokers of the '
+                             'containers')
+    parser.add_argument('--node-weights', dest='node_weights', type=str, default=node_weights,
+                        help='The capacity of each node of the weighted placement, comma separated integers')
+    parser.add_argument('--pub-nodes', dest='pub_nodes', type=str, default=pub_nodes,
+                        help='The nodes of the publishers of the split placement, comma separated')
+    parser.add_argument('--sub-nodes', dest='sub_nodes', type=str, default=sub_nodes,
+                        help='The nodes of the subscribers of the split placement, comma separated')
+    parser.add_argument('--rate', type=float, default=rate,
+                        help='The messages per second of each publisher. By default all the messages are '
+                             'published at once')
+    parser.add_argument('--container-rate', dest='container_rate', type=float, default=container_rate,
+                        help='The messages per second of each container, split among its publishers')
+    parser.add_argument('--arrival', type=str, default=arrival, choices=['constant', 'poisson', 'on_off'],
+                        help='The arrival process of the rate-controlled publishers')
+    parser.add_argument('--burst-on', dest='burst_on', type=float, default=burst_on,
+                        help='Seconds of each burst of the on_off arrival process')
+    parser.add_argument('--burst-off', dest='burst_off', type=float, default=burst_off,
+                        help='Seconds of silence between the bursts of the on_off arrival process')
+    parser.add_argument('--arrival-seed', dest='arrival_seed', type=int, default=arrival_seed,
+                        help='Seed of the random inter-arrival times')
+    parser.add_argument('--connect-rate', dest='connect_rate', type=float, default=connect_rate,
+                        help='The clients connecting per second in each container, to pace the connections '
+                             'instead of connecting all the clients at once')
+    parser.add_argument('--ramp', type=str, default=ramp, choices=['linear', 'stepped'],
+                        help='The profile of the connection ramp: one client at a time or groups of clients')
+    parser.add_argument('--ramp-step', dest='ramp_step', type=int, default=ramp_step,
+                        help='The clients connecting together in each step of the stepped ramp')
+    parser.add_argument('--clock-samples', dest='clock_samples', type=int, default=clock_samples,
+                        help='The ping-pong exchanges of each container with the clock responder of the '
+                             'subscribers, before and after the measurements, for clocksync.py correct. By default '
+                             'the clocks of the publishers are not synchronised')
     # parser.add_argument('--msg', type=str, dest='msg',
     #                     help='The payload of the publish message')
     parser.add_argument('-S', '--delay', required=False, type=float, default=None,
@@ -765,6 +973,21 @@ def arg_parse(hostname: str = None, port: int = None, topic=None, pub_clients: i
 
     parser.add_argument('--json-config', type=str, default=json_config,
                         help='The config json file')
+    parser.add_argument('--engine', type=str, default=engine, choices=['process', 'asyncio', 'thread'],
+                        help='How the clients are run inside the containers: one process per client '
+                             '(process), multiplexed in event loops (asyncio) or as threads of worker '
+                             'processes (thread)')
+    parser.add_argument('--workers', type=int, default=workers,
+                        help='The number of worker processes per container for the asyncio and thread engines')
+    parser.add_argument('--provision-workers', dest='provision_workers', type=int, default=provision_workers,
+                        help='The containers created or removed at once. By default %d' % PROVISION_WORKERS)
+    parser.add_argument('--pool', action='store_true', default=pool,
+                        help='Keeps the client containers running after the run and dispatches the next runs '
+                             'to them instead of creating new containers. A run without --pool removes them')
+    parser.add_argument('--barrier', action='store_true', default=barrier,
+                        help='Holds the publishers until the clients of every container are ready, then starts '
+                             'them at the same instant. The start is coordinated by the subscribers, run with '
+                             '--barrier too')
 
     # parser.add_argument('-s', '--use-tls', action='store_true')
     # parser.add_argument('--insecure', action='store_true')
@@ -783,15 +1006,20 @@ class Publishers(multiprocessing.Process):
         self.__docker_client = docker.from_env()
 
     def run(self) -> None:
-        # kill the previous created containers
-        kill_containers_with_prefix(self.__docker_client, prefix='pub')
-
-        container_volumes = [self.__pwd + '/clients/container_python.py:/home/script.py']
+        # kill the previous created containers, the ones of the pool are reused
+        _pool = create_pool(self.__docker_client, self.__args, self.__pwd, create_container)
+        if _pool is None:
+            kill_containers_with_prefix(self.__docker_client, prefix='pub',
+                                        workers=getattr(self.__args, Keywords.PROVISION_WORKERS))
+        # The output of the previous runs of the pool containers is left out
+        _since = int(time.time())
+
+        container_volumes = get_client_volumes(self.__pwd)
         json_config = getattr(self.__args, 'json_config')
         # string or list
         containers = []
         if json_config:
-            containers = create_containers_from_json(json_config, self.__docker_client)
+            containers = create_containers_from_json(json_config, self.__docker_client, self.__args, _pool)
         else:
             nr_containers = getattr(self.__args, Keywords.CONTAINERS)
             topics_json_file = getattr(self.__args, Keywords.MULTIPLE_TOPICS)
@@ -803,13 +1031,14 @@ class Publishers(multiprocessing.Process):
                     del _args[Keywords.TOPICS]
                 container_volumes.append(os.path.abspath(topics_json_file) + ':' + destination_json_file)
 
+            _plan = placement_plan(self.__args, Role.PUB)
             print("Creating new containers")
-            for my_cont in range(nr_containers):
-                container_name = f"{PUB_PREFIX}_{my_cont}"
-                _cont = create_container(self.__docker_client, _args, volumes=container_volumes, name=container_name,
-                                         hostname=container_name)
-                print(f"Container {container_name} created")
-                containers.append(_cont)
+            specs = [(f"{PUB_PREFIX}_{my_cont}", _args, container_volumes,
+                      container_placement(_plan, my_cont, getattr(self.__args, Keywords.PUBS)))
+                     for my_cont in range(nr_containers)]
+            containers = provision_containers(self.__docker_client, self.__args, specs, create_container,
+                                              container_environment, _pool,
+                                              barrier=container_barrier(self.__args, nr_containers))
 
         print('Starting containers')
         time.sleep(2)
@@ -818,9 +1047,35 @@ class Publishers(multiprocessing.Process):
                 print(f'Container {container.name} started')
                 print(f'Running python script in container {container.name}')
 
+        # The containers are not removed before their publishers have finished, the script runs as PID 1 and
+        # ignores SIGTERM
+        print('Waiting for the containers to finish')
+        if _pool is None:
+            _deadlines = {container.name: container_deadline(container, Role.PUB) for container in containers}
+            _watcher = CompletionWatcher(containers, _deadlines)
+        else:
+            _deadlines = {container.name: container_deadline(container, Role.PUB, _pool.environment(container.name))
+                          for container in containers}
+            _watcher = CompletionWatcher(containers, _deadlines, marker=finished_marker(_pool.run_id),
+                                         failure_marker=failed_marker(_pool.run_id), since=_since)
+        _completions = _watcher.wait()
+        _unfinished = [container.name for container in containers
+                       if _completions.get(container.name, (None,))[0] != Completion.FINISHED]
+        if _unfinished:
+            print(f'Containers not finished, their results may be partial: {", ".join(_unfinished)}')
+        else:
+            print('All containers have finished their work')
+
+        # The clock offsets, CONNACK latencies and start skews of the publishers
+        print('Collecting the results from containers')
+        _date = datetime.datetime.now(tz=TIMEZONE).strftime('%m_%d_%H_%M') + '_'
+        collect_containers_logs(containers, docker_src_file='/home/', destination=self.__pwd + '/logs',
+                                dst_file_prefix=_date + '_' + 'pub',
+                                workers=getattr(self.__args, Keywords.PROVISION_WORKERS))
+
         print('Printing containers Logs')
         for container in containers:
-            _cont_output = container.logs()
+            _cont_output = container.logs(since=_since)
             print(_cont_output.decode("utf-8"))
 
         print('Printing containers stats')
@@ -828,7 +1083,10 @@ class Publishers(multiprocessing.Process):
             print(container.stats(stream=False))
 
         print('Stopping and killing the containers')
-        kill_containers_with_prefix(self.__docker_client, PUB_PREFIX)
+        if _pool is None:
+            # The containers still running past their deadline get the stop timeout to flush their output
+            kill_containers_with_prefix(self.__docker_client, PUB_PREFIX, graceful=bool(_unfinished),
+                                        workers=getattr(self.__args, Keywords.PROVISION_WORKERS))
 
 
 if __name__ == '__main__':
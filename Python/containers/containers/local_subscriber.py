@@ -1,4 +1,3 @@
-import tarfile
 import docker
 import os
 import time
@@ -10,10 +9,23 @@ import netaddr
 import copy
 import pytz
 import subprocess
+import sys
 import multiprocessing
 
 # Local packages
 import Exceptions
+from pool import ContainerPool
+from provisioning import Provisioner, PROVISION_WORKERS
+from completion import Completion, CompletionWatcher
+from collection import collect_containers_logs
+
+# The placement plan is shared with the client script, mounted next to it in the containers
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'clients'))
+from placement import Placement, PlacementPlan, Role
+from pool_agent import finished_marker, failed_marker
+from clocksync import CLOCK_SAMPLES
+from orchestration import COMPLETION_MARGIN, get_client_volumes, placement_plan, create_pool, provision_containers, \
+    container_deadline
 
 SUB_PREFIX = "sub_"
 IMAGE_NAME = 'francigjeci/mqtt-py:3.8.2'
@@ -46,6 +58,65 @@ class Keywords:
     CONTAINER_BROKER = 'hostname'
     DESCRIPTION = 'description'
     JSON_CONFIG = 'json_config'
+    ENGINE = 'engine'
+    WORKERS = 'workers'
+    MESSAGE_SIZE = 'msg_size'
+    PAYLOAD_ENTROPY = 'payload_entropy'
+    PAYLOAD_SEED = 'payload_seed'
+    HEADER_FORMAT = 'header_format'
+    RATE = 'rate'
+    CONTAINER_RATE = 'container_rate'
+    ARRIVAL = 'arrival'
+    BURST_ON = 'burst_on'
+    BURST_OFF = 'burst_off'
+    ARRIVAL_SEED = 'arrival_seed'
+    HISTOGRAM_PRECISION = 'histogram_precision'
+    LOG_SAMPLE = 'log_sample'
+    LOG_FORMAT = 'log_format'
+    RING_SIZE = 'ring_size'
+    CLOCK_SAMPLES = 'clock_samples'
+    CLOCK_TIMEOUT = 'clock_timeout'
+    CONNECT_RATE = 'connect_rate'
+    RAMP = 'ramp'
+    RAMP_STEP = 'ramp_step'
+    SCENARIO = 'scenario'
+    OFFLINE_PERIOD = 'offline_period'
+    TOPIC_TREE_DEPTH = 'topic_tree_depth'
+    TOPIC_TREE_BRANCHING = 'topic_tree_branching'
+    TOPIC_TREE_SINGLE_LEVEL = 'topic_tree_single_level'
+    TOPIC_TREE_MULTI_LEVEL = 'topic_tree_multi_level'
+    TOPIC_TREE_SEED = 'topic_tree_seed'
+    TOPIC_TREE_PUB_CONTAINERS = 'topic_tree_pub_containers'
+    SHARE_GROUP = 'share_group'
+    SHARE_FORMAT = 'share_format'
+    SHARE_IDLE = 'share_idle'
+    PROTOCOL = 'protocol'
+    TOPIC_ALIASES = 'topic_aliases'
+    TLS_CONNECTIONS = 'tls_connections'
+    MSG_SIZES = 'msg_sizes'
+    PLACEMENT = 'placement'
+    NODES = 'nodes'
+    NODE_WEIGHTS = 'node_weights'
+    PUB_NODES = 'pub_nodes'
+    SUB_NODES = 'sub_nodes'
+    PROVISION_WORKERS = 'provision_workers'
+    POOL = 'pool'
+    BARRIER = 'barrier'
+    COMPLETION_TIMEOUT = 'completion_timeout'
+    FAIL_FAST = 'fail_fast'
+
+
+# Options of the client script which are passed untouched from a JSON section to the container
+CLIENT_OPTIONS = (Keywords.ENGINE, Keywords.WORKERS, Keywords.MESSAGE_SIZE, Keywords.PAYLOAD_ENTROPY,
+                  Keywords.PAYLOAD_SEED, Keywords.HEADER_FORMAT, Keywords.RATE, Keywords.CONTAINER_RATE,
+                  Keywords.ARRIVAL, Keywords.BURST_ON, Keywords.BURST_OFF, Keywords.ARRIVAL_SEED,
+                  Keywords.HISTOGRAM_PRECISION, Keywords.LOG_SAMPLE, Keywords.LOG_FORMAT,
+                  Keywords.RING_SIZE, Keywords.CLOCK_SAMPLES, Keywords.CLOCK_TIMEOUT, Keywords.CONNECT_RATE,
+                  Keywords.RAMP, Keywords.RAMP_STEP, Keywords.SCENARIO, Keywords.OFFLINE_PERIOD,
+                  Keywords.TOPIC_TREE_DEPTH, Keywords.TOPIC_TREE_BRANCHING, Keywords.TOPIC_TREE_SINGLE_LEVEL,
+                  Keywords.TOPIC_TREE_MULTI_LEVEL, Keywords.TOPIC_TREE_SEED, Keywords.TOPIC_TREE_PUB_CONTAINERS,
+                  Keywords.SHARE_GROUP, Keywords.SHARE_FORMAT, Keywords.SHARE_IDLE, Keywords.PROTOCOL,
+                  Keywords.TOPIC_ALIASES, Keywords.TLS_CONNECTIONS, Keywords.MSG_SIZES)
 
 
 class CommandLineKeywords:
@@ -95,6 +166,7 @@ class ContainerClients(object):
         self.__container_index = container_index
         self.__section_type = section_type
         self.__config = config
+        self.__options = {}
         if not self.__config:
             self.__broker = broker
             self.__topics = topics
@@ -114,6 +186,7 @@ class ContainerClients(object):
             self.__pub_count = config.get(Keywords.PUBS_COUNT, 0)
             self.__ip_range = config.get(Keywords.CONTAINER_IP_RANGE, None)
             self.__description = config.get(Keywords.DESCRIPTION, None)
+            self.__options = {_key: config[_key] for _key in CLIENT_OPTIONS if _key in config}
         elif isinstance(self.__config, str):
             if not os.path.exists(self.__config):
                 raise Exceptions.ConfigFileNotFoundError(self.__config)
@@ -127,6 +200,7 @@ class ContainerClients(object):
                 self.__pub_count = get_item_from_json(topics_dict, Keywords.PUBS_COUNT, default_value=0)
                 self.__ip_range = get_item_from_json(topics_dict, Keywords.CONTAINER_IP_RANGE, default_value=None)
                 self.__description = get_item_from_json(topics_dict, Keywords.DESCRIPTION, default_value=None)
+                self.__options = {_key: topics_dict[_key] for _key in CLIENT_OPTIONS if _key in topics_dict}
 
         self.__check_json_format()
 
@@ -170,6 +244,10 @@ class ContainerClients(object):
     def description(self):
         return self.__description
 
+    @property
+    def options(self):
+        return self.__options
+
     def __validate_broker(self):
         section_position = get_section_position(container_index=self.container_index, section_type=self.section_type)
         if self.ip_range is None and self.broker is None:
@@ -286,6 +364,7 @@ class ContainerClients(object):
             Keywords.PUBS: self.pub_clients,
             Keywords.PUBS_COUNT: self.pub_count
         }
+        _section.update(self.options)
         return _section
 
 
@@ -474,76 +553,6 @@ def validate_count_clients(nr_clients: int, nr_count_per_client: int, container_
         exit(1)
 
 
-def get_archive_from_container(container_name, docker_src_file: str):
-    container = docker.from_env().containers.get(container_name)
-    # Get the content
-    # _result = container.exec_run('ls /home/logs')
-    # _filename = _result.output.decode('utf-8')
-    # print(_filename)
-    bits, stat = container.get_archive(os.path.join(docker_src_file))
-    return bits, stat
-
-
-def create_tar_file_destination(destination: str, dst_file_prefix: str = None):
-    if not os.path.exists(destination):
-        os.mkdir(destination)
-    if dst_file_prefix is None:
-        dst_file_prefix = 'output'
-    index = 0
-    _dest = os.path.join(destination, (dst_file_prefix + '.tar'))
-    while os.path.exists(_dest):
-        index += 1
-        _dest = os.path.join(destination, (dst_file_prefix + '(%d).tar' % index))
-    return _dest
-
-
-def collect_containers_logs(containers, docker_src_file: str, destination: str, dst_file_prefix: str = None) -> str:
-    file_destination = create_tar_file_destination(destination, dst_file_prefix)
-    docker_src_directory_prefix = 'logs'
-
-    # removing all available csv file
-    for file_path in os.listdir(os.path.join(os.getcwd(), docker_src_directory_prefix)):
-        if file_path.endswith('.csv') and file_path.find('_log_') != -1:
-            os.remove(os.path.join(os.getcwd(), docker_src_directory_prefix, file_path))
-
-    final_tar = tarfile.open(file_destination, 'w')
-    for ind, container in enumerate(containers):
-        file_destination_cont = create_tar_file_destination(destination, dst_file_prefix + '_' + container.name)
-
-        with open(file_destination_cont, 'wb') as f:
-            docker_src_file_final = os.path.join(docker_src_file, docker_src_directory_prefix)
-            print(f'Get archive {docker_src_file_final} from container {container.name}')
-            bits, stat = get_archive_from_container(container.name, docker_src_file_final)
-            for chunk in bits:
-                f.write(chunk)
-
-        # docker_src_file_final = os.path.join(docker_src_file, docker_src_directory_prefix)
-        # print(f'Get archive {docker_src_file_final} from container {container.name}')
-        # bits, stat = get_archive_from_container(container.name, docker_src_file_final)
-        # for d in bits:
-        #     print(d.decode('utf-8'))
-        #     pw_tar = tarfile.TarFile(fileobj=io.StringIO(d.decode('utf-8')))
-        #     pw_tar.extractall()  # "extract_to/"
-        #     pw_tar.close()
-
-        # Extract the csv file in the tar
-        tar = tarfile.open(file_destination_cont)
-        tar.extractall()
-        tar.close()
-
-        # remove the temporary tar file
-        os.remove(file_destination_cont)
-    # After finishing the extraction, we put then in the final tar
-    for file_path in os.listdir(os.path.join(os.getcwd(), docker_src_directory_prefix)):
-        if file_path.endswith('.csv') and file_path.find('_log_') != -1:
-            _complete_file_path = os.path.join(docker_src_directory_prefix, file_path)
-            final_tar.add(_complete_file_path)
-            os.remove(_complete_file_path)
-    final_tar.close()
-
-    return file_destination
-
-
 def get_args(args: argparse.Namespace) -> str:
     _args = copy.deepcopy(args)
     args_dict = _args.__dict__
@@ -580,13 +589,100 @@ def map_command_parameters_to_environmental() -> dict:
         'msg': 'CLIENT_MESSAGE',
         'brief': 'CLIENT_BRIEF',
         'multiple_topics': 'CLIENT_MULTIPLE_TOPICS',
-        'description': 'DESCRIPTION'
+        'description': 'DESCRIPTION',
+        Keywords.ENGINE: 'CLIENT_ENGINE',
+        Keywords.WORKERS: 'CLIENT_WORKERS',
+        Keywords.MESSAGE_SIZE: 'CLIENT_MESSAGE_SIZE',
+        Keywords.PAYLOAD_ENTROPY: 'CLIENT_PAYLOAD_ENTROPY',
+        Keywords.PAYLOAD_SEED: 'CLIENT_PAYLOAD_SEED',
+        Keywords.HEADER_FORMAT: 'CLIENT_HEADER_FORMAT',
+        Keywords.RATE: 'CLIENT_RATE',
+        Keywords.CONTAINER_RATE: 'CLIENT_CONTAINER_RATE',
+        Keywords.ARRIVAL: 'CLIENT_ARRIVAL',
+        Keywords.BURST_ON: 'CLIENT_BURST_ON',
+        Keywords.BURST_OFF: 'CLIENT_BURST_OFF',
+        Keywords.ARRIVAL_SEED: 'CLIENT_ARRIVAL_SEED',
+        Keywords.HISTOGRAM_PRECISION: 'CLIENT_HISTOGRAM_PRECISION',
+        Keywords.LOG_SAMPLE: 'CLIENT_LOG_SAMPLE',
+        Keywords.LOG_FORMAT: 'CLIENT_LOG_FORMAT',
+        Keywords.RING_SIZE: 'CLIENT_RING_SIZE',
+        Keywords.CLOCK_SAMPLES: 'CLIENT_CLOCK_SAMPLES',
+        Keywords.CLOCK_TIMEOUT: 'CLIENT_CLOCK_TIMEOUT',
+        Keywords.CONNECT_RATE: 'CLIENT_CONNECT_RATE',
+        Keywords.RAMP: 'CLIENT_RAMP',
+        Keywords.RAMP_STEP: 'CLIENT_RAMP_STEP',
+        Keywords.SCENARIO: 'CLIENT_SCENARIO',
+        Keywords.OFFLINE_PERIOD: 'CLIENT_OFFLINE_PERIOD',
+        Keywords.TOPIC_TREE_DEPTH: 'CLIENT_TOPIC_TREE_DEPTH',
+        Keywords.TOPIC_TREE_BRANCHING: 'CLIENT_TOPIC_TREE_BRANCHING',
+        Keywords.TOPIC_TREE_SINGLE_LEVEL: 'CLIENT_TOPIC_TREE_SINGLE_LEVEL',
+        Keywords.TOPIC_TREE_MULTI_LEVEL: 'CLIENT_TOPIC_TREE_MULTI_LEVEL',
+        Keywords.TOPIC_TREE_SEED: 'CLIENT_TOPIC_TREE_SEED',
+        Keywords.TOPIC_TREE_PUB_CONTAINERS: 'CLIENT_TOPIC_TREE_PUB_CONTAINERS',
+        Keywords.SHARE_GROUP: 'CLIENT_SHARE_GROUP',
+        Keywords.SHARE_FORMAT: 'CLIENT_SHARE_FORMAT',
+        Keywords.SHARE_IDLE: 'CLIENT_SHARE_IDLE',
+        Keywords.PROTOCOL: 'CLIENT_PROTOCOL',
+        Keywords.TOPIC_ALIASES: 'CLIENT_TOPIC_ALIASES',
+        Keywords.TLS_CONNECTIONS: 'CLIENT_TLS_CONNECTIONS',
+        Keywords.MSG_SIZES: 'CLIENT_MESSAGE_SIZES'
     }
 
 
-def create_container(docker_client, args, image: str = IMAGE_NAME, network: str = 'pumba_net', volumes: list = None,
-                     working_dir='/home', detach=True, tty=True, stdin_open=True, hostname=None,
-                     name=None, **kwargs):
+def container_brokers(args) -> tuple:
+    """The brokers the containers connect to and their port, from the arguments or the JSON sections"""
+    json_config = getattr(args, Keywords.JSON_CONFIG)
+    _sections = MultipleContainers(json_config).get_containers() if json_config else [vars(args)]
+    _hostnames = sorted({_section.get(Keywords.HOSTNAME) for _section in _sections
+                         if _section.get(Keywords.HOSTNAME)})
+    _port = next((_section.get(Keywords.PORT) for _section in _sections if _section.get(Keywords.PORT)), 1883)
+    return _hostnames, _port
+
+
+def start_clock_responder(pwd: str, args) -> subprocess.Popen:
+    """Runs the reference clock on this host, the containers measure their offset from it through the
+    brokers under test
+    :return: The responder process, None when no broker is known
+    """
+    _hostnames, _port = container_brokers(args)
+    if not _hostnames:
+        return None
+    return subprocess.Popen([sys.executable, os.path.join(pwd, 'clients', 'clocksync.py'), 'respond',
+                             '--hostname', *_hostnames, '--port', str(_port)])
+
+
+def start_barrier_coordinator(pwd: str, args) -> subprocess.Popen:
+    """Releases the publishers of all the containers at the same instant, of the clock of this host, once
+    the subscriber and publisher containers are ready. The publishers are run with --barrier too
+    :return: The coordinator process, None when no broker is known
+    """
+    _hostnames, _port = container_brokers(args)
+    if not _hostnames:
+        return None
+    return subprocess.Popen([sys.executable, os.path.join(pwd, 'clients', 'barrier.py'), 'coordinate',
+                             '--hostname', *_hostnames, '--port', str(_port)])
+
+
+def container_placement(plan: PlacementPlan, container: int, clients: int, offset: int = None) -> str:
+    """The node of each subscriber of a container, passed as CLIENT_PLACEMENT, None without a plan
+    :param offset: The subscribers of the containers before this one, by default as many as in this one
+    """
+    if plan is None:
+        return None
+    return json.dumps({Role.SUB: plan.container_plan(Role.SUB, container, clients, offset)})
+
+
+def container_barrier(args, containers: int) -> str:
+    """The subscriber containers expected at the start barrier, passed as CLIENT_BARRIER, None unless --barrier"""
+    if not getattr(args, Keywords.BARRIER, False):
+        return None
+    return json.dumps({Role.SUB: containers})
+
+
+def container_environment(args, placement: str = None, barrier: str = None, clock_samples: int = None) -> dict:
+    """The environment variables passing the options of the arguments to the client script
+    :param clock_samples: The clock samples of the run, for the containers whose arguments give none
+    """
     _env_vars = {}
     _map_keys_cmd_environmental_parameters = map_command_parameters_to_environmental()
     for cmd_par, env_par in _map_keys_cmd_environmental_parameters.items():
@@ -599,11 +695,25 @@ def create_container(docker_client, args, image: str = IMAGE_NAME, network: str
                 pass
             except TypeError:
                 pass
+    if placement is not None:
+        _env_vars['CLIENT_PLACEMENT'] = placement
+    if barrier is not None:
+        _env_vars['CLIENT_BARRIER'] = barrier
+    if clock_samples is not None and _env_vars.get('CLIENT_CLOCK_SAMPLES') is None:
+        _env_vars['CLIENT_CLOCK_SAMPLES'] = clock_samples
+    return _env_vars
+
+
+def create_container(docker_client, args, image: str = IMAGE_NAME, network: str = 'pumba_net', volumes: list = None,
+                     working_dir='/home', detach=True, tty=True, stdin_open=True, hostname=None,
+                     name=None, placement: str = None, entrypoint: str = 'python3 script.py', barrier: str = None,
+                     clock_samples: int = None, **kwargs):
+    _env_vars = container_environment(args, placement, barrier, clock_samples)
     print(f'Environmental parameters passed to container {name}')
     print(_env_vars)
     return docker_client.containers.run(image,
                                         detach=detach,
-                                        entrypoint='python3 script.py',
+                                        entrypoint=entrypoint,
                                         working_dir=working_dir,
                                         tty=tty,
                                         # terminal driver, necessary since you are running the python in bash
@@ -618,12 +728,15 @@ def create_container(docker_client, args, image: str = IMAGE_NAME, network: str
                                         )
 
 
-def create_containers_from_json(json_config, docker_client):
-    container_volumes = [os.getcwd() + '/clients/container_python.py:/home/script.py']
-    containers = []
+def create_containers_from_json(json_config, docker_client, args=None, pool: ContainerPool = None):
+    container_volumes = get_client_volumes(os.getcwd())
+    specs = []
 
     multi_cont = MultipleContainers(json_config)
     container_clients = multi_cont.get_containers()
+    _plan = placement_plan(args, Role.SUB, container_clients) if args is not None else None
+    # The subscribers of the previous sections, for the placement to continue across the sections
+    _offset = 0
 
     print("Creating new containers")
     for _ind, _cont in enumerate(container_clients):
@@ -660,25 +773,23 @@ def create_containers_from_json(json_config, docker_client):
                 del _args[Keywords.TOPICS]
             _container_volumes.append(os.path.abspath(_container_topic) + ':' + destination_json_file)
         container_name = f"{SUB_PREFIX}_{_ind}"
-        _container = create_container(docker_client, _args, volumes=_container_volumes, network='pumba_net',
-                                      hostname=container_name, name=container_name)
-        print(f"Container {container_name} created")
-        containers.append(_container)
-    return containers
-
-
-def kill_containers_with_prefix(docker_client, prefix: str = None) -> None:
+        _clients = _cont.get(Keywords.SUBS) or 1
+        specs.append((container_name, _args, _container_volumes,
+                      container_placement(_plan, _ind, _clients, _offset)))
+        _offset += _clients
+    # Set by the run when it answers the clock synchronisation, the json sections may give their own
+    return provision_containers(docker_client, args, specs, create_container, container_environment, pool,
+                                barrier=container_barrier(args, len(specs)),
+                                clock_samples=getattr(args, Keywords.CLOCK_SAMPLES, None))
+
+
+def kill_containers_with_prefix(docker_client, prefix: str = None, graceful: bool = False,
+                                workers: int = PROVISION_WORKERS) -> None:
+    """Removes the containers whose name contains the prefix, killed at once unless graceful: the results
+    are collected before the containers are removed"""
     def kill_containers():
-        for container in docker_client.containers.list(all=True):
-            if prefix is not None:
-                if prefix in container.name:
-                    container.stop()
-                    container.remove()
-                    print(f"Container {container.name} killed")
-            else:
-                container.stop()
-                container.remove()
-                print(f"Container {container.name} killed")
+        for name in Provisioner(docker_client, workers=workers or PROVISION_WORKERS).teardown(prefix, graceful):
+            print(f"Container {name} killed")
 
     print("Killing available containers")
     nr_tries = 0
@@ -697,7 +808,14 @@ def kill_containers_with_prefix(docker_client, prefix: str = None) -> None:
 
 def arg_parse(hostname: str = None, port: int = None, topic=None, sub_clients: int = 1, containers: int = 5,
               sub_count: int = 1, qos: int = 0, username: str = None, password: str = None, sub_timeout: int = 60,
-              cacert=None, multiple_topics: str = None, description: str = None, json_config: str = None):
+              cacert=None, multiple_topics: str = None, description: str = None, json_config: str = None,
+              engine: str = None, workers: int = None, histogram_precision: int = None, log_sample: float = None,
+              log_format: str = None, ring_size: int = None, clock_samples: int = None, connect_rate: float = None,
+              ramp: str = None, ramp_step: int = None, scenario: str = None, offline_period: float = None,
+              protocol: str = None, tls_connections: int = None, msg_sizes: str = None, placement: str = None,
+              nodes: str = None, node_weights: str = None, pub_nodes: str = None, sub_nodes: str = None,
+              provision_workers: int = PROVISION_WORKERS, pool: bool = False, completion_timeout: float = None,
+              fail_fast: bool = False, barrier: bool = False):
     parser = argparse.ArgumentParser()
 
     parser.add_argument('-H', '--hostname', required=False, default=hostname)
@@ -734,6 +852,74 @@ def arg_parse(hostname: str = None, port: int = None, topic=None, sub_clients: i
 
     parser.add_argument('--json-config', type=str, default=json_config,
                         help='The config json file')
+    parser.add_argument('--engine', type=str, default=engine, choices=['process', 'asyncio', 'thread'],
+                        help='How the clients are run inside the containers: one process per client '
+                             '(process), multiplexed in event loops (asyncio) or as threads of worker '
+                             'processes (thread)')
+    parser.add_argument('--workers', type=int, default=workers,
+                        help='The number of worker processes per container for the asyncio and thread engines')
+    parser.add_argument('--provision-workers', dest='provision_workers', type=int, default=provision_workers,
+                        help='The containers created or removed at once. By default %d' % PROVISION_WORKERS)
+    parser.add_argument('--pool', action='store_true', default=pool,
+                        help='Keeps the client containers running after the run and dispatches the next runs '
+                             'to them instead of creating new containers. A run without --pool removes them')
+    parser.add_argument('--completion-timeout', dest='completion_timeout', type=float, default=completion_timeout,
+                        help='Seconds each container has to finish its run. By default its sub timeout and '
+                             'offline period plus %d' % COMPLETION_MARGIN)
+    parser.add_argument('--fail-fast', dest='fail_fast', action='store_true', default=fail_fast,
+                        help='Stops waiting for the containers as soon as one of them exits before finishing')
+    parser.add_argument('--barrier', action='store_true', default=barrier,
+                        help='Starts the publishers of every container at the same instant, once all the '
+                             'subscribers have subscribed and all the publishers are connected. The publisher '
+                             'containers are run with --barrier too, this host coordinates the start')
+    parser.add_argument('--histogram-precision', dest='histogram_precision', type=int, default=histogram_precision,
+                        choices=range(1, 6), help='The significant figures of the e2e delay histograms')
+    parser.add_argument('--log-sample', dest='log_sample', type=float, default=log_sample,
+                        help='The fraction of the received messages logged one per row, 0 keeps only the '
+                             'e2e delay histograms')
+    parser.add_argument('--log-format', dest='log_format', type=str, default=log_format, choices=['csv', 'columnar'],
+                        help='The format of the message logs written in the containers')
+    parser.add_argument('--ring-size', dest='ring_size', type=int, default=ring_size,
+                        help='The log rows buffered in shared memory by each subscriber process of the containers, '
+                             'rows arriving on a full buffer are dropped and counted')
+    parser.add_argument('--clock-samples', dest='clock_samples', type=int, default=clock_samples,
+                        help='The ping-pong exchanges of each container with the clock responder run on this host, '
+                             'before and after the measurements. 0 disables the clock synchronisation. By default '
+                             '%d' % CLOCK_SAMPLES)
+    parser.add_argument('--connect-rate', dest='connect_rate', type=float, default=connect_rate,
+                        help='The clients connecting per second in each container, to pace the connections '
+                             'instead of connecting all the clients at once')
+    parser.add_argument('--ramp', type=str, default=ramp, choices=['linear', 'stepped'],
+                        help='The profile of the connection ramp: one client at a time or groups of clients')
+    parser.add_argument('--ramp-step', dest='ramp_step', type=int, default=ramp_step,
+                        help='The clients connecting together in each step of the stepped ramp')
+    parser.add_argument('--scenario', type=str, default=scenario, choices=['steady', 'backlog'],
+                        help='backlog: the subscribers keep a persistent session, go offline once subscribed '
+                             'and drain the queued messages when they reconnect')
+    parser.add_argument('--offline-period', dest='offline_period', type=float, default=offline_period,
+                        help='Seconds the subscribers of the backlog scenario stay disconnected')
+    parser.add_argument('--protocol', type=str, default=protocol, choices=['3.1.1', '5'],
+                        help='The MQTT version of the clients in the containers, 5 to receive the headers '
+                             'published as user properties')
+    parser.add_argument('--tls-connections', dest='tls_connections', type=int, default=tls_connections,
+                        help='Full and resumed TLS handshakes measured by each container before its clients '
+                             'connect, needs --cacert')
+    parser.add_argument('--placement', type=str, default=placement, choices=Placement.ALL,
+                        help='How the clients are spread over the broker nodes: container (each container on its '
+                             'broker), round_robin, hash (consistent hashing of the client ids), weighted '
+                             '(--node-weights) or split (--pub-nodes and --sub-nodes)')
+    parser.add_argument('--nodes', type=str, default=nodes,
+                        help='The broker nodes of the placement, comma separated. By default the brokers of the '
+                             'containers')
+    parser.add_argument('--node-weights', dest='node_weights', type=str, default=node_weights,
+                        help='The capacity of each node of the weighted placement, comma separated integers')
+    parser.add_argument('--pub-nodes', dest='pub_nodes', type=str, default=pub_nodes,
+                        help='The nodes of the publishers of the split placement, comma separated')
+    parser.add_argument('--sub-nodes', dest='sub_nodes', type=str, default=sub_nodes,
+                        help='The nodes of the subscribers of the split placement, comma separated')
+    parser.add_argument('--msg-sizes', dest='msg_sizes', type=str, default=msg_sizes,
+                        help='The payload sizes swept by the publishers, the subscribers wait for --sub-count '
+                             'messages of each size')
 
     # parser.add_argument('-s', '--use-tls', action='store_true')
     # parser.add_argument('--insecure', action='store_true')
@@ -760,14 +946,30 @@ class Subscribers(multiprocessing.Process):
         return self.__ready_to_receive_msgs.value
 
     def run(self):
-        # kill the previous created containers
-        kill_containers_with_prefix(self.__docker_client, prefix='sub')
-
-        container_volumes = [self.__pwd + '/clients/container_python.py:/home/script.py']
+        # kill the previous created containers, the ones of the pool are reused
+        _pool = create_pool(self.__docker_client, self.__args, self.__pwd, create_container)
+        if _pool is None:
+            kill_containers_with_prefix(self.__docker_client, prefix='sub',
+                                        workers=getattr(self.__args, Keywords.PROVISION_WORKERS))
+        # The output of the previous runs of the pool containers is left out
+        _since = int(time.time())
+
+        container_volumes = get_client_volumes(self.__pwd)
+        # Answers the clock synchronisation of the containers until they have all finished
+        clock_responder = None
+        if getattr(self.__args, Keywords.CLOCK_SAMPLES) != 0:
+            clock_responder = start_clock_responder(self.__pwd, self.__args)
+            if clock_responder is not None and getattr(self.__args, Keywords.CLOCK_SAMPLES) is None:
+                # The containers only synchronise their clock when asked to, as they wait for the responder
+                setattr(self.__args, Keywords.CLOCK_SAMPLES, CLOCK_SAMPLES)
+        # Started before the containers, not to miss the first of them to be ready
+        barrier_coordinator = None
+        if getattr(self.__args, Keywords.BARRIER):
+            barrier_coordinator = start_barrier_coordinator(self.__pwd, self.__args)
         json_config = getattr(self.__args, 'json_config')
         # string or list
         if json_config:
-            self.__containers = create_containers_from_json(json_config, self.__docker_client)
+            self.__containers = create_containers_from_json(json_config, self.__docker_client, self.__args, _pool)
         else:
             nr_containers = getattr(self.__args, Keywords.CONTAINERS)
             topics_json_file = getattr(self.__args, Keywords.MULTIPLE_TOPICS)
@@ -779,13 +981,15 @@ class Subscribers(multiprocessing.Process):
                     del _args[Keywords.TOPICS]
                 container_volumes.append(os.path.abspath(topics_json_file) + ':' + destination_json_file)
 
+            _plan = placement_plan(self.__args, Role.SUB)
             print("Creating new containers")
-            for my_cont in range(nr_containers):
-                container_name = f"{SUB_PREFIX}_{my_cont}"
-                _cont = create_container(self.__docker_client, _args, volumes=container_volumes, name=container_name,
-                                         hostname=container_name)
-                print(f"Container {container_name} created")
-                self.__containers.append(_cont)
+            specs = [(f"{SUB_PREFIX}_{my_cont}", _args, container_volumes,
+                      container_placement(_plan, my_cont, getattr(self.__args, Keywords.SUBS)))
+                     for my_cont in range(nr_containers)]
+            self.__containers = provision_containers(self.__docker_client, self.__args, specs, create_container,
+                                                     container_environment, _pool,
+                                                     barrier=container_barrier(self.__args, nr_containers),
+                                                     clock_samples=getattr(self.__args, Keywords.CLOCK_SAMPLES))
 
         print('Starting containers')
         time.sleep(2)
@@ -800,33 +1004,39 @@ class Subscribers(multiprocessing.Process):
         # print('Now subs are ready to receive msgs')
         # print(self.ready_to_receive_msgs)
 
-        container_finished = [False] * len(self.__containers)
-        print('Analysing printed logs')
-        while True:
-            for ind, container in enumerate(self.__containers):
-                str_to_capture = f'{container.name} finished its operation'
-                process = subprocess.Popen(f'docker logs {container.name}', stdout=subprocess.PIPE, stderr=None,
-                                           shell=True, encoding="utf8")
-                # Launch the shell command:
-                output = process.communicate()[0]
-                if str_to_capture in output:
-                    print(f'Container {container.name} finished its work')
-                    container_finished[ind] = True
-            print('Status of containers')
-            print(container_finished)
-            if all(container_finished):
-                print('All containers have finished their work')
-                break
-            time.sleep(2)
+        print('Waiting for the containers to finish')
+        _timeout = getattr(self.__args, Keywords.COMPLETION_TIMEOUT)
+        if _pool is None:
+            _deadlines = {container.name: _timeout or container_deadline(container, Role.SUB)
+                          for container in self.__containers}
+            _watcher = CompletionWatcher(self.__containers, _deadlines)
+        else:
+            _deadlines = {container.name: _timeout or container_deadline(container, Role.SUB,
+                                                                         _pool.environment(container.name))
+                          for container in self.__containers}
+            _watcher = CompletionWatcher(self.__containers, _deadlines, marker=finished_marker(_pool.run_id),
+                                         failure_marker=failed_marker(_pool.run_id), since=_since)
+        _completions = _watcher.wait(fail_fast=getattr(self.__args, Keywords.FAIL_FAST))
+        _unfinished = [container.name for container in self.__containers
+                       if _completions.get(container.name, (None,))[0] != Completion.FINISHED]
+        if _unfinished:
+            print(f'Containers not finished, their results may be partial: {", ".join(_unfinished)}')
+        else:
+            print('All containers have finished their work')
+        if clock_responder is not None:
+            clock_responder.terminate()
+        if barrier_coordinator is not None:
+            barrier_coordinator.terminate()
 
         print('Collecting the results from containers')
         _date = datetime.datetime.now(tz=TIMEZONE).strftime('%m_%d_%H_%M') + '_'
-        _log_tar_file = collect_containers_logs(self.__containers, docker_src_file='/home/',
-                                                destination=self.__pwd + '/logs', dst_file_prefix=_date + '_' + 'star')
+        collect_containers_logs(self.__containers, docker_src_file='/home/', destination=self.__pwd + '/logs',
+                                dst_file_prefix=_date + '_' + 'star',
+                                workers=getattr(self.__args, Keywords.PROVISION_WORKERS))
 
         print('Printing containers log')
         for container in self.__containers:
-            _cont_output = container.logs()
+            _cont_output = container.logs(since=_since)
             print(_cont_output.decode("utf-8"))
 
         print('Printing containers stats')
@@ -834,13 +1044,9 @@ class Subscribers(multiprocessing.Process):
             print(container.stats(stream=False))
 
         print('Stopping and killing the containers')
-        kill_containers_with_prefix(self.__docker_client, SUB_PREFIX)
-
-        # final_tar = tarfile.open(_log_tar_file, 'a')
-        # _extra_file = os.path.join(os.getcwd(), 'local_publisher.py')
-        # print(_extra_file)
-        # final_tar.add('local_publisher.py')
-        # final_tar.close()
+        if _pool is None:
+            kill_containers_with_prefix(self.__docker_client, SUB_PREFIX,
+                                        workers=getattr(self.__args, Keywords.PROVISION_WORKERS))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,131 @@
+import functools
+import os
+import sys
+import uuid
+
+from pool import ContainerPool, POOL_ENTRYPOINT, POOL_LABEL
+from provisioning import Action, Provisioner, PROVISION_WORKERS
+
+# The placement plan is shared with the client script, mounted next to it in the containers
+_CLIENTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'clients')
+if _CLIENTS_PATH not in sys.path:
+    sys.path.append(_CLIENTS_PATH)
+from placement import Placement, PlacementPlan, Role, parse_nodes, parse_weights
+from barrier import BARRIER_TIMEOUT
+
+# Modules imported by the client script, mounted next to it in the container
+CLIENT_MODULES = ('async_engine.py', 'payload.py', 'scheduler.py', 'histogram.py', 'log_writer.py',
+                  'ring_buffer.py', 'clocksync.py', 'sequence.py', 'topic_tree.py',
+                  'shared.py', 'tlsbench.py', 'sweep.py', 'placement.py', 'thread_engine.py',
+                  'pool_agent.py', 'barrier.py')
+# Seconds given to a container on top of the timeouts of its clients to connect, synchronise its clock and
+# write its results
+COMPLETION_MARGIN = 120
+# The environment variables bounding the run of the clients of each role, with their default
+RUN_VARIABLES = {Role.PUB: (('CLIENT_PUBLISHERS_TIMEOUT', 60),),
+                 Role.SUB: (('CLIENT_SUBSCRIBERS_TIMEOUT', 60), ('CLIENT_OFFLINE_PERIOD', 0))}
+ROLE_NAMES = {Role.PUB: 'publishers', Role.SUB: 'subscribers'}
+
+
+class Keywords:
+    """The options read by the helpers, named as in local_publisher and local_subscriber"""
+    HOSTNAME = 'hostname'
+    PLACEMENT = 'placement'
+    NODES = 'nodes'
+    NODE_WEIGHTS = 'node_weights'
+    PUB_NODES = 'pub_nodes'
+    SUB_NODES = 'sub_nodes'
+    PROVISION_WORKERS = 'provision_workers'
+    POOL = 'pool'
+
+
+def get_client_volumes(pwd: str) -> list:
+    """The client script and the modules it imports, mounted in the container working directory"""
+    _volumes = [pwd + '/clients/container_python.py:/home/script.py']
+    for _module in CLIENT_MODULES:
+        _volumes.append(pwd + '/clients/' + _module + ':/home/' + _module)
+    return _volumes
+
+
+def placement_plan(args, role: str, sections: list = None) -> PlacementPlan:
+    """The placement of the clients on the nodes of the cluster, by default the brokers of the containers
+    :return: The plan, None to connect all the clients of a container to the broker of the container
+    """
+    _strategy = getattr(args, Keywords.PLACEMENT, None)
+    if not _strategy or _strategy == Placement.CONTAINER:
+        return None
+    _nodes = parse_nodes(getattr(args, Keywords.NODES)) or \
+        list(dict.fromkeys(str(_section.get(Keywords.HOSTNAME)) for _section in sections or [vars(args)]
+                           if _section.get(Keywords.HOSTNAME)))
+    print(f'Placement of the {ROLE_NAMES[role]}: {_strategy} on {", ".join(_nodes)}')
+    return PlacementPlan(_nodes, _strategy, weights=parse_weights(getattr(args, Keywords.NODE_WEIGHTS)),
+                         pub_nodes=parse_nodes(getattr(args, Keywords.PUB_NODES)),
+                         sub_nodes=parse_nodes(getattr(args, Keywords.SUB_NODES)))
+
+
+def create_provisioner(docker_client, args=None) -> Provisioner:
+    """The provisioner of the containers, running --provision-workers Docker calls at once"""
+    return Provisioner(docker_client, workers=getattr(args, Keywords.PROVISION_WORKERS, None) or PROVISION_WORKERS)
+
+
+def create_pool(docker_client, args, pwd: str, create_container) -> ContainerPool:
+    """The warm containers the run is dispatched to, None unless --pool
+    :param create_container: Runs a client container of the orchestrator, as create_container(docker_client,
+    args, **kwargs)
+    """
+    if not getattr(args, Keywords.POOL, False):
+        return None
+    _volumes = get_client_volumes(pwd)
+
+    def create_pool_container(name: str):
+        return create_container(docker_client, {}, volumes=_volumes, hostname=name, name=name,
+                                entrypoint=POOL_ENTRYPOINT, labels={POOL_LABEL: 'true'})
+
+    _pool = ContainerPool(docker_client, create_pool_container, uuid.uuid4().hex[:8], _volumes)
+    print(f'Dispatching run {_pool.run_id} to the container pool')
+    return _pool
+
+
+def provision_containers(docker_client, args, specs: list, create_container, container_environment,
+                         pool: ContainerPool = None, **options) -> list:
+    """Creates a container per spec, or dispatches the run to the containers of the pool
+    :param specs: The (name, args, volumes, placement) of each container
+    :param create_container: Runs a client container, as create_container(docker_client, args, **kwargs)
+    :param container_environment: The environment of a container, as container_environment(args, placement,
+    **options), for the containers of the pool
+    :param options: The options of the run given to all the containers, as the barrier
+    :return: The containers, in the order of the specs
+    """
+    _provisioner = create_provisioner(docker_client, args)
+    if pool is None:
+        containers, _ = _provisioner.create([(name, functools.partial(
+            create_container, docker_client, _args, volumes=volumes, network='pumba_net', hostname=name, name=name,
+            placement=placement, **options)) for name, _args, volumes, placement in specs])
+    else:
+        containers, _ = _provisioner.batch(Action.DISPATCH, [(name, functools.partial(
+            pool.run, name, container_environment(_args, placement, **options), volumes))
+            for name, _args, volumes, placement in specs])
+    for container in containers:
+        print(f"Container {container.name} {'running run ' + pool.run_id if pool else 'created'}")
+    return containers
+
+
+def container_deadline(container, role: str, environment: dict = None) -> float:
+    """Seconds a container has to finish its run: the timeouts of its clients, and for the subscribers the
+    offline period, of its environment plus COMPLETION_MARGIN
+    :param environment: The environment of the run, by default the one the container was created with
+    """
+    _environment = environment
+    if _environment is None:
+        _environment = dict(_variable.split('=', 1) for _variable in container.attrs['Config'].get('Env') or []
+                            if '=' in _variable)
+    _deadline = COMPLETION_MARGIN
+    if _environment.get('CLIENT_BARRIER'):
+        # The publishers wait at the barrier for the last container to be ready
+        _deadline += BARRIER_TIMEOUT
+    for _variable, _default in RUN_VARIABLES[role]:
+        try:
+            _deadline += float(_environment.get(_variable, _default))
+        except ValueError:
+            _deadline += _default
+    return _deadline
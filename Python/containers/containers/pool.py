@@ -0,0 +1,83 @@
+import io
+import json
+import os
+import tarfile
+import threading
+
+import docker
+
+# Label of the containers kept between the runs, any other container of the same name is recreated
+POOL_LABEL = 'mqtt-benchmark.pool'
+# The agent imports the client script once and forks it for every run
+POOL_ENTRYPOINT = 'python3 pool_agent.py serve'
+
+
+def copy_file(container, host_path: str, container_path: str):
+    """Copies a file of the host into a running container, in place of a volume bound at creation"""
+    _archive = io.BytesIO()
+    with tarfile.open(fileobj=_archive, mode='w') as tar:
+        tar.add(host_path, arcname=os.path.basename(container_path))
+    container.put_archive(os.path.dirname(container_path), _archive.getvalue())
+
+
+class ContainerPool:
+    """Client containers kept running between the benchmark runs.
+
+    A run is dispatched to the agent of each container through exec_run, the agent forks the already
+    imported client script with the environment of the run, so a sweep of short runs pays the creation of
+    the containers and the imports of the script only once. The files bound as volumes to a new container,
+    such as the multiple topics file, are copied into the pool containers at each run.
+    """
+
+    def __init__(self, docker_client, create, run_id: str, base_volumes: list):
+        """
+        :param create: Creates and starts a pool container with POOL_ENTRYPOINT, given its name
+        :param base_volumes: The volumes bound when the pool container is created, the client modules
+        """
+        self.__docker_client = docker_client
+        self.__create = create
+        self.__run_id = run_id
+        self.__base_volumes = set(base_volumes)
+        self.__environments = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def run_id(self):
+        return self.__run_id
+
+    def environment(self, name: str) -> dict:
+        """The environment of the current run of a container"""
+        return self.__environments[name]
+
+    def acquire(self, name: str):
+        """The running pool container of the name, created if missing"""
+        try:
+            container = self.__docker_client.containers.get(name)
+            if container.status == 'running' and POOL_LABEL in container.labels:
+                print(f'Reusing container {name}')
+                return container
+            container.remove(force=True)
+        except docker.errors.NotFound:
+            pass
+        return self.__create(name)
+
+    def run(self, name: str, environment: dict, volumes: list = None):
+        """Dispatches the run to the container of the name
+        :param environment: The environment variables a new container would have been given
+        :param volumes: The volumes a new container would have been given
+        :return: The container
+        """
+        container = self.acquire(name)
+        for volume in volumes or []:
+            if volume not in self.__base_volumes:
+                _host_path, _container_path = volume.rsplit(':', 1)
+                copy_file(container, _host_path, _container_path)
+        # As docker does for a new container, the unset variables are left out
+        _environment = {key: str(value) for key, value in environment.items() if value is not None}
+        _code, _output = container.exec_run(['python3', 'pool_agent.py', 'dispatch', '--run-id', self.__run_id,
+                                             json.dumps(_environment)], workdir='/home')
+        if _code != 0:
+            raise RuntimeError(f'The run {self.__run_id} was not dispatched: {_output.decode("utf-8").strip()}')
+        with self.__lock:
+            self.__environments[name] = _environment
+        return container
@@ -0,0 +1,128 @@
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import Exceptions
+
+# Docker API calls in flight at once, the daemon serialises part of them anyway
+PROVISION_WORKERS = 16
+# Seconds given to a container to exit on a graceful stop before Docker kills it
+STOP_TIMEOUT = 10
+
+
+class Action:
+    CREATE = 'create'
+    START = 'start'
+    STOP = 'stop'
+    # Killed and removed in a single call
+    KILL = 'kill'
+    REMOVE = 'remove'
+    # Results copied out of the container
+    COLLECT = 'collect'
+    # A run handed to a warm container
+    DISPATCH = 'dispatch'
+    ALL = (CREATE, START, STOP, KILL, REMOVE, COLLECT, DISPATCH)
+
+
+def _timed(action: str, name: str, call) -> tuple:
+    """Runs a Docker call of a container
+    :return: The result of the call (None if it failed) and the timing of the container
+    """
+    _result = None
+    _error = None
+    _start = time.monotonic()
+    try:
+        _result = call()
+    except Exception as err:
+        _error = str(err)
+    return _result, {'name': name, 'action': action, 'seconds': time.monotonic() - _start, 'error': _error}
+
+
+def _percentile(values: list, percent: float) -> float:
+    _values = sorted(values)
+    return _values[min(len(_values) - 1, int(len(_values) * percent / 100))]
+
+
+def print_batch(action: str, timings: list, duration: float):
+    """The wall time of a batch and the time of its containers, the failed ones named"""
+    _seconds = [timing['seconds'] for timing in timings]
+    _failed = [timing for timing in timings if timing['error'] is not None]
+    print(f'{action}: {len(timings)} containers in {duration:.3f} s, per container '
+          f'p50={_percentile(_seconds, 50):.3f} max={max(_seconds):.3f} s, {len(_failed)} failed')
+    for timing in _failed:
+        print(f'Could not {action} container {timing["name"]}: {timing["error"]}')
+
+
+class Provisioner:
+    """Runs the Docker calls of many containers at once on a bounded thread pool, instead of one container
+    after the other, and keeps the time taken by each container. The Docker client is only needed to list
+    the containers to tear down"""
+
+    def __init__(self, docker_client=None, workers: int = PROVISION_WORKERS, stop_timeout: int = STOP_TIMEOUT):
+        self.__docker_client = docker_client
+        self.__workers = max(1, workers)
+        self.__stop_timeout = stop_timeout
+        self.__timings = []
+
+    @property
+    def timings(self):
+        """The timings of all the batches run so far"""
+        return self.__timings
+
+    def batch(self, action: str, jobs: list, strict: bool = True) -> tuple:
+        """Runs a call per container on the pool
+        :param jobs: The (container name, callable) pairs
+        :param strict: Raises a ProvisioningError at the end of the batch if any call failed
+        :return: The results of the calls in the order of the jobs, None for the failed ones, and the
+        timing of each container
+        """
+        if not jobs:
+            return [], []
+        _start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=min(self.__workers, len(jobs)),
+                                thread_name_prefix=f'provision-{action}') as pool:
+            _outcomes = list(pool.map(lambda job: _timed(action, *job), jobs))
+        _timings = [timing for _, timing in _outcomes]
+        self.__timings.extend(_timings)
+        print_batch(action, _timings, time.monotonic() - _start)
+        _failed = [timing['name'] for timing in _timings if timing['error'] is not None]
+        if strict and _failed:
+            raise Exceptions.ProvisioningError(action, _failed)
+        return [result for result, _ in _outcomes], _timings
+
+    def create(self, jobs: list) -> tuple:
+        """Creates and runs the containers
+        :param jobs: The (container name, callable returning the running container) pairs
+        """
+        return self.batch(Action.CREATE, jobs)
+
+    def start(self, containers: list) -> tuple:
+        return self.batch(Action.START, [(container.name, container.start) for container in containers])
+
+    def stop(self, containers: list) -> tuple:
+        return self.batch(Action.STOP, [(container.name, functools.partial(container.stop,
+                                                                           timeout=self.__stop_timeout))
+                                        for container in containers], strict=False)
+
+    def kill(self, containers: list) -> tuple:
+        return self.batch(Action.KILL, [(container.name, functools.partial(container.remove, force=True))
+                                        for container in containers], strict=False)
+
+    def remove(self, containers: list) -> tuple:
+        return self.batch(Action.REMOVE, [(container.name, container.remove) for container in containers],
+                          strict=False)
+
+    def teardown(self, prefix: str = None, graceful: bool = False) -> list:
+        """Removes the containers whose name contains the prefix, all of them without a prefix
+        :param graceful: Stops the containers with STOP_TIMEOUT before removing them, otherwise they are
+        killed at once, e.g. when their results are already collected
+        :return: The names of the removed containers
+        """
+        _containers = [container for container in self.__docker_client.containers.list(all=True)
+                       if prefix is None or prefix in container.name]
+        if graceful:
+            self.stop(_containers)
+            _, _timings = self.remove(_containers)
+        else:
+            _, _timings = self.kill(_containers)
+        return [timing['name'] for timing in _timings if timing['error'] is None]
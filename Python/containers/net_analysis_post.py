@@ -25,6 +25,7 @@ import numpy
 import paho.mqtt.client as mqtt
 
 from .subsidiary_code import MultipleTopics
+from .containers.clients.payload import decode_header, host_name
 
 BASE_TOPIC = 'test'
 
@@ -35,6 +36,13 @@ LOG_QUEUE = multiprocessing.Queue()
 nr_msg = 0
 
 
+def ns_to_datetime(value: int) -> datetime.datetime:
+    """Naive UTC datetime of the ns since the epoch of a header, None for an unset timestamp"""
+    if not value:
+        return None
+    return datetime.datetime(1970, 1, 1) + datetime.timedelta(microseconds=value // 1000)
+
+
 # Class Timer might be used to control the execution time of the sub and pub
 # class Timer(multiprocessing.Process):
 #     def __init__(self, interval, function, args=[], kwargs={}):
@@ -150,9 +158,23 @@ class Sub(multiprocessing.Process):
     def parse_msg(self, msg):
         # print('Parsing the arrived message')
         if isinstance(msg, mqtt.MQTTMessage):
-            # String format of the arrived message
-            msg = msg.payload.decode("utf-8")
-        fields = msg.split("_", 6)
+            msg = msg.payload
+        if isinstance(msg, str):
+            msg = msg.encode('utf-8')
+        # The binary or text header of the container clients, timestamps in ns since the epoch
+        _header = decode_header(msg)
+        if _header is not None:
+            _qos, _host, _pub_id, _seq, _con_init, _con_accomplish, _publish, _container = _header
+            return {
+                'hostname': host_name(_host),
+                'pub_id': 'pub' + str(_pub_id),
+                'pub_con_init': ns_to_datetime(_con_init),
+                'pub_con_accomplish': ns_to_datetime(_con_accomplish),
+                'publish_timestamp': ns_to_datetime(_publish),
+                'pub_qos': str(_qos)
+            }
+        # The header of the publishers of this script, with the datetimes as text
+        fields = msg.decode('utf-8').split("_", 6)
         _dict = {
             'hostname': fields[0],
             'pub_id': fields[1],
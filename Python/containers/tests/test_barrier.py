@@ -0,0 +1,60 @@
+import json
+import types
+
+import pytest
+
+from barrier import BarrierCoordinator, BarrierRole, barrier_summary, parse_barrier
+
+
+def ready_message(container: str, ready: dict, clients: dict, expected: dict):
+    return types.SimpleNamespace(payload=json.dumps({'container': container, 'ready': ready, 'clients': clients,
+                                                     'expected': expected, 'ready_ns': 0}).encode())
+
+
+class Coordinator(BarrierCoordinator):
+    """Coordinator without brokers, the releases are counted instead of published"""
+
+    def __init__(self, roles):
+        super().__init__([], roles=roles)
+        self.releases = 0
+
+    def _release(self):
+        self.releases += 1
+
+
+def test_parse_barrier():
+    assert parse_barrier('{"sub": 2, "pub": "3"}') == {BarrierRole.SUB: 2, BarrierRole.PUB: 3}
+    assert parse_barrier('') is None
+    for _spec in ('[1]', '{"broker": 1}'):
+        with pytest.raises(ValueError):
+            parse_barrier(_spec)
+
+
+def test_released_once_every_container_is_ready():
+    _coordinator = Coordinator([BarrierRole.PUB])
+    _coordinator.on_message(None, None, ready_message('c0', {'pub': 2}, {'pub': 2}, {'pub': 2}))
+    assert _coordinator.releases == 0
+    # A second report of the same container is not counted again
+    _coordinator.on_message(None, None, ready_message('c0', {'pub': 2}, {'pub': 2}, {'pub': 2}))
+    assert _coordinator.releases == 0
+    _coordinator.on_message(None, None, ready_message('c1', {'pub': 3}, {'pub': 3}, {'pub': 2}))
+    assert _coordinator.releases == 1
+
+
+def test_partially_ready_container_does_not_count():
+    _coordinator = Coordinator([BarrierRole.SUB, BarrierRole.PUB])
+    _coordinator.on_message(None, None, ready_message('c0', {'sub': 1, 'pub': 1}, {'sub': 1, 'pub': 1},
+                                                      {'sub': 2, 'pub': 2}))
+    # Reported at its deadline with one of its two subscribers not ready
+    _coordinator.on_message(None, None, ready_message('c1', {'sub': 1, 'pub': 1}, {'sub': 2, 'pub': 1},
+                                                      {'sub': 2, 'pub': 2}))
+    assert _coordinator.releases == 0
+
+
+def test_barrier_summary():
+    _barriers = [{'start_ns': 10, 'timed_out': False, 'skews': [{'client_id': 'pub0', 'skew_ns': 5}]},
+                 {'start_ns': 10, 'timed_out': True, 'skews': [{'client_id': 'pub0', 'skew_ns': 2},
+                                                                {'client_id': 'pub1', 'skew_ns': 9}]}]
+    _summary = barrier_summary(_barriers)
+    assert (_summary['publishers'], _summary['timed_out'], _summary['spread_ns']) == (3, 1, 7)
+    assert _summary['start_instants'] == 1
@@ -0,0 +1,83 @@
+import pytest
+
+from histogram import LatencyHistogram, format_summary
+
+
+def test_small_values_are_exact():
+    _histogram = LatencyHistogram(3)
+    for _value in range(1000):
+        _histogram.record(_value)
+    assert _histogram.count == 1000
+    assert _histogram.min == 0
+    assert _histogram.max == 999
+    assert _histogram.percentile(50) == 499
+    assert _histogram.percentile(100) == 999
+
+
+@pytest.mark.parametrize('significant_figures', [1, 2, 3, 4])
+def test_percentiles_keep_the_precision(significant_figures):
+    _histogram = LatencyHistogram(significant_figures)
+    _values = [int(1.37 ** _exponent) for _exponent in range(10, 60)]
+    for _value in _values:
+        _histogram.record(_value)
+    for _ind, _value in enumerate(sorted(_values)):
+        _percentile = 100 * (_ind + 0.5) / len(_values)
+        assert _value <= _histogram.percentile(_percentile) <= _value * (1 + 10 ** -significant_figures)
+
+
+def test_negative_values_are_clamped():
+    _histogram = LatencyHistogram()
+    _histogram.record(-5)
+    assert _histogram.min == 0
+    assert _histogram.total == 0
+
+
+def test_merge_adds_the_counts_and_bounds():
+    _first = LatencyHistogram()
+    _second = LatencyHistogram()
+    for _value in (10, 20, 30):
+        _first.record(_value)
+    for _value in (5, 1_000_000):
+        _second.record(_value, count=2)
+    _first.merge(_second)
+    assert _first.count == 7
+    assert _first.total == 60 + 2 * 5 + 2 * 1_000_000
+    assert _first.min == 5
+    assert _first.max == 1_000_000
+    assert _first.percentile(100) == 1_000_000
+
+
+def test_merge_of_an_empty_histogram_keeps_the_bounds():
+    _histogram = LatencyHistogram()
+    _histogram.record(42)
+    _histogram.merge(LatencyHistogram())
+    assert (_histogram.count, _histogram.min, _histogram.max) == (1, 42, 42)
+
+
+def test_merge_rejects_another_precision():
+    with pytest.raises(ValueError):
+        LatencyHistogram(2).merge(LatencyHistogram(3))
+
+
+def test_precision_is_bounded():
+    with pytest.raises(ValueError):
+        LatencyHistogram(0)
+    with pytest.raises(ValueError):
+        LatencyHistogram(6)
+
+
+def test_from_dict_restores_to_dict():
+    _histogram = LatencyHistogram(2)
+    for _value in (1, 150, 12_345, 9_876_543):
+        _histogram.record(_value)
+    _copy = LatencyHistogram.from_dict(_histogram.to_dict())
+    assert _copy.significant_figures == 2
+    assert _copy.buckets == _histogram.buckets
+    assert _copy.summary() == _histogram.summary()
+
+
+def test_empty_summary():
+    _histogram = LatencyHistogram()
+    assert _histogram.percentile(99) == 0
+    assert _histogram.summary()['max'] == 0
+    assert format_summary('e2e', _histogram).startswith('e2e: count=0 ')
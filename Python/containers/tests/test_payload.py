@@ -0,0 +1,83 @@
+import datetime
+
+import pytest
+
+from payload import (HEADER, HEADER_MAGIC, HEADER_SIZE, HEADER_VERSION, PayloadBuffer, encode_text_header,
+                     decode_header, encode_user_properties, decode_user_properties, host_id, host_name, get_pool)
+from ..net_analysis_post import Sub
+
+# qos, host id, publisher id, sequence, connect init, connack, publish timestamp, publisher container id
+HEADER_FIELDS = (1, host_id('172.17.0.3'), 7, 42, 1600000000000000000, 1600000000001000000, 1600000000002000000,
+                 host_id('172.17.0.2'))
+
+
+def test_binary_round_trip():
+    _buffer = PayloadBuffer(get_pool(HEADER_SIZE + 100, seed=1))
+    _payload = _buffer.pack(*HEADER_FIELDS)
+    assert len(_payload) == HEADER_SIZE + 100
+    assert decode_header(_payload) == HEADER_FIELDS
+
+
+def test_binary_header_longer_than_the_message():
+    _buffer = PayloadBuffer(get_pool(10, seed=1))
+    assert decode_header(_buffer.pack(*HEADER_FIELDS)) == HEADER_FIELDS
+
+
+@pytest.mark.parametrize('magic, version', [(HEADER_MAGIC + 1, HEADER_VERSION), (HEADER_MAGIC, HEADER_VERSION + 1)])
+def test_binary_unknown_magic_or_version(magic, version):
+    assert decode_header(HEADER.pack(magic, version, *HEADER_FIELDS)) is None
+
+
+def test_text_round_trip():
+    _buffer = PayloadBuffer(get_pool(200, seed=1))
+    _payload = _buffer.build(encode_text_header(*HEADER_FIELDS))
+    assert _payload.startswith(b'1_172.17.0.3_7_42_')
+    assert decode_header(_payload) == HEADER_FIELDS
+
+
+@pytest.mark.parametrize('hostname', ['broker', 'broker-1.cluster.local', 'mqtt_broker_1', 'node_1', '10_0'])
+def test_text_host_names(hostname):
+    _fields = (0, host_id(hostname)) + HEADER_FIELDS[2:]
+    _payload = PayloadBuffer(get_pool(200, seed=1)).build(encode_text_header(*_fields))
+    assert decode_header(_payload) == _fields
+    assert host_name(decode_header(_payload)[1]) == hostname
+
+
+def test_text_header_only():
+    assert decode_header(encode_text_header(*HEADER_FIELDS)) == HEADER_FIELDS
+
+
+@pytest.mark.parametrize('payload', [b'', b'abcdef', b'1_172.17.0.3_7_', b'x_172.17.0.3_7_42_1_2_3_h_',
+                                     bytes([HEADER_MAGIC]) * 4])
+def test_not_a_header(payload):
+    assert decode_header(payload) is None
+
+
+def test_user_properties_round_trip():
+    _properties = encode_user_properties(*HEADER_FIELDS)
+    assert all(isinstance(_name, str) and isinstance(_value, str) for _name, _value in _properties)
+    assert decode_user_properties(_properties) == HEADER_FIELDS
+
+
+def test_user_properties_without_header():
+    assert decode_user_properties([('app', 'value')]) is None
+    assert decode_user_properties(encode_user_properties(*HEADER_FIELDS)[:-1]) is None
+
+
+@pytest.mark.parametrize('header', [encode_text_header(*HEADER_FIELDS), HEADER.pack(HEADER_MAGIC, HEADER_VERSION,
+                                                                                       *HEADER_FIELDS)])
+def test_net_analysis_parse(header):
+    _parsed = Sub('127.0.0.1').parse_msg(header + b'abcdef')
+    assert _parsed == {'hostname': '172.17.0.3', 'pub_id': 'pub7',
+                       'pub_con_init': datetime.datetime(2020, 9, 13, 12, 26, 40),
+                       'pub_con_accomplish': datetime.datetime(2020, 9, 13, 12, 26, 40, 1000),
+                       'publish_timestamp': datetime.datetime(2020, 9, 13, 12, 26, 40, 2000), 'pub_qos': '1'}
+
+
+def test_net_analysis_parse_own_header():
+    _parsed = Sub('127.0.0.1').parse_msg('sub-host_pub3_2020-09-13 12:26:40.000000_2020-09-13 12:26:40.001000_'
+                                         '2020-09-13 12:26:40.002000_2_abcdef')
+    assert _parsed['hostname'] == 'sub-host'
+    assert _parsed['pub_id'] == 'pub3'
+    assert _parsed['publish_timestamp'] == datetime.datetime(2020, 9, 13, 12, 26, 40, 2000)
+    assert _parsed['pub_qos'] == '2'
@@ -0,0 +1,65 @@
+import collections
+
+import pytest
+
+from placement import Placement, PlacementPlan, Role, node_loads, parse_nodes, parse_weights
+
+NODES = ['n0', 'n1', 'n2']
+
+
+def test_parse():
+    assert parse_nodes(' a, b ,,c') == ['a', 'b', 'c']
+    assert parse_nodes('') is None
+    assert parse_weights('1,2') == [1, 2]
+    with pytest.raises(ValueError):
+        parse_weights('1,x')
+
+
+def test_round_robin_continues_across_the_containers():
+    _plan = PlacementPlan(NODES, Placement.ROUND_ROBIN)
+    assert _plan.container_plan(Role.PUB, 0, 2) == ['n0', 'n1']
+    assert _plan.container_plan(Role.PUB, 1, 2) == ['n2', 'n0']
+
+
+def test_round_robin_continues_after_containers_of_other_sizes():
+    _plan = PlacementPlan(NODES, Placement.ROUND_ROBIN)
+    # Containers of 1, 3 and 2 clients
+    _nodes = _plan.container_plan(Role.SUB, 0, 1, 0) + _plan.container_plan(Role.SUB, 1, 3, 1) + \
+        _plan.container_plan(Role.SUB, 2, 2, 4)
+    assert _nodes == ['n0', 'n1', 'n2', 'n0', 'n1', 'n2']
+
+
+def test_container_strategy_keeps_the_container_broker():
+    _plan = PlacementPlan(NODES, Placement.CONTAINER)
+    assert _plan.container_plan(Role.SUB, 3, 4) == [None] * 4
+
+
+def test_weighted_follows_the_weights():
+    _plan = PlacementPlan(NODES, Placement.WEIGHTED, weights=[1, 2, 3])
+    _counts = collections.Counter(_plan.container_plan(Role.PUB, 0, 60))
+    assert _counts == {'n0': 10, 'n1': 20, 'n2': 30}
+
+
+def test_split_uses_the_role_nodes():
+    _plan = PlacementPlan(NODES, Placement.SPLIT, pub_nodes=['n0'], sub_nodes=['n1', 'n2'])
+    assert _plan.container_plan(Role.PUB, 0, 3) == ['n0'] * 3
+    assert _plan.container_plan(Role.SUB, 0, 3) == ['n1', 'n2', 'n1']
+
+
+def test_hash_only_moves_the_clients_of_a_removed_node():
+    _before = PlacementPlan(NODES, Placement.HASH).container_plan(Role.SUB, 0, 200)
+    _after = PlacementPlan(NODES[:2], Placement.HASH).container_plan(Role.SUB, 0, 200)
+    assert set(_before) == set(NODES)
+    assert all(_old == _new for _old, _new in zip(_before, _after) if _old != 'n2')
+
+
+def test_plan_loads():
+    _placement = PlacementPlan(NODES[:2]).plan(containers=2, pub_clients=3, sub_clients=1)
+    assert node_loads(_placement) == {'n0': {Role.PUB: 3, Role.SUB: 1}, 'n1': {Role.PUB: 3, Role.SUB: 1}}
+
+
+@pytest.mark.parametrize('args, kwargs', [((NODES, 'random'), {}), (([],), {}),
+                                          ((NODES, Placement.WEIGHTED), {'weights': [1, 0, 1]})])
+def test_invalid_plans(args, kwargs):
+    with pytest.raises(ValueError):
+        PlacementPlan(*args, **kwargs)
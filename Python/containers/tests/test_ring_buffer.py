@@ -0,0 +1,50 @@
+import numpy
+import pytest
+
+from ring_buffer import RingBuffer
+
+RECORD = numpy.dtype([('seq', '<i8'), ('latency', '<f8')])
+
+
+def test_records_are_read_in_order():
+    _ring = RingBuffer(RECORD, 4)
+    for _seq in range(3):
+        assert _ring.put((_seq, _seq / 10))
+    assert _ring.pending == 3
+    _records = _ring.read()
+    assert list(_records['seq']) == [0, 1, 2]
+    assert _ring.pending == 0
+    assert len(_ring.read()) == 0
+
+
+def test_full_ring_drops():
+    _ring = RingBuffer(RECORD, 2)
+    assert _ring.put((0, 0.0))
+    assert _ring.put((1, 0.0))
+    assert not _ring.put((2, 0.0))
+    assert _ring.dropped == 1
+    assert list(_ring.read()['seq']) == [0, 1]
+
+
+def test_read_wraps_around():
+    _ring = RingBuffer(RECORD, 4)
+    for _seq in range(3):
+        _ring.put((_seq, 0.0))
+    _ring.read(max_records=2)
+    for _seq in range(3, 6):
+        _ring.put((_seq, 0.0))
+    assert list(_ring.read()['seq']) == [2, 3, 4, 5]
+
+
+def test_read_is_a_copy():
+    _ring = RingBuffer(RECORD, 2)
+    _ring.put((1, 0.0))
+    _records = _ring.read()
+    _ring.put((2, 0.0))
+    _ring.put((3, 0.0))
+    assert list(_records['seq']) == [1]
+
+
+def test_capacity_is_positive():
+    with pytest.raises(ValueError):
+        RingBuffer(RECORD, 0)
@@ -0,0 +1,85 @@
+import pytest
+
+from scheduler import ArrivalProcess, ConnectRamp, RampProfile, RateScheduler
+
+
+def test_constant_rate_does_not_drift():
+    _scheduler = RateScheduler(100)
+    _scheduler.start(now=10.0)
+    assert _scheduler.next_send_time() == 10.0
+    # Every publish is late, the schedule stays anchored at the start
+    for _ind in range(50):
+        _scheduler.mark_sent(now=_scheduler.next_send_time() + 0.005)
+    assert _scheduler.next_send_time() == pytest.approx(10.5)
+    assert _scheduler.max_lag == pytest.approx(0.005)
+    assert _scheduler.sent == 50
+
+
+def test_delay():
+    _scheduler = RateScheduler(10)
+    _scheduler.start(now=0.0)
+    _scheduler.mark_sent(now=0.0)
+    assert _scheduler.delay(now=0.04) == pytest.approx(0.06)
+    assert _scheduler.delay(now=0.5) == 0.0
+
+
+def test_achieved_rate():
+    _scheduler = RateScheduler(20)
+    _scheduler.start(now=0.0)
+    assert _scheduler.achieved_rate() == 0.0
+    for _ind in range(21):
+        _scheduler.mark_sent(now=_scheduler.next_send_time())
+    assert _scheduler.achieved_rate() == pytest.approx(20)
+    assert _scheduler.summary('pub-0')['requested_rate'] == 20
+
+
+def test_poisson_rate_on_average():
+    _scheduler = RateScheduler(1000, ArrivalProcess.POISSON, seed=1)
+    _scheduler.start(now=0.0)
+    for _ind in range(20000):
+        _scheduler.mark_sent(now=_scheduler.next_send_time())
+    assert _scheduler.next_send_time() == pytest.approx(20, rel=0.05)
+
+
+def test_on_off_skips_the_off_periods():
+    # 1 s on, 1 s off at an average of 10 msg/s: 20 msg/s during the bursts
+    _scheduler = RateScheduler(10, ArrivalProcess.ON_OFF, burst_on=1.0, burst_off=1.0)
+    _scheduler.start(now=0.0)
+    _times = []
+    for _ind in range(40):
+        _times.append(_scheduler.next_send_time())
+        _scheduler.mark_sent(now=_times[-1])
+    assert all(_time < 1.0 or _time >= 2.0 for _time in _times)
+    assert _times[20] == pytest.approx(2.0)
+    assert _scheduler.next_send_time() == pytest.approx(4.0)
+
+
+@pytest.mark.parametrize('kwargs', [{'rate': 0}, {'rate': 1, 'arrival': 'bursty'},
+                                    {'rate': 1, 'arrival': ArrivalProcess.ON_OFF, 'burst_on': 0}])
+def test_invalid_schedules(kwargs):
+    with pytest.raises(ValueError):
+        RateScheduler(**kwargs)
+
+
+def test_linear_ramp():
+    _ramp = ConnectRamp(50)
+    assert _ramp.offset(0) == 0
+    assert _ramp.offset(10) == pytest.approx(0.2)
+    assert _ramp.duration(101) == pytest.approx(2.0)
+    assert _ramp.duration(0) == 0.0
+
+
+def test_stepped_ramp():
+    _ramp = ConnectRamp(10, RampProfile.STEPPED, step=5)
+    assert _ramp.connect_times(11, start=100.0) == pytest.approx([100.0] * 5 + [100.5] * 5 + [101.0])
+
+
+def test_step_is_ignored_by_the_linear_ramp():
+    assert ConnectRamp(10, step=5).step == 1
+
+
+@pytest.mark.parametrize('kwargs', [{'rate': 0}, {'rate': 1, 'profile': 'burst'},
+                                    {'rate': 1, 'profile': RampProfile.STEPPED, 'step': 0}])
+def test_invalid_ramps(kwargs):
+    with pytest.raises(ValueError):
+        ConnectRamp(**kwargs)
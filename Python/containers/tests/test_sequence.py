@@ -0,0 +1,102 @@
+import pytest
+
+from sequence import SequenceWindow, SequenceTracker, pair_counts, loss_ratio
+
+
+def test_in_order():
+    _window = SequenceWindow(64)
+    for _seq in range(10):
+        _window.record(_seq)
+    assert _window.summary() == {'received': 10, 'lost': 0, 'duplicates': 0, 'reordered': 0, 'late': 0,
+                                 'highest': 9}
+
+
+def test_starts_at_the_first_number_received():
+    _window = SequenceWindow(64)
+    for _seq in range(100, 105):
+        _window.record(_seq)
+    assert _window.lost() == 0
+
+
+def test_gaps_are_lost():
+    _window = SequenceWindow(64)
+    for _seq in (0, 1, 4, 5, 9):
+        _window.record(_seq)
+    assert _window.lost() == 5
+    assert _window.reordered == 0
+
+
+def test_duplicates():
+    _window = SequenceWindow(64)
+    for _seq in (0, 1, 1, 2, 0):
+        _window.record(_seq)
+    assert _window.received == 3
+    assert _window.duplicates == 2
+    assert _window.lost() == 0
+
+
+def test_reordered_numbers_are_not_lost():
+    _window = SequenceWindow(64)
+    for _seq in (0, 2, 1, 4, 3):
+        _window.record(_seq)
+    assert _window.reordered == 2
+    assert _window.lost() == 0
+    assert _window.highest == 4
+
+
+def test_sliding_window_counts_the_numbers_left_behind():
+    _window = SequenceWindow(8)
+    for _seq in (0, 2, 20):
+        _window.record(_seq)
+    # 1 and 3..19 never arrived
+    assert _window.lost() == 18
+    assert _window.received == 3
+
+
+def test_numbers_behind_the_window_are_late():
+    _window = SequenceWindow(8)
+    for _seq in (0, 20, 1):
+        _window.record(_seq)
+    assert _window.late == 1
+    assert _window.received == 2
+
+
+def test_window_size_is_a_multiple_of_8():
+    with pytest.raises(ValueError):
+        SequenceWindow(12)
+
+
+def test_pair_counts_sum_the_publishers_of_a_host():
+    _tracker = SequenceTracker(64)
+    for _seq in (0, 2):
+        _tracker.record(0, 1, 0, 't', _seq)
+    for _seq in (0, 1):
+        _tracker.record(0, 1, 1, 't', _seq)
+    _pairs = pair_counts([(7, _tracker.to_list())])
+    assert _pairs[(1, 7)]['received'] == 4
+    assert _pairs[(1, 7)]['lost'] == 1
+    assert loss_ratio(_pairs[(1, 7)]) == pytest.approx(0.2)
+
+
+def test_subscriber_of_some_topics_of_a_publisher():
+    # The publisher cycles through its cluster topic and the common one, numbering each topic on its own
+    _published = {}
+    _messages = []
+    for _ind in range(10):
+        _topic = ('cluster1', 'all')[_ind % 2]
+        _published[_topic] = _published.get(_topic, 0) + 1
+        _messages.append((_topic, _published[_topic]))
+    # A subscriber of another cluster only shares the common topic
+    _tracker = SequenceTracker(64)
+    for _topic, _seq in _messages:
+        if _topic == 'all':
+            _tracker.record(0, 1, 0, _topic, _seq)
+    # A subscriber of both topics tracks each of them
+    _both = SequenceTracker(64)
+    for _topic, _seq in _messages:
+        _both.record(0, 1, 0, _topic, _seq)
+    assert pair_counts([(7, _tracker.to_list())])[(1, 7)] == {'received': 5, 'lost': 0, 'duplicates': 0,
+                                                             'reordered': 0, 'late': 0}
+    assert pair_counts([(8, _both.to_list())])[(1, 8)] == {'received': 10, 'lost': 0, 'duplicates': 0,
+                                                          'reordered': 0, 'late': 0}
+    assert {_publisher['topic'] for _publisher in _both.to_list()} == {'cluster1', 'all'}
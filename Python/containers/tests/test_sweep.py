@@ -0,0 +1,40 @@
+import pytest
+
+from sweep import SizeStats, parse_sizes, size_class
+
+
+def test_list_of_sizes():
+    assert parse_sizes('64, 256,1024') == [64, 256, 1024]
+
+
+def test_geometric_range_includes_the_stop():
+    assert parse_sizes('64:65536:4') == [64, 256, 1024, 4096, 16384, 65536]
+    assert parse_sizes('10:100:3') == [10, 30, 90]
+
+
+def test_fractional_factor_does_not_repeat_sizes():
+    assert parse_sizes('1:4:1.1') == [1, 2, 3]
+
+
+@pytest.mark.parametrize('spec', ['', '64,big', '-1', '64:16:2', '1:10:1', '1:10'])
+def test_invalid_sizes(spec):
+    with pytest.raises(ValueError):
+        parse_sizes(spec)
+
+
+def test_size_class():
+    assert size_class(10, [64, 256]) == 64
+    assert size_class(64, [64, 256]) == 64
+    assert size_class(65, [64, 256]) == 256
+    assert size_class(1000, [64, 256]) == 256
+
+
+def test_size_stats_table():
+    _stats = SizeStats([256, 64])
+    for _ind in range(3):
+        _stats.record(60, arrival_ns=_ind * 500_000_000, e2e_ns=1_000_000)
+    _merged = SizeStats([64, 256]).merge(SizeStats.from_dict(_stats.to_dict()))
+    _rows = {_row['size']: _row for _row in _merged.table()}
+    assert _rows[64]['messages'] == 3
+    assert _rows[64]['msg_per_s'] == pytest.approx(3)
+    assert _rows[256]['msg_per_s'] is None
@@ -0,0 +1,56 @@
+import pytest
+
+from topic_tree import TopicTree, topic_matches
+
+
+@pytest.mark.parametrize('topic_filter, topic, matches', [
+    ('a/b/c', 'a/b/c', True),
+    ('a/+/c', 'a/b/c', True),
+    ('a/+', 'a/b/c', False),
+    ('a/#', 'a/b/c', True),
+    ('a/#', 'a', True),
+    ('a/b/c', 'a/b', False),
+    ('+/+/+', 'a/b/c', True),
+])
+def test_topic_matches(topic_filter, topic, matches):
+    assert topic_matches(topic_filter, topic) is matches
+
+
+def test_leaves():
+    _tree = TopicTree('root/', 2, 3, publishers=0, subscribers=0)
+    assert _tree.leaves == 9
+    assert _tree.leaf(0) == 'root/l0_0/l1_0'
+    assert _tree.leaf(5) == 'root/l0_1/l1_2'
+
+
+def test_literal_subscribers_receive_their_leaf():
+    # 6 publishers on 4 leaves: leaves 0 and 1 have 2 publishers each
+    _tree = TopicTree('root', 2, 2, publishers=6, subscribers=20, seed=3)
+    _per_leaf = {_tree.leaf(_ind): 2 if _ind < 2 else 1 for _ind in range(4)}
+    assert _tree.expected_messages(10) == [_per_leaf[_filter] * 10 for _filter in _tree.filters]
+    assert _tree.expected_messages(10, pub_containers=3) == [_per_leaf[_filter] * 30 for _filter in _tree.filters]
+
+
+def test_multi_level_subscribers_receive_their_subtree():
+    _tree = TopicTree('root', 2, 2, publishers=4, subscribers=20, multi_level=1.0, seed=3)
+    # A filter cut at the root matches the 4 leaves, one cut below it the 2 leaves of a branch
+    assert all(_filter.endswith('/#') for _filter in _tree.filters)
+    assert _tree.expected_messages(5) == [20 if _filter == 'root/#' else 10 for _filter in _tree.filters]
+
+
+def test_single_level_subscribers():
+    _tree = TopicTree('root', 2, 2, publishers=4, subscribers=20, single_level=1.0, seed=3)
+    assert all('+' in _filter for _filter in _tree.filters)
+    assert _tree.expected_messages(5) == [10] * 20
+
+
+def test_same_seed_same_plan():
+    _first = TopicTree('root', 3, 3, 10, 10, 0.3, 0.3, seed=7)
+    _second = TopicTree('root', 3, 3, 10, 10, 0.3, 0.3, seed=7)
+    assert _first.filters == _second.filters
+    assert _first.summary(4) == _second.summary(4)
+
+
+def test_invalid_ratios():
+    with pytest.raises(ValueError):
+        TopicTree('root', 2, 2, 1, 1, single_level=0.6, multi_level=0.6)